@@ -1,3 +1,9 @@
+import os
+import sys
+
+# The backend modules import each other by their flat names (``from database import ...``)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
 from backend.main import app
 
 # Export for Vercel
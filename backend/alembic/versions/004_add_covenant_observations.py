@@ -0,0 +1,33 @@
+"""Add covenant observation history
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('covenant_observations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('loan_id', sa.Integer(), nullable=False),
+        sa.Column('covenant_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['loan_id'], ['loans.id'], ),
+        sa.ForeignKeyConstraint(['covenant_id'], ['covenants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_observation_loan_covenant_period', 'covenant_observations', ['loan_id', 'covenant_id', 'period'])
+
+def downgrade():
+    op.drop_index('idx_observation_loan_covenant_period', table_name='covenant_observations')
+    op.drop_table('covenant_observations')
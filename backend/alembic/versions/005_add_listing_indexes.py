@@ -0,0 +1,23 @@
+"""Add composite indexes for keyset-paginated listings
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('idx_loan_owner_created', 'loans', ['owner_id', 'created_at', 'id'])
+    op.create_index('idx_audit_user_timestamp', 'audit_logs', ['user_id', 'timestamp', 'id'])
+
+def downgrade():
+    op.drop_index('idx_audit_user_timestamp', table_name='audit_logs')
+    op.drop_index('idx_loan_owner_created', table_name='loans')
@@ -0,0 +1,55 @@
+"""Add per-loan and per-owner compliance snapshots
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 14:00:00.000000
+
+Populate existing data after upgrading with ``python -m snapshots rebuild``.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def _status_columns():
+    return [
+        sa.Column('covenants', sa.Integer(), nullable=False),
+        sa.Column('pending', sa.Integer(), nullable=False),
+        sa.Column('compliant', sa.Integer(), nullable=False),
+        sa.Column('warning', sa.Integer(), nullable=False),
+        sa.Column('breach', sa.Integer(), nullable=False),
+    ]
+
+def upgrade():
+    op.create_table('loan_compliance_snapshots',
+        sa.Column('loan_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        *_status_columns(),
+        sa.Column('worst_status', sa.String(length=50), nullable=True),
+        sa.Column('min_headroom', sa.Float(), nullable=True),
+        sa.Column('last_evaluated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['loan_id'], ['loans.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('loan_id')
+    )
+    op.create_index(op.f('ix_loan_compliance_snapshots_owner_id'), 'loan_compliance_snapshots', ['owner_id'])
+    op.create_table('owner_compliance_snapshots',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('loans', sa.Integer(), nullable=False),
+        sa.Column('loans_in_breach', sa.Integer(), nullable=False),
+        *_status_columns(),
+        sa.Column('min_headroom', sa.Float(), nullable=True),
+        sa.Column('last_evaluated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('owner_id')
+    )
+
+def downgrade():
+    op.drop_table('owner_compliance_snapshots')
+    op.drop_index(op.f('ix_loan_compliance_snapshots_owner_id'), table_name='loan_compliance_snapshots')
+    op.drop_table('loan_compliance_snapshots')
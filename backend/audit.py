@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 100))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+AUDIT_MAX_QUEUE = int(os.getenv("AUDIT_MAX_QUEUE", 10000))
+
+class AuditWriter:
+    """Buffers audit events in memory and writes them with one bulk INSERT per batch.
+
+    A background thread flushes whenever ``batch_size`` events are queued or
+    ``flush_interval`` seconds have passed. Events are timestamped when they
+    are queued, so they keep their order and time even though they reach the
+    ``audit_logs`` table up to one interval later. When ``max_queue`` events
+    are waiting (for example while the database is down) new events are
+    dropped and counted rather than growing memory without bound.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_queue: int = AUDIT_MAX_QUEUE,
+        session_factory=SessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.session_factory = session_factory
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def enqueue(self, event_type: str, details: str, user_id: Optional[int] = None, loan_id: Optional[int] = None) -> bool:
+        """Queue one event without touching the database; returns False if it was dropped"""
+        event = {
+            "timestamp": datetime.utcnow(),
+            "event_type": event_type,
+            "details": details,
+            "user_id": user_id,
+            "loan_id": loan_id,
+        }
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._queue.append(event)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._stopping or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> None:
+        # Failed batches go back to the front, oldest first, as far as capacity allows
+        with self._lock:
+            room = max(self.max_queue - len(self._queue), 0)
+            self.dropped += max(len(batch) - room, 0)
+            self._queue.extendleft(reversed(batch[:room]))
+
+    def flush(self) -> int:
+        """Write every queued event in batches; returns the number written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return written
+                db = self.session_factory()
+                try:
+                    db.execute(insert(models.AuditLog), batch)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    self._requeue(batch)
+                    with self._lock:
+                        self.failed_flushes += 1
+                    logger.error("Failed to write %d audit events: %s", len(batch), e)
+                    return written
+                finally:
+                    db.close()
+                written += len(batch)
+                with self._lock:
+                    self.written += len(batch)
+                    self.flushes += 1
+
+    def stop(self) -> None:
+        """Stop the background thread and write whatever is still queued"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._lock:
+            self._thread = None
+            self._stopping = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+            }
+
+audit_writer = AuditWriter()
@@ -1,28 +1,75 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_async_db, get_db
+from profiler import tag
 import models
 import os
+import threading
+import time
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey_change_me_in_prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads that hash passwords off the event loop; 0 hashes inline
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 4096))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # --- Password Utilities ---
+@lru_cache(maxsize=None)
+def password_context():
+    # passlib and bcrypt load on the first login or registration, not at startup
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+def get_hash_executor() -> Optional[ThreadPoolExecutor]:
+    global _hash_executor
+    if _hash_executor is None and PASSWORD_HASH_WORKERS > 0:
+        _hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _hash_executor
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+async def _run_hashing(fn, *args):
+    # bcrypt releases the GIL, so a small thread pool keeps the event loop responsive
+    executor = get_hash_executor()
+    if executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+async def averify_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify off the event loop; also returns a new hash when the stored one uses outdated settings"""
+    return await _run_hashing(password_context().verify_and_update, plain_password, hashed_password)
+
+async def aget_password_hash(password) -> str:
+    return await _run_hashing(password_context().hash, password)
 
 # --- Token Utilities ---
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -35,22 +82,151 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- Principal Cache ---
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by request handlers, detached from any session"""
+    id: int
+    email: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(id=user.id, email=user.email, role=user.role, is_active=user.is_active)
+
+class PrincipalCache:
+    """In-process LRU of principals keyed by token subject.
+
+    Entries live for ``ttl`` seconds, never past the expiry of the token that
+    loaded them. Changes to a user's email, role or active flag flushed
+    through any Session invalidate the entry (see the listeners below);
+    other worker processes pick the change up when their entry expires.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(subject)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[subject]
+            self.misses += 1
+            return None
+
+    def put(self, subject: str, principal: Principal, token_expires_at: Optional[float] = None) -> None:
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+principal_cache = PrincipalCache()
+
+PRINCIPAL_FIELDS = ("email", "role", "is_active")
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_changed_principals(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, models.User):
+            continue
+        state = inspect(obj)
+        changed = [state.attrs[field].history for field in PRINCIPAL_FIELDS]
+        if obj in session.deleted or any(history.has_changes() for history in changed):
+            # The old email is the subject of tokens issued before the change
+            for email in list(state.attrs.email.history.deleted) + [obj.email]:
+                principal_cache.invalidate(email)
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_user_changes(orm_execute_state):
+    # Bulk UPDATE/DELETE statements bypass the unit of work, so drop every entry
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is models.User for mapper in orm_execute_state.all_mappers
+    ):
+        principal_cache.clear()
+
 # --- Dependency Injection ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+CREDENTIALS_EXCEPTION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def _decode_token(token: str) -> Tuple[str, Optional[float]]:
+    """Subject email and expiry of a valid token"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
+        raise CREDENTIALS_EXCEPTION
+    email: str = payload.get("sub")
+    if email is None:
+        raise CREDENTIALS_EXCEPTION
+    return email, payload.get("exp")
+
+def _active_principal(email: str, user: Optional[models.User], expires: Optional[float]) -> Principal:
     if user is None:
-        raise credentials_exception
-    return user
+        raise CREDENTIALS_EXCEPTION
+    principal = Principal.from_user(user)
+    principal_cache.put(email, principal, expires)
+    return principal
+
+def _check_active(principal: Principal) -> Principal:
+    if not principal.is_active:
+        raise CREDENTIALS_EXCEPTION
+    tag(user_id=principal.id)
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Principal for the bearer token, loaded through the sync session (main.py)"""
+    email, expires = _decode_token(token)
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = db.execute(select(models.User).where(models.User.email == email)).scalars().first()
+        principal = _active_principal(email, user, expires)
+    return _check_active(principal)
+
+async def aget_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """Principal for the bearer token, loaded through the async session (main_prod)"""
+    email, expires = _decode_token(token)
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
+        principal = _active_principal(email, user, expires)
+    return _check_active(principal)
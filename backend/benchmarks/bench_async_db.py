@@ -0,0 +1,90 @@
+"""Benchmark concurrent request throughput with the sync and async database paths.
+
+Run from the backend directory:
+    python benchmarks/bench_async_db.py --requests 40 --concurrency 20
+
+Two endpoints run the same deliberately slow query: one through the
+synchronous SessionLocal inside an ``async def`` handler (the old pattern,
+which blocks the event loop), the other through the async sessionmaker. The query
+waits server-side (pg_sleep on Postgres, a registered sleep function on
+SQLite) to model a slow database rather than CPU work in this process.
+Requests are issued concurrently against the ASGI app in-process.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/creditsentinel_bench.db")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, text
+
+from database import ASYNC_DATABASE_URL, SessionLocal, engine, get_async_engine, get_async_sessionmaker
+
+if "sqlite" in ASYNC_DATABASE_URL:
+    SLOW_QUERY = text("SELECT sleep(:seconds)")
+
+    @event.listens_for(engine, "connect")
+    @event.listens_for(get_async_engine().sync_engine, "connect")
+    def register_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep", 1, time.sleep)
+else:
+    SLOW_QUERY = text("SELECT pg_sleep(:seconds)")
+
+def build_app(seconds: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_path():
+        db = SessionLocal()
+        try:
+            db.execute(SLOW_QUERY, {"seconds": seconds})
+            return {"status": "ok"}
+        finally:
+            db.close()
+
+    @app.get("/async")
+    async def async_path():
+        async with get_async_sessionmaker()() as db:
+            await db.execute(SLOW_QUERY, {"seconds": seconds})
+            return {"status": "ok"}
+
+    return app
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        await client.get(path)  # warm up the pool
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--query-seconds", type=float, default=0.05, help="server-side duration of each query")
+    args = parser.parse_args()
+
+    app = build_app(args.query_seconds)
+    print(f"{'path':>6} {'seconds':>9} {'req/s':>8}")
+    results = {}
+    for path in ("/sync", "/async"):
+        seconds = asyncio.run(run(app, path, args.requests, args.concurrency))
+        results[path] = args.requests / seconds
+        print(f"{path:>6} {seconds:>9.3f} {results[path]:>8.1f}")
+    print(f"async speedup: {results['/async'] / results['/sync']:.2f}x")
+
+if __name__ == "__main__":
+    main()
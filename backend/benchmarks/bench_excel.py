@@ -0,0 +1,96 @@
+"""Benchmark the Excel engines on large multi-sheet borrower packs.
+
+Run from the backend directory:
+    python benchmarks/bench_excel.py --rows 20000 --extra-columns 40 --sheets 4
+
+Writes a workbook with a cover sheet, a wide financials sheet and further
+filler sheets, then times the previous path (pd.read_excel of the first
+sheet with every column) against normalize_financials with each available
+engine. Exits non-zero when the fastest streaming engine is not at least
+``--min-speedup`` times faster than the previous path. openpyxl read-only
+mode alone is only slightly faster than pd.read_excel; the large gains
+come from python-calamine. ``--max-rows`` bounds memory, not read time,
+since the kept rows are the last ones of the sheet.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+import pandas as pd
+
+import excel_reader
+from data_processor import DataProcessor
+
+FINANCIAL = ["Period", "EBITDA", "Total_Debt", "Interest", "Current_Assets", "Current_Liabilities"]
+
+def make_workbook(rows: int, extra_columns: int, sheets: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    cover = workbook.create_sheet("Cover")
+    cover.append(["Borrower pack"])
+    cover.append(["Prepared for the lender"])
+
+    header = [f"erp_field_{i}" for i in range(extra_columns)] + FINANCIAL
+    for index in range(sheets - 1):
+        sheet = workbook.create_sheet("Financials" if index == 0 else f"Schedule {index}")
+        sheet.append(header)
+        for row in range(rows):
+            values = [round(rng.uniform(0, 1e4), 2) for _ in range(extra_columns)]
+            sheet.append(values + [f"{2000 + row // 4}Q{row % 4 + 1}"] + [round(rng.uniform(10, 500), 2) for _ in FINANCIAL[1:]])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def previous_path(content: bytes) -> pd.DataFrame:
+    df = pd.read_excel(io.BytesIO(content), sheet_name="Financials")
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extra-columns", type=int, default=40)
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--max-rows", type=int, default=None, help="rows kept from the bottom of the sheet")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=1.0)
+    args = parser.parse_args()
+
+    content = make_workbook(args.rows, args.extra_columns, max(args.sheets, 2))
+    processor = DataProcessor()
+    engines = ["openpyxl"] + (["calamine"] if excel_reader.CalamineWorkbook is not None else [])
+
+    print(f"{len(content) / 1024 / 1024:.1f} MB workbook, {args.sheets} sheets, {args.rows} rows x "
+          f"{args.extra_columns + len(FINANCIAL)} columns")
+    baseline = best_of(lambda: previous_path(content), args.repeat)
+    print(f"{'engine':>22} {'best ms':>9} {'speedup':>8}")
+    print(f"{'pd.read_excel (before)':>22} {baseline * 1000:>9.0f} {1:>7.1f}x")
+    fastest = float("inf")
+    for engine in engines:
+        excel_reader.EXCEL_ENGINE = engine
+        elapsed = best_of(
+            lambda: processor.normalize_financials(content, "pack.xlsx", sheet_pattern="^financials$", max_rows=args.max_rows),
+            args.repeat,
+        )
+        fastest = min(fastest, elapsed)
+        print(f"{engine:>22} {elapsed * 1000:>9.0f} {baseline / elapsed:>7.1f}x")
+
+    if baseline / fastest < args.min_speedup:
+        sys.exit(f"streaming engines only {baseline / fastest:.1f}x faster (expected {args.min_speedup}x)")
+
+if __name__ == "__main__":
+    main()
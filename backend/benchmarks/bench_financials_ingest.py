@@ -0,0 +1,96 @@
+"""Benchmark DataProcessor.normalize_financials on wide ERP-style exports.
+
+Run from the backend directory:
+    python benchmarks/bench_financials_ingest.py --rows 50000 --extra-columns 300
+
+Writes one CSV, Parquet and Arrow IPC file with the financial columns buried
+among ``--extra-columns`` unrelated ones, then compares a full-width pandas
+read (the previous behaviour) with the projected reader. Exits non-zero when
+the projected CSV read is not at least ``--min-speedup`` times faster.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from data_processor import DataProcessor
+
+FINANCIAL = ["EBITDA", "Total_Debt", "Interest", "Current_Assets", "Current_Liabilities"]
+
+def make_export(rows: int, extra_columns: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    columns = {f"erp_field_{i}": rng.normal(1000, 250, rows).round(2) for i in range(extra_columns)}
+    columns["Period"] = [f"{2000 + i // 4}Q{i % 4 + 1}" for i in range(rows)]
+    for i, name in enumerate(FINANCIAL):
+        columns[name] = rng.uniform(10, 500, rows).round(2)
+        columns[f"memo_{i}"] = ["free text"] * rows
+    return pd.DataFrame(columns)
+
+def full_read(content: bytes, filename: str) -> pd.DataFrame:
+    if filename.endswith(".csv"):
+        df = pd.read_csv(io.BytesIO(content))
+    elif filename.endswith(".parquet"):
+        df = pd.read_parquet(io.BytesIO(content))
+    else:
+        df = feather.read_table(io.BytesIO(content)).to_pandas()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+def measure(fn, content: bytes, filename: str, repeat: int):
+    """Best wall time in seconds and peak traced allocation in MB"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content, filename)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(content, filename)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--extra-columns", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    df = make_export(args.rows, args.extra_columns)
+    files = {}
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    files["export.csv"] = buffer.getvalue().encode()
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    files["export.parquet"] = buffer.getvalue()
+    buffer = io.BytesIO()
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    files["export.arrow"] = buffer.getvalue()
+
+    processor = DataProcessor()
+    print(f"{args.rows} rows x {df.shape[1]} columns")
+    print(f"{'file':>15} {'size MB':>8} {'full ms':>9} {'projected ms':>13} {'full MB':>8} {'projected MB':>13}")
+    for filename, content in files.items():
+        full_s, full_mb = measure(full_read, content, filename, args.repeat)
+        projected_s, projected_mb = measure(processor.normalize_financials, content, filename, args.repeat)
+        print(f"{filename:>15} {len(content) / 1024 / 1024:>8.1f} {full_s * 1000:>9.1f} {projected_s * 1000:>13.1f} "
+              f"{full_mb:>8.1f} {projected_mb:>13.1f}")
+        if filename.endswith(".csv"):
+            csv_speedup = full_s / projected_s
+
+    if csv_speedup < args.min_speedup:
+        sys.exit(f"projected CSV read only {csv_speedup:.1f}x faster (expected {args.min_speedup}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Import-time budget for the serverless entry point.
+
+Run from the backend directory:
+    python benchmarks/bench_import_time.py --budget-ms 1500
+    python benchmarks/bench_import_time.py --module main_prod --budget-ms 4000 --allow pandas numpy pyarrow openpyxl pdfplumber
+
+Imports ``--module`` (api.index, the Vercel handler, by default) in a fresh
+interpreter under ``python -X importtime`` ``--repeat`` times and takes the
+fastest run. Prints the slowest top-level dependencies and exits non-zero
+when the import takes longer than ``--budget-ms`` or loads one of the heavy
+modules that are meant to stay lazy.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+# Only the endpoints that parse files or call the LLM may load these
+LAZY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "pdfplumber", "openai", "tenacity", "passlib"]
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_profile(module: str) -> List[Tuple[int, int, str]]:
+    """(self us, cumulative us, module) per line of one fresh -X importtime run"""
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/creditsentinel_import.db")
+    env["PYTHONPATH"] = os.pathsep.join([REPO_DIR, BACKEND_DIR, env.get("PYTHONPATH", "")])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--allow", nargs="*", default=[], metavar="MODULE", help="heavy modules allowed at import")
+    args = parser.parse_args()
+
+    runs = [import_profile(args.module) for _ in range(args.repeat)]
+    totals = [next(total for _, total, name in rows if name == args.module) for rows in runs]
+    best = runs[totals.index(min(totals))]
+    total_ms = min(totals) / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms (best of {args.repeat}, budget {args.budget_ms:.0f} ms)")
+    print("slowest modules by their own import time:")
+    for own, _, name in sorted(best, reverse=True)[:args.top]:
+        print(f"{own / 1000:>10.1f} ms  {name}")
+
+    loaded = {name for _, _, name in best}
+    eager = [name for name in LAZY_MODULES if name in loaded and name not in args.allow]
+    failures = []
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if failures:
+        sys.exit("; ".join(failures))
+
+if __name__ == "__main__":
+    main()
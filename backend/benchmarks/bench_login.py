@@ -0,0 +1,94 @@
+"""Benchmark login throughput and event-loop responsiveness during a login burst.
+
+Run from the backend directory:
+    python benchmarks/bench_login.py --logins 20 --workers 4
+
+A burst of concurrent /token requests is sent to main_prod.app in-process
+while /health is probed every ``--probe-interval`` seconds. It runs once
+with bcrypt inline on the event loop (PASSWORD_HASH_WORKERS=0) and once
+with the hashing thread pool, reporting login throughput and the latency
+of the /health probes that ran during the burst.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/creditsentinel_login_bench.db")
+
+import httpx
+
+import auth
+import main_prod
+import models
+from database import engine
+
+EMAIL = "bench@example.com"
+PASSWORD = "BenchPass123"
+
+async def register():
+    transport = httpx.ASGITransport(app=main_prod.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/register", json={"email": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+
+async def burst(logins: int, probe_interval: float):
+    transport = httpx.ASGITransport(app=main_prod.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/health")
+        probes = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                (await client.get("/health")).raise_for_status()
+                probes.append(time.perf_counter() - start)
+                await asyncio.sleep(probe_interval)
+
+        async def login():
+            response = await client.post("/token", data={"username": EMAIL, "password": PASSWORD})
+            response.raise_for_status()
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        seconds = time.perf_counter() - start
+        done.set()
+        await prober
+        return seconds, probes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=auth.PASSWORD_HASH_WORKERS or 4)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    main_prod.app.state.limiter.enabled = False
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    asyncio.run(register())
+
+    print(f"bcrypt rounds: {auth.BCRYPT_ROUNDS}")
+    print(f"{'hashing':>10} {'logins/s':>9} {'probes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for workers in (0, args.workers):
+        auth.shutdown_hash_executor()
+        auth.PASSWORD_HASH_WORKERS = workers
+        seconds, probes = asyncio.run(burst(args.logins, args.probe_interval))
+        label = "inline" if workers == 0 else f"{workers} thr"
+        quantiles = statistics.quantiles(probes, n=100, method="inclusive") if len(probes) > 1 else probes * 99
+        print(
+            f"{label:>10} {args.logins / seconds:>9.1f} {len(probes):>7} "
+            f"{quantiles[49] * 1000:>8.1f} {quantiles[98] * 1000:>8.1f} {max(probes) * 1000:>8.1f}"
+        )
+    auth.shutdown_hash_executor()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark /portfolio/summary on a large synthetic portfolio.
+
+Run from the backend directory:
+    python benchmarks/bench_portfolio_summary.py --loans 10000 --covenants-per-loan 5
+
+Seeds one user with the given number of loans and covenants, then times the
+live summary and the maintained /portfolio/snapshot in-process. Exits non-zero when the median summary (without detail)
+takes longer than ``--max-ms``.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/creditsentinel_summary_bench.db")
+
+import httpx
+from sqlalchemy import insert
+
+import main_prod
+import models
+from database import SessionLocal, engine
+
+EMAIL = "bench@example.com"
+PASSWORD = "BenchPass123"
+COVENANTS = [
+    ("Debt-to-EBITDA", "<=", 4.0),
+    ("Interest Coverage", ">=", 2.0),
+    ("Current Ratio", ">=", 1.0),
+    ("Fixed Charge Coverage", ">=", 1.25),
+    ("Minimum Net Worth", ">=", 5000000.0),
+]
+
+async def setup(loans: int, per_loan: int):
+    """Register the benchmark user, bulk insert the portfolio and return (covenant count, auth headers)"""
+    transport = httpx.ASGITransport(app=main_prod.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.post("/register", json={"email": EMAIL, "password": PASSWORD})).raise_for_status()
+        response = await client.post("/token", data={"username": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    rng = random.Random(7)
+    db = SessionLocal()
+    owner_id = db.query(models.User.id).filter(models.User.email == EMAIL).scalar()
+    db.execute(insert(models.Loan), [
+        {"borrower_name": f"Borrower {i}", "loan_amount": 1e6, "owner_id": owner_id} for i in range(loans)
+    ])
+    loan_ids = [loan_id for (loan_id,) in db.query(models.Loan.id).filter(models.Loan.owner_id == owner_id)]
+    rows = []
+    for loan_id in loan_ids:
+        for name, operator, threshold in COVENANTS[:per_loan]:
+            rows.append({
+                "name": name, "operator": operator, "threshold": threshold, "category": "Financial",
+                "current_value": threshold * rng.uniform(0.7, 1.4),
+                "status": rng.choice(["Compliant", "Compliant", "Warning", "Breach"]),
+                "loan_id": loan_id,
+            })
+    db.execute(insert(models.Covenant), rows)
+    db.commit()
+    db.close()
+    return len(rows), headers
+
+async def time_endpoint(headers, path: str, params: dict, repeat: int):
+    transport = httpx.ASGITransport(app=main_prod.app)
+    timings = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            response = await client.get(path, params=params, headers=headers)
+            response.raise_for_status()
+            timings.append(time.perf_counter() - start)
+    return timings[1:]  # the first request warms the principal cache and connection pool
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loans", type=int, default=10000)
+    parser.add_argument("--covenants-per-loan", type=int, default=5, choices=range(1, len(COVENANTS) + 1))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    main_prod.app.state.limiter.enabled = False
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    covenants, headers = asyncio.run(setup(args.loans, args.covenants_per_loan))
+
+    print(f"{args.loans} loans, {covenants} covenants")
+    print(f"{'endpoint':>26} {'median ms':>10} {'max ms':>8}")
+    for label, path, params in (
+        ("summary", "/portfolio/summary", {"detail": False}),
+        ("summary detail", "/portfolio/summary", {"detail": True}),
+        ("snapshot", "/portfolio/snapshot", {}),
+    ):
+        timings = asyncio.run(time_endpoint(headers, path, params, args.repeat))
+        median = statistics.median(timings) * 1000
+        print(f"{label:>26} {median:>10.1f} {max(timings) * 1000:>8.1f}")
+        if label == "summary":
+            summary_ms = median
+
+    if summary_ms > args.max_ms:
+        sys.exit(f"summary took {summary_ms:.1f} ms (limit {args.max_ms} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark RegexStrategy.scan on multi-megabyte agreements.
+
+Run from the backend directory:
+    python benchmarks/bench_regex_scan.py --sizes 1 2 4 8 16
+
+Exits non-zero when the time per megabyte at the largest size is more than
+``--max-slowdown`` times the time per megabyte at the smallest size.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from covenant_engine import RegexStrategy
+
+FILLER = (
+    "The Borrower shall deliver to the Administrative Agent, within forty five days after the end of "
+    "each fiscal quarter, its consolidated balance sheet and related statements of income and cash flows. "
+)
+CLAUSES = [
+    "The Leverage Ratio shall not exceed {:.2f}x. ",
+    "The Interest Coverage Ratio shall be not less than {:.2f} to 1.00. ",
+    "The Borrower shall maintain a Current Ratio of at least {:.2f}. ",
+    "Minimum Net Worth of ${:,.0f}. ",
+]
+
+def make_agreement(size_mb: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, length = [], 0
+    while length < target:
+        part = FILLER * rng.randint(5, 20) + rng.choice(CLAUSES).format(rng.uniform(1, 5) * 1000 ** rng.randint(0, 1))
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:target]
+
+def time_scan(strategy: RegexStrategy, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        strategy.scan(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-slowdown", type=float, default=1.5)
+    args = parser.parse_args()
+
+    strategy = RegexStrategy()
+    per_mb = []
+    print(f"{'size MB':>8} {'matches':>8} {'seconds':>9} {'MB/s':>8}")
+    for size in args.sizes:
+        text = make_agreement(size)
+        seconds = time_scan(strategy, text, args.repeat)
+        per_mb.append(seconds / size)
+        print(f"{size:>8.1f} {len(strategy.scan(text)):>8} {seconds:>9.4f} {size / seconds:>8.1f}")
+
+    slowdown = per_mb[-1] / per_mb[0]
+    print(f"time per MB, largest vs smallest: {slowdown:.2f}x")
+    if slowdown > args.max_slowdown:
+        sys.exit(f"scan is not scaling linearly (limit {args.max_slowdown}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark the portfolio stress engine on synthetic loan books.
+
+Run from the backend directory:
+    python benchmarks/bench_stress.py --loans 10000 --scenarios 10000
+
+Exits non-zero when the largest run takes longer than ``--max-seconds``.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stress_engine import stress_test
+
+COVENANTS = [
+    ("Debt-to-EBITDA", "<=", 4.0, (2.0, 4.2)),
+    ("Interest Coverage", ">=", 2.0, (1.8, 4.0)),
+    ("Current Ratio", ">=", 1.0, (0.9, 2.0)),
+]
+
+def make_portfolio(n_loans: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    per_loan = len(COVENANTS)
+    return pd.DataFrame({
+        "id": np.arange(n_loans * per_loan),
+        "loan_id": np.repeat(np.arange(n_loans), per_loan),
+        "name": [name for name, _, _, _ in COVENANTS] * n_loans,
+        "operator": [op for _, op, _, _ in COVENANTS] * n_loans,
+        "threshold": [threshold for _, _, threshold, _ in COVENANTS] * n_loans,
+        "current_value": np.column_stack([rng.uniform(low, high, n_loans) for _, _, _, (low, high) in COVENANTS]).ravel(),
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loans", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--max-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'loans':>8} {'scenarios':>10} {'seconds':>9} {'expected breaches':>18}")
+    for n_loans in args.loans:
+        covenants = make_portfolio(n_loans)
+        start = time.perf_counter()
+        result = stress_test(covenants, scenarios=args.scenarios, seed=1)
+        seconds = time.perf_counter() - start
+        print(f"{n_loans:>8} {args.scenarios:>10} {seconds:>9.3f} {result['expected_loans_in_breach']:>18.1f}")
+
+    if seconds > args.max_seconds:
+        sys.exit(f"stress test took {seconds:.2f}s (limit {args.max_seconds}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark memory held while handling a financials upload of growing size.
+
+Run from the backend directory:
+    python benchmarks/bench_upload_memory.py --sizes 5 20 45
+
+For each size, builds a CSV upload backed by a temp file (as Starlette's
+multipart parser leaves it) and compares the previous path, ``await
+file.read()`` followed by parsing the bytes, with spool_upload followed by
+parsing the spooled path. Reports the peak Python heap allocation of each
+(tracemalloc), which is where upload copies live; the parsed columns sit in
+Arrow's memory pool and scale with rows either way. Exits non-zero when the
+spooled peak at the largest size is more than ``--max-growth`` times the
+peak at the smallest size.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+
+from data_processor import DataProcessor
+from uploads import spool_upload
+
+ROW = b"2024Q1,100.5,320.25,40.75,50.5,40.25," + b"1234.5," * 40 + b"memo\n"
+HEADER = b"period,ebitda,total_debt,interest,current_assets,current_liabilities," + \
+    b"".join(f"erp_{i},".encode() for i in range(40)) + b"notes\n"
+
+def make_upload(size_mb: float) -> UploadFile:
+    spooled = tempfile.TemporaryFile()
+    spooled.write(HEADER)
+    target = int(size_mb * 1024 * 1024)
+    block = ROW * 1000
+    written = 0
+    while written < target:
+        spooled.write(block)
+        written += len(block)
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename="financials.csv")
+
+async def read_whole(file: UploadFile, processor: DataProcessor) -> int:
+    content = await file.read()
+    return len(processor.normalize_financials(content, file.filename))
+
+async def read_spooled(file: UploadFile, processor: DataProcessor) -> int:
+    with await spool_upload(file, max_size=1 << 40) as upload:
+        return len(processor.normalize_financials(upload.path, upload.filename))
+
+def peak_mb(handler, size_mb: float) -> float:
+    file = make_upload(size_mb)
+    processor = DataProcessor()
+    tracemalloc.start()
+    asyncio.run(handler(file, processor))
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    file.file.close()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[5, 20, 45])
+    parser.add_argument("--max-growth", type=float, default=1.5)
+    args = parser.parse_args()
+
+    print(f"{'size MB':>8} {'read() peak MB':>15} {'spooled peak MB':>16}")
+    spooled = []
+    for size in args.sizes:
+        whole = peak_mb(read_whole, size)
+        spooled.append(peak_mb(read_spooled, size))
+        print(f"{size:>8.0f} {whole:>15.1f} {spooled[-1]:>16.1f}")
+
+    growth = spooled[-1] / spooled[0]
+    if growth > args.max_growth:
+        sys.exit(f"spooled peak grew {growth:.1f}x from {args.sizes[0]} MB to {args.sizes[-1]} MB")
+
+if __name__ == "__main__":
+    main()
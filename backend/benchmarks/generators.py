@@ -0,0 +1,107 @@
+"""Deterministic synthetic inputs for the benchmark suite.
+
+Every generator takes a ``seed`` so the same arguments always produce the
+same bytes, which keeps results comparable between commits.
+"""
+import io
+import random
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+FILLER = [
+    "The Borrower shall deliver to the Administrative Agent, within forty five days after the end of each fiscal quarter, "
+    "its consolidated balance sheet and related statements of income and cash flows.",
+    "Each Loan Party shall maintain insurance with financially sound and reputable insurers in such amounts as are "
+    "customarily carried by companies engaged in similar businesses.",
+    "No Default or Event of Default shall have occurred and be continuing on the date of any Credit Extension.",
+    "The Borrower shall not, and shall not permit any Subsidiary to, create, incur, assume or suffer to exist any Lien "
+    "upon any of its property, assets or revenues, whether now owned or hereafter acquired.",
+]
+CLAUSES = [
+    "The Leverage Ratio shall not exceed {:.2f}x as of the last day of any fiscal quarter.",
+    "The Interest Coverage Ratio shall be not less than {:.2f} to 1.00.",
+    "The Borrower shall maintain a Current Ratio of at least {:.2f}.",
+    "The Fixed Charge Coverage Ratio shall not be less than {:.2f} to 1.00.",
+]
+FINANCIAL_COLUMNS = ["loan_id", "period", "ebitda", "total_debt", "interest", "current_assets", "current_liabilities"]
+# Text lines per PDF page and characters per line, roughly a typeset agreement
+LINES_PER_PAGE = 45
+LINE_WIDTH = 90
+
+def agreement_lines(pages: int, clauses_per_page: float = 0.5, seed: int = 7) -> List[List[str]]:
+    """Lines of text per page, with a covenant clause on about ``clauses_per_page`` of the pages"""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(pages):
+        words = []
+        while sum(len(w) + 1 for w in words) < LINES_PER_PAGE * LINE_WIDTH:
+            words.extend(rng.choice(FILLER).split())
+        if rng.random() < clauses_per_page:
+            clause = rng.choice(CLAUSES).format(rng.uniform(1.0, 5.0))
+            words[rng.randrange(len(words)):0] = clause.split()
+        lines, line = [], ""
+        for word in words:
+            if len(line) + len(word) + 1 > LINE_WIDTH:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+        result.append(lines[:LINES_PER_PAGE])
+    return result
+
+def make_agreement_text(pages: int, clauses_per_page: float = 0.5, seed: int = 7) -> str:
+    return "\n\n".join("\n".join(lines) for lines in agreement_lines(pages, clauses_per_page, seed))
+
+def _pdf_escape(text: str) -> bytes:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", errors="replace")
+
+def make_agreement_pdf(pages: int, clauses_per_page: float = 0.5, seed: int = 7) -> bytes:
+    """A text PDF with one Helvetica content stream per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in agreement_lines(pages, clauses_per_page, seed):
+        body = b" T* ".join(b"(" + _pdf_escape(line) + b") Tj" for line in lines)
+        stream = b"BT /F1 9 Tf 11 TL 54 750 Td " + body + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def make_financials(periods: int, loans: int, seed: int = 7, loan_ids: List[int] = None) -> pd.DataFrame:
+    """``periods`` quarterly rows for each of ``loans`` loans, oldest period first within a loan"""
+    rng = np.random.default_rng(seed)
+    loan_ids = list(loan_ids) if loan_ids is not None else list(range(1, loans + 1))
+    rows = periods * len(loan_ids)
+    ebitda = rng.uniform(50, 500, rows).round(2)
+    return pd.DataFrame({
+        "loan_id": np.repeat(loan_ids, periods),
+        "period": np.tile([f"{2000 + p // 4}Q{p % 4 + 1}" for p in range(periods)], len(loan_ids)),
+        "ebitda": ebitda,
+        "total_debt": (ebitda * rng.uniform(1.5, 5.5, rows)).round(2),
+        "interest": (ebitda / rng.uniform(1.2, 6.0, rows)).round(2),
+        "current_assets": rng.uniform(100, 1000, rows).round(2),
+        "current_liabilities": rng.uniform(80, 900, rows).round(2),
+    }, columns=FINANCIAL_COLUMNS)
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+def to_xlsx_bytes(df: pd.DataFrame, sheet_name: str = "Financials") -> bytes:
+    buffer = io.BytesIO()
+    df.to_excel(buffer, sheet_name=sheet_name, index=False)
+    return buffer.getvalue()
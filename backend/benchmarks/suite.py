@@ -0,0 +1,289 @@
+"""Reproducible benchmark suite over synthetic agreements and financials.
+
+Run from the backend directory:
+    python benchmarks/suite.py                       # quick profile, saved as results/<commit>-quick.json
+    python benchmarks/suite.py --profile full --only regex normalize
+    python benchmarks/suite.py --compare benchmarks/results/<base>.json
+
+Each case is timed ``--repeat`` times after one warm-up run and records
+min/median/max wall time. Inputs come from generators.py with fixed seeds.
+The upload endpoints run through TestClient against a temporary SQLite
+database. With ``--compare``, the run is checked against an earlier result
+file and exits non-zero when any shared case's median is more than
+``--threshold`` times (and ``--min-delta-ms``) slower.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/creditsentinel_suite.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from generators import make_agreement_pdf, make_agreement_text, make_financials, to_csv_bytes, to_xlsx_bytes
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+PROFILES = {
+    "quick": {"pages": 200, "pdf_pages": 10, "periods": 12, "loans": 50, "evaluations": 2000, "upload_loans": 20},
+    "full": {"pages": 2000, "pdf_pages": 100, "periods": 40, "loans": 500, "evaluations": 20000, "upload_loans": 200},
+}
+
+# name -> builder(params) returning (timed callable, per-iteration reset or None, metadata)
+Case = Callable[[Dict[str, int]], Tuple[Callable[[], Any], Optional[Callable[[], None]], Dict[str, Any]]]
+CASES: Dict[str, Case] = {}
+
+def case(name: str):
+    def register(builder: Case) -> Case:
+        CASES[name] = builder
+        return builder
+    return register
+
+@case("regex_extract")
+def regex_extract(params):
+    from covenant_engine import RegexStrategy
+    strategy = RegexStrategy()
+    text = make_agreement_text(params["pages"])
+    return lambda: strategy.extract(text), None, {"pages": params["pages"], "chars": len(text)}
+
+@case("pdf_extract_text")
+def pdf_extract_text(params):
+    from text_extractor import extract_pdf_text
+    pdf = make_agreement_pdf(params["pdf_pages"])
+    return lambda: extract_pdf_text(pdf), None, {"pages": params["pdf_pages"], "bytes": len(pdf)}
+
+@case("normalize_csv")
+def normalize_csv(params):
+    from data_processor import DataProcessor
+    processor = DataProcessor()
+    content = to_csv_bytes(make_financials(params["periods"], params["loans"]))
+    return lambda: processor.normalize_financials(content, "financials.csv"), None, {"rows": params["periods"] * params["loans"]}
+
+@case("normalize_xlsx")
+def normalize_xlsx(params):
+    from data_processor import DataProcessor
+    processor = DataProcessor()
+    content = to_xlsx_bytes(make_financials(params["periods"], params["loans"]))
+    return lambda: processor.normalize_financials(content, "financials.xlsx"), None, {"rows": params["periods"] * params["loans"]}
+
+@case("calculate_ratios")
+def calculate_ratios(params):
+    from data_processor import DataProcessor
+    processor = DataProcessor()
+    df = make_financials(params["periods"], params["loans"])
+    return lambda: processor.calculate_ratios(df), None, {"rows": len(df)}
+
+@case("evaluate")
+def evaluate(params):
+    import random
+    from covenant_engine import CovenantEngine
+    engine = CovenantEngine()
+    rng = random.Random(7)
+    inputs = [
+        ({"threshold": rng.uniform(1, 5), "operator": rng.choice(["<=", ">=", "<", ">", "="])}, rng.uniform(0, 6))
+        for _ in range(params["evaluations"])
+    ]
+    return lambda: [engine.evaluate(covenant, value) for covenant, value in inputs], None, {"evaluations": len(inputs)}
+
+@case("evaluate_many")
+def evaluate_many(params):
+    import numpy as np
+    from covenant_engine import CovenantEngine
+    engine = CovenantEngine()
+    rng = np.random.default_rng(7)
+    count = params["evaluations"] * 100
+    thresholds = rng.uniform(1, 5, count)
+    operators = rng.choice(["<=", ">=", "<", ">", "="], count)
+    values = rng.uniform(0, 6, count)
+    return lambda: engine.evaluate_many(thresholds, operators, values), None, {"evaluations": count}
+
+_client = None
+
+def api_client():
+    """TestClient on a fresh SQLite database with one registered user; returns (client, headers)"""
+    global _client
+    if _client is None:
+        from fastapi.testclient import TestClient
+        import main_prod
+        import models
+        from database import engine
+
+        main_prod.app.state.limiter.enabled = False
+        models.Base.metadata.drop_all(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        client = TestClient(main_prod.app).__enter__()
+        credentials = {"email": "suite@example.com", "password": "SuitePass123"}
+        client.post("/register", json=credentials).raise_for_status()
+        token = client.post("/token", data={"username": credentials["email"], "password": credentials["password"]})
+        token.raise_for_status()
+        _client = client, {"Authorization": f"Bearer {token.json()['access_token']}"}
+    return _client
+
+def close_api_client():
+    """Run the app's shutdown (worker pools, audit writer) so the process can exit"""
+    global _client
+    if _client is not None:
+        _client[0].__exit__(None, None, None)
+        _client = None
+
+def create_loans(count: int) -> List[int]:
+    from sqlalchemy import insert
+    import models
+    from database import SessionLocal
+
+    client, headers = api_client()
+    loan_ids = [client.post("/loans", json={"borrower_name": f"Borrower {i}", "loan_amount": 1e6}, headers=headers).json()["id"]
+                for i in range(count)]
+    db = SessionLocal()
+    db.execute(insert(models.Covenant), [
+        {"name": name, "threshold": threshold, "operator": operator, "category": "Financial", "status": "Pending", "loan_id": loan_id}
+        for loan_id in loan_ids
+        for name, operator, threshold in (("Debt-to-EBITDA", "<=", 4.0), ("Interest Coverage", ">=", 2.0), ("Current Ratio", ">=", 1.0))
+    ])
+    db.commit()
+    db.close()
+    return loan_ids
+
+def post(path: str, filename: str, content: bytes, content_type: str):
+    client, headers = api_client()
+    response = client.post(path, headers=headers, files={"file": (filename, content, content_type)})
+    response.raise_for_status()
+    return response
+
+@case("upload_financials")
+def upload_financials(params):
+    (loan_id,) = create_loans(1)
+    content = to_csv_bytes(make_financials(params["periods"], 1, loan_ids=[loan_id]).drop(columns="loan_id"))
+    return lambda: post(f"/upload-financials?loan_id={loan_id}", "financials.csv", content, "text/csv"), None, {"periods": params["periods"]}
+
+@case("upload_financials_bulk")
+def upload_financials_bulk(params):
+    loan_ids = create_loans(params["upload_loans"])
+    content = to_csv_bytes(make_financials(params["periods"], len(loan_ids), loan_ids=loan_ids))
+    return (lambda: post("/upload-financials/bulk", "feed.csv", content, "text/csv"), None,
+            {"loans": len(loan_ids), "periods": params["periods"]})
+
+@case("upload_agreement")
+def upload_agreement(params):
+    import main_prod
+    import models
+    from database import SessionLocal
+
+    (loan_id,) = create_loans(1)
+    pdf = make_agreement_pdf(params["pdf_pages"])
+
+    def cold_cache():
+        # Time extraction, not cache hits
+        main_prod.extraction_cache.clear()
+        db = SessionLocal()
+        db.query(models.ExtractionCacheEntry).delete()
+        db.query(models.Covenant).filter(models.Covenant.loan_id == loan_id).delete()
+        db.commit()
+        db.close()
+
+    return lambda: post(f"/upload-agreement?loan_id={loan_id}", "agreement.pdf", pdf, "application/pdf"), cold_cache, {"pages": params["pdf_pages"]}
+
+def run_case(builder: Case, params: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    fn, reset, meta = builder(params)
+    timings = []
+    for _ in range(repeat + 1):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = timings[1:]  # the warm-up run fills caches and pools
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "repeat": repeat,
+        "params": meta,
+    }
+
+def git_commit() -> Tuple[str, bool]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip()
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    return commit, bool(git("status", "--porcelain", "--untracked-files=no"))
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    """Print median ratios for shared cases; returns the names of regressed cases.
+
+    A case regresses when its median is more than ``threshold`` times the
+    baseline and at least ``min_delta_ms`` slower, so timer noise on
+    sub-millisecond cases is not reported.
+    """
+    regressions = []
+    print(f"\ncompared with {baseline['commit']} ({baseline['created_at']})")
+    print(f"{'case':>24} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or before["params"] != result["params"]:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        slower = ratio > threshold and result["median_ms"] - before["median_ms"] >= min_delta_ms
+        flag = " REGRESSION" if slower else ""
+        print(f"{name:>24} {before['median_ms']:>10.1f} {result['median_ms']:>10.1f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", nargs="+", metavar="SUBSTRING", help="run cases whose name contains any of these")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="result file (default results/<commit>[-dirty]-<profile>.json)")
+    parser.add_argument("--compare", metavar="RESULT_JSON", help="earlier result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    params = PROFILES[args.profile]
+    selected = [name for name in CASES if not args.only or any(part in name for part in args.only)]
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "profile": args.profile,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+
+    print(f"{'case':>24} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+    try:
+        for name in selected:
+            result = run_case(CASES[name], params, args.repeat)
+            report["results"][name] = result
+            print(f"{name:>24} {result['median_ms']:>10.1f} {result['min_ms']:>9.1f} {result['max_ms']:>9.1f}", flush=True)
+    finally:
+        close_api_client()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{args.profile}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        if regressions:
+            sys.exit(f"{len(regressions)} case(s) slower than {args.threshold}x: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, get_async_db, get_db
+import models
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    create_async_engine("sqlite+aiosqlite:///./test.db"), autoflush=False, expire_on_commit=False
+)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+@pytest.fixture(scope="session")
+def app():
+    """main_prod's app on the test database; imported on first use so module tests stay light"""
+    from main_prod import app
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.state.limiter.enabled = False
+    return app
+
+@pytest.fixture
+def client(app):
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as c:
+        yield c
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def auth_headers(client):
+    """Register ``email`` (once) and return bearer headers for it"""
+    def make(email="test@example.com"):
+        client.post("/register", json={"email": email, "password": "TestPass123"})
+        token = client.post("/token", data={"username": email, "password": "TestPass123"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+def make_covenant(loan_id, name, threshold, operator, current_value=None, status="Pending"):
+    return models.Covenant(name=name, threshold=threshold, operator=operator, category="Financial",
+                           current_value=current_value, status=status, loan_id=loan_id)
+
+@pytest.fixture
+def loan_with_covenants(client, auth_headers):
+    """Create a loan through the API and attach covenants; returns (loan_id, headers).
+
+    Each covenant is ``(name, threshold, operator[, current_value[, status]])``.
+    """
+    def make(*covenants, email="test@example.com", borrower_name="Test Corp", loan_amount=1000000):
+        headers = auth_headers(email)
+        loan_id = client.post("/loans", json={"borrower_name": borrower_name, "loan_amount": loan_amount},
+                              headers=headers).json()["id"]
+        if covenants:
+            session = TestingSessionLocal()
+            session.add_all([make_covenant(loan_id, *covenant) for covenant in covenants])
+            session.commit()
+            session.close()
+        return loan_id, headers
+    return make
+
+def _make_pdf(pages):
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for line in pages:
+        stream = b"BT /F1 12 Tf 72 720 Td (" + line.encode("latin-1") + b") Tj ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+@pytest.fixture
+def make_pdf():
+    """Build a minimal PDF with one line of Helvetica text per page"""
+    return _make_pdf
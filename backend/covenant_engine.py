@@ -1,67 +1,112 @@
 import re
+import asyncio
+import logging
+import math
 import os
 import json
+import numpy as np
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from openai import OpenAI as Client
-import openai as genai # Shadowing for minimal code change in class logic
-from tenacity import retry, stop_after_attempt, wait_fixed
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence
+
+import metrics
+from rule_engine import OPERATORS, RuleSet, covenant_rules
+
+logger = logging.getLogger(__name__)
 
 # --- Abstract Strategy ---
 class ExtractionStrategy(ABC):
+    # Identifies the extractor version in cache keys; bump when extraction output changes
+    model_name: str = ""
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{type(self).__name__}:{self.model_name}"
+
     @abstractmethod
     def extract(self, text: str) -> List[Dict[str, Any]]:
         pass
 
+    async def aextract(self, text: str) -> List[Dict[str, Any]]:
+        # Synchronous strategies run in a worker thread to keep the event loop free
+        return await asyncio.to_thread(self.extract, text)
+
 # --- Regex Strategy (Legacy/Fallback) ---
+class CovenantRule(NamedTuple):
+    name: str
+    pattern: str  # wording that introduces the covenant
+    operator: str
+    category: str = "Financial"
+    amount: bool = False  # threshold is a currency amount, e.g. "$25,000,000" or "25 million"
+
+COVENANT_RULES = [
+    CovenantRule("Debt-to-EBITDA", r"leverage|debt\s?to\s?ebitda|net\s?debt", "<="),
+    CovenantRule("Interest Coverage", r"interest\s?coverage", ">="),
+    CovenantRule("Current Ratio", r"current\s?ratio", ">="),
+    CovenantRule("Fixed Charge Coverage", r"fixed\s?charge\s?coverage", ">="),
+    CovenantRule("Minimum Net Worth", r"(?:minimum|tangible)\s+net\s+worth", ">=", amount=True),
+    CovenantRule("Capital Expenditures", r"capital\s+expenditures?|capex", "<=", amount=True),
+]
+
+# The gap between the wording and the number is bounded so every match is
+# found in a single left-to-right scan with no quadratic backtracking.
+MAX_CLAUSE_GAP = 150
+MAX_CLAUSE_LENGTH = 300
+AMOUNT_SCALES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mm": 1e6, "m": 1e6, "billion": 1e9, "bn": 1e9}
+CLAUSE_END = re.compile(r"[.;](?=\s|$)|\n\s*\n")
+
+def compile_rules(rules: Sequence[CovenantRule]) -> "re.Pattern":
+    alternatives = []
+    for i, rule in enumerate(rules):
+        value = rf"(?P<v{i}>\d[\d,]*(?:\.\d+)?)"
+        if rule.amount:
+            value += rf"\s*(?P<s{i}>thousand|million|billion|mm|bn|k|m)?\b"
+        alternatives.append(rf"\b(?:{rule.pattern})[^\d]{{0,{MAX_CLAUSE_GAP}}}?\$?{value}")
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
 class RegexStrategy(ExtractionStrategy):
-    def extract(self, text: str) -> List[Dict[str, Any]]:
-        covenants = []
-        
-        # Pattern 1: Leverage Ratio (Debt/EBITDA)
-        leverage_match = re.search(r"(?i)(leverage|debt\s?to\s?ebitda|net\s?debt).*?(\d+\.?\d*)x?", text)
-        if leverage_match:
-            covenants.append({
-                "name": "Debt-to-EBITDA",
-                "threshold": float(leverage_match.group(2)),
-                "operator": "<=",
-                "category": "Financial"
-            })
-            
-        # Pattern 2: Interest Coverage
-        ic_match = re.search(r"(?i)(interest\s?coverage).*?(\d+\.?\d*)", text)
-        if ic_match:
-            covenants.append({
-                "name": "Interest Coverage",
-                "threshold": float(ic_match.group(2)),
-                "operator": ">=",
-                "category": "Financial"
-            })
+    model_name = "regex-v2"
 
-        # Pattern 3: Current Ratio
-        cr_match = re.search(r"(?i)(current\s?ratio).*?(\d+\.?\d*)", text)
-        if cr_match:
-            covenants.append({
-                "name": "Current Ratio",
-                "threshold": float(cr_match.group(2)),
-                "operator": ">=",
-                "category": "Financial"
+    def __init__(self, rules: Sequence[CovenantRule] = COVENANT_RULES):
+        self.rules = list(rules)
+        self.pattern = compile_rules(self.rules)
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        """Return every covenant occurrence with its character offsets and clause"""
+        found = []
+        for match in self.pattern.finditer(text):
+            # The last group closed is the value (or scale) group of the rule that matched
+            i = int(match.lastgroup[1:])
+            rule = self.rules[i]
+
+            threshold = float(match.group(f"v{i}").replace(",", ""))
+            if rule.amount and match.group(f"s{i}"):
+                threshold *= AMOUNT_SCALES[match.group(f"s{i}").lower()]
+
+            start, end = match.start(), match.end()
+            clause_end = CLAUSE_END.search(text, end, start + MAX_CLAUSE_LENGTH)
+            clause = text[start:clause_end.start() if clause_end else min(len(text), start + MAX_CLAUSE_LENGTH)]
+            found.append({
+                "name": rule.name,
+                "threshold": threshold,
+                "operator": rule.operator,
+                "category": rule.category,
+                "clause": " ".join(clause.split()),
+                "start": start,
+                "end": end,
             })
-            
-        return covenants
+        return found
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        # One covenant per type; scan() keeps every occurrence
+        return merge_covenants([self.scan(text)])
 
 # --- LLM Strategy (OpenRouter / OpenAI Compatible) ---
-class LLMStrategy(ExtractionStrategy):
-    def __init__(self, api_key: str):
-        self.client = genai.Client(
-            base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
-            api_key=api_key
-        )
-        self.model_name = os.getenv("GEMINI_MODEL", "google/gemini-2.0-flash-exp:free")
+LLM_CHUNK_SIZE = int(os.getenv("LLM_CHUNK_SIZE", 8000))
+LLM_CHUNK_OVERLAP = int(os.getenv("LLM_CHUNK_OVERLAP", 500))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def extract(self, text: str) -> List[Dict[str, Any]]:
-        prompt = f"""
+def build_prompt(text: str) -> str:
+    return f"""
         Extract all financial covenants from the following loan agreement text.
         Return a JSON array where each object has:
         - name: str (e.g. "Debt-to-EBITDA")
@@ -71,58 +116,227 @@ class LLMStrategy(ExtractionStrategy):
         - clause: str (the snippet of text where found)
 
         Text:
-        {text[:8000]}  # Truncate to avoid context limits
+        {text}
         """
-        
+
+def parse_covenants(content: str) -> List[Dict[str, Any]]:
+    # Basic cleanup of markdown naming
+    clean_json = content.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_json)
+
+def split_into_chunks(text: str, chunk_size: int = LLM_CHUNK_SIZE, overlap: int = LLM_CHUNK_OVERLAP) -> List[str]:
+    """Split text into windows of chunk_size that overlap so clauses on a boundary appear whole in one chunk"""
+    step = max(chunk_size - overlap, 1)
+    return [text[start:start + chunk_size] for start in range(0, max(len(text) - overlap, 1), step)]
+
+CATEGORIES = ("Financial", "Reporting")
+
+def normalize_covenant(cov: Any) -> Optional[Dict[str, Any]]:
+    """The covenant with a float threshold, an operator and a category, or None if it cannot be used.
+
+    A missing operator is taken from the covenant type of the same name and a
+    missing category defaults to Financial.
+    """
+    if not isinstance(cov, dict) or not isinstance(cov.get("name"), str) or not cov["name"].strip():
+        return None
+    try:
+        threshold = float(cov.get("threshold"))
+    except (TypeError, ValueError):
+        return None
+    covenant_type = covenant_rules.types.get(cov["name"])
+    operator = cov.get("operator") or (covenant_type.operator if covenant_type else None)
+    category = cov.get("category") or "Financial"
+    if not math.isfinite(threshold) or operator not in OPERATORS or category not in CATEGORIES:
+        return None
+    return {**cov, "threshold": threshold, "operator": operator, "category": category}
+
+def merge_covenants(batches: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Flatten per-chunk results, keeping the first usable occurrence of each covenant name.
+
+    A chunk whose JSON is not a list, and items that normalize_covenant
+    rejects, are skipped rather than failing the whole document.
+    """
+    merged = {}
+    for batch in batches:
+        if not isinstance(batch, list):
+            continue
+        for cov in map(normalize_covenant, batch):
+            if cov is None:
+                continue
+            key = re.sub(r"[^a-z0-9]+", "", cov["name"].lower())
+            if key and key not in merged:
+                merged[key] = cov
+    return list(merged.values())
+
+def record_usage(strategy: str, response) -> None:
+    """Count the prompt/completion tokens the provider reports, when it reports them"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.llm_tokens.labels(strategy, "prompt").inc(usage.prompt_tokens or 0)
+        metrics.llm_tokens.labels(strategy, "completion").inc(usage.completion_tokens or 0)
+
+class LLMStrategy(ExtractionStrategy):
+    def __init__(self, api_key: str):
+        import openai  # the client library is heavy; only LLM deployments pay for it
+        self.client = openai.Client(
+            base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+            api_key=api_key
+        )
+        self.model_name = os.getenv("GEMINI_MODEL", "google/gemini-2.0-flash-exp:free")
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        from tenacity import Retrying, stop_after_attempt, wait_fixed
+        # Truncate to avoid context limits
+        prompt = build_prompt(text[:LLM_CHUNK_SIZE])
+
+        retries = metrics.llm_retries.labels(type(self).__name__)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            content = response.choices[0].message.content
-            # Basic cleanup of markdown naming
-            clean_json = content.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_json)
+            for attempt in Retrying(stop=stop_after_attempt(3), wait=wait_fixed(2), reraise=True,
+                                    before_sleep=lambda state: retries.inc()):
+                with attempt:
+                    response = self.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ]
+                    )
+                    record_usage(type(self).__name__, response)
+                    return parse_covenants(response.choices[0].message.content)
         except Exception as e:
-            print(f"LLM Extraction Error: {e}")
+            logger.error("LLM extraction error: %s", e)
             return []
 
+class ChunkedLLMStrategy(LLMStrategy):
+    """Map-reduce extraction over the whole document.
+
+    The text is split into overlapping chunks that are sent concurrently
+    (at most ``concurrency`` requests in flight) through the async client,
+    then the per-chunk results are merged by covenant name. Retries back off
+    with asyncio sleeps, so nothing blocks the event loop.
+    """
+
+    def __init__(self, api_key: str, chunk_size: int = LLM_CHUNK_SIZE, overlap: int = LLM_CHUNK_OVERLAP,
+                 concurrency: int = LLM_CONCURRENCY, base_url: str = None):
+        import openai
+        base_url = base_url or os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+        self.async_client = openai.AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+        self.model_name = os.getenv("GEMINI_MODEL", "google/gemini-2.0-flash-exp:free")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.concurrency = concurrency
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        return asyncio.run(self.aextract(text))
+
+    async def aextract(self, text: str) -> List[Dict[str, Any]]:
+        if not text.strip():
+            return []
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chunks = split_into_chunks(text, self.chunk_size, self.overlap)
+        batches = await asyncio.gather(*(self._extract_chunk(semaphore, chunk) for chunk in chunks))
+        return merge_covenants(batches)
+
+    async def _extract_chunk(self, semaphore: asyncio.Semaphore, chunk: str) -> List[Dict[str, Any]]:
+        from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+        async with semaphore:
+            try:
+                async for attempt in AsyncRetrying(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=8), reraise=True):
+                    if attempt.retry_state.attempt_number > 1:
+                        metrics.llm_retries.labels(type(self).__name__).inc()
+                    with attempt:
+                        response = await self.async_client.chat.completions.create(
+                            model=self.model_name,
+                            messages=[{"role": "user", "content": build_prompt(chunk)}]
+                        )
+                        record_usage(type(self).__name__, response)
+                        return parse_covenants(response.choices[0].message.content)
+            except Exception as e:
+                logger.error("LLM extraction error: %s", e)
+                return []
+
 # --- Context Manager ---
 class CovenantEngine:
-    def __init__(self, use_llm=False):
+    # Statuses in increasing order of severity; evaluate_many returns indexes into this
+    STATUSES = np.array(["Compliant", "Warning", "Breach"])
+
+    def __init__(self, use_llm=False, warning_band: float = 0.1, rules: RuleSet = None):
         api_key = os.getenv("GEMINI_API_KEY")
-        if use_llm and api_key:
+        if use_llm and api_key and os.getenv("LLM_STRATEGY", "chunked") == "single":
             self.strategy = LLMStrategy(api_key)
+        elif use_llm and api_key:
+            self.strategy = ChunkedLLMStrategy(api_key)
         else:
             self.strategy = RegexStrategy()
+        # Default band; covenant types in ``rules`` may set their own
+        self.warning_band = warning_band
+        self.rules = rules or covenant_rules
 
     def extract_covenants(self, text: str):
-        return self.strategy.extract(text)
+        with metrics.extraction_latency.labels(type(self.strategy).__name__).time():
+            return self.strategy.extract(text)
+
+    async def aextract_covenants(self, text: str):
+        with metrics.extraction_latency.labels(type(self.strategy).__name__).time():
+            return await self.strategy.aextract(text)
 
     def evaluate(self, covenant: Dict[str, Any], current_value: float):
-        # ... (Evaluation logic remains similar)
         thresh = covenant["threshold"]
         op = covenant["operator"]
-        
-        status = "Compliant"
-        if op == "<=" and current_value > thresh:
-            status = "Breach"
-        elif op == ">=" and current_value < thresh:
-            status = "Breach"
-        elif op == "<=" and current_value > (thresh * 0.9):
-            status = "Warning"
-        elif op == ">=" and current_value < (thresh * 1.1):
-            status = "Warning"
-            
+        names = [covenant["name"]] if covenant.get("name") else None
+        status = str(self.evaluate_many([thresh], [op], [current_value], names)[0])
+
         return {
             "status": status,
             "current_value": current_value,
             "threshold": thresh
         }
 
+    def warning_bands(self, names: Sequence[str]) -> np.ndarray:
+        """Warning band per covenant: its type's band, else the engine default"""
+        return self.rules.warning_bands(names, self.warning_band)
+
+    def status_codes(self, thresholds, operators, values, bands=None) -> np.ndarray:
+        """Status codes (0 Compliant, 1 Warning, 2 Breach) for broadcastable inputs.
+
+        Thresholds and operators may be column vectors against a matrix of
+        values, which is how stress scenarios are scored. Upper limits (<=, <)
+        warn within the band below the threshold, lower limits (>=, >) within
+        the band above it, and equality covenants breach on any deviation.
+        Missing values (NaN) evaluate as Compliant, as does an unknown operator.
+        ``bands`` (broadcastable like thresholds) overrides the default band.
+        """
+        band = self.warning_band if bands is None else np.asarray(bands, dtype=float)
+        thresh = np.asarray(thresholds, dtype=float)
+        val = np.asarray(values, dtype=float)
+        ops = np.asarray(operators, dtype=object)
+
+        # Signed distance past the threshold: positive means on the breach side
+        upper = (ops == "<=") | (ops == "<")
+        lower = (ops == ">=") | (ops == ">")
+        sign = np.where(upper, 1.0, np.where(lower, -1.0, np.nan))
+        distance = (val - thresh) * sign
+
+        breach = (distance > 0) | ((distance == 0) & ((ops == "<") | (ops == ">")))
+        equal = ops == "="
+        if equal.any():
+            breach = breach | (equal & ~np.isclose(val, thresh) & ~np.isnan(val))
+        warning = distance > -thresh * band
+        return np.where(breach, 2, warning).astype(np.int8)
+
+    def evaluate_many(self, thresholds: Sequence[float], operators: Sequence[str], values: Sequence[float],
+                      names: Sequence[str] = None) -> np.ndarray:
+        """Evaluate a whole batch of covenants in one vectorized pass.
+
+        Returns an array of status strings aligned with the inputs, see
+        status_codes for the rules. With covenant ``names``, each covenant
+        type's warning band applies and its operator fills in missing ones.
+        """
+        bands = None
+        if names is not None:
+            bands = self.warning_bands(names)
+            operators = self.rules.operators(names, operators)
+        return self.STATUSES[self.status_codes(thresholds, operators, values, bands)]
+
     def generate_explanation(self, covenant: Dict[str, Any], result: Dict[str, Any]):
         # ... (Use existing explanation logic)
         status = result["status"]
@@ -1,38 +1,175 @@
+import csv
+import os
+import time
+from datetime import datetime
+from typing import Optional, Union
+
 import pandas as pd
-import io
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from excel_reader import read_excel_columns
+from rule_engine import covenant_rules
+import metrics
+
+PERIOD_COLUMNS = ("period", "date", "fiscal_period", "quarter", "year")
+# Every column the covenant formulas read; uploads are projected onto these
+NUMERIC_COLUMNS = covenant_rules.fields + ("loan_id",)
+FINANCIAL_COLUMNS = NUMERIC_COLUMNS + PERIOD_COLUMNS
+CSV_NULL_VALUES = ["", "NA", "N/A", "n/a", "NaN", "nan", "null", "NULL", "-", "#N/A"]
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+HEADER_BYTES = 65536
+# File types reported on the parse-time histogram; anything else is "other"
+PARSED_EXTENSIONS = (".csv", ".parquet", ".xlsx", ".xlsm", ".xls") + ARROW_EXTENSIONS
+
+# Raw upload bytes or the path of a spooled upload
+FinancialSource = Union[bytes, str, os.PathLike]
+
+def open_source(source: FinancialSource) -> pa.NativeFile:
+    """Zero-copy Arrow input: a buffer over bytes or a memory map of a file"""
+    if isinstance(source, (bytes, bytearray)):
+        return pa.BufferReader(source)
+    return pa.memory_map(os.fspath(source))
+
+def normalize_column(name) -> str:
+    return str(name).strip().lower()
+
+def project_columns(names) -> dict:
+    """Map each source column to its normalized name, keeping only FINANCIAL_COLUMNS (first wins)"""
+    selected = {}
+    for name in names:
+        normalized = normalize_column(name)
+        if normalized in FINANCIAL_COLUMNS and normalized not in selected.values():
+            selected[name] = normalized
+    return selected
 
 class DataProcessor:
-    def normalize_financials(self, file_content: bytes, filename: str):
-        if filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(file_content))
+    def normalize_financials(
+        self, source: FinancialSource, filename: str,
+        sheet_pattern: Optional[str] = None, max_rows: Optional[int] = None
+    ):
+        """Parse an upload into a frame of the financial columns only, with lowercase headers.
+
+        ``source`` is the raw bytes or a file path, which is memory-mapped
+        rather than read into memory. CSV goes through the pyarrow reader;
+        Parquet and Arrow IPC read only the projected columns from the file.
+        Numeric inputs come back as float64. Excel workbooks are streamed by
+        excel_reader, from the sheet matching ``sheet_pattern``, keeping its
+        last ``max_rows`` rows.
+        """
+        start = time.perf_counter()
+        extension = os.path.splitext(filename.lower())[1]
+        if extension == ".csv":
+            df, columns = self._read_csv(source)
+        elif extension == ".parquet":
+            with pq.ParquetFile(open_source(source)) as parquet:
+                columns = project_columns(parquet.schema_arrow.names)
+                df = self._to_frame(parquet.read(columns=list(columns)), columns)
+        elif extension in ARROW_EXTENSIONS:
+            df, columns = self._read_ipc(source)
         else:
-            df = pd.read_excel(io.BytesIO(file_content))
-            
-        # Basic normalization (stripping names, converting to lower)
-        df.columns = [str(c).strip().lower() for c in df.columns]
+            df = read_excel_columns(source, filename, lambda name: normalize_column(name) in FINANCIAL_COLUMNS,
+                                    sheet_pattern=sheet_pattern, max_rows=max_rows)
+            columns = project_columns(df.columns)
+            df = pd.DataFrame({
+                name: pd.to_numeric(df[name], errors="coerce").astype("float64") if normalized in NUMERIC_COLUMNS else df[name]
+                for name, normalized in columns.items()
+            })
+
+        df.columns = [columns[c] for c in df.columns]
+        file_type = extension.lstrip(".") if extension in PARSED_EXTENSIONS else "other"
+        metrics.parse_latency.labels(file_type).observe(time.perf_counter() - start)
         return df
 
-    def calculate_ratios(self, df):
-        # Expected columns: 'revenue', 'expenses', 'interest', 'total_debt', 'ebitda'
-        # In a real app, this would be much more robust mapping
-        
-        results = {}
+    def _read_csv(self, source: FinancialSource):
+        with open_source(source) as stream:
+            header = stream.read(HEADER_BYTES)
+        first_line = header.decode("utf-8-sig", errors="replace").partition("\n")[0]
+        columns = project_columns(next(csv.reader([first_line]), []))
+        if not columns:
+            return pd.DataFrame(), columns
+        types = {name: pa.float64() if normalized in NUMERIC_COLUMNS else pa.string() for name, normalized in columns.items()}
         try:
-            # Assume single row for last period
-            latest = df.iloc[-1]
-            
-            if 'ebitda' in latest and 'total_debt' in latest:
-                results['Debt-to-EBITDA'] = round(latest['total_debt'] / latest['ebitda'], 2)
-            
-            if 'ebitda' in latest and 'interest' in latest and latest['interest'] != 0:
-                results['Interest Coverage'] = round(latest['ebitda'] / latest['interest'], 2)
-                
-            if 'current_assets' in latest and 'current_liabilities' in latest and latest['current_liabilities'] != 0:
-                results['Current Ratio'] = round(latest['current_assets'] / latest['current_liabilities'], 2)
-                
-        except Exception as e:
-            print(f"Error calculating ratios: {e}")
-            
+            table = self._read_csv_table(source, columns, types)
+        except pa.ArrowInvalid:
+            # Stray text in a numeric column: read as strings, compute_ratio_frame coerces them to NaN
+            table = self._read_csv_table(source, columns, dict.fromkeys(columns, pa.string()))
+        return table.to_pandas(), columns
+
+    def _read_csv_table(self, source: FinancialSource, columns: dict, types: dict) -> pa.Table:
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=list(columns), column_types=types,
+            null_values=CSV_NULL_VALUES, strings_can_be_null=True,
+        )
+        with open_source(source) as stream:
+            return pa_csv.read_csv(stream, convert_options=convert_options)
+
+    def _read_ipc(self, source: FinancialSource):
+        with open_source(source) as stream:
+            try:
+                reader = pa.ipc.open_file(stream)
+            except pa.ArrowInvalid:
+                # Streaming format has no footer, so it cannot skip unused columns
+                stream.seek(0)
+                table = pa.ipc.open_stream(stream).read_all()
+                columns = project_columns(table.column_names)
+                return self._to_frame(table.select(list(columns)), columns), columns
+            columns = project_columns(reader.schema.names)
+            # Decompresses and reads only the projected columns
+            stream.seek(0)
+            table = feather.read_table(stream, columns=list(columns))
+            return self._to_frame(table, columns), columns
+
+    def _to_frame(self, table: pa.Table, columns: dict) -> pd.DataFrame:
+        for i, name in enumerate(table.column_names):
+            field_type = table.schema.field(i).type
+            if columns[name] in NUMERIC_COLUMNS and (pa.types.is_integer(field_type) or pa.types.is_floating(field_type) or pa.types.is_decimal(field_type)):
+                table = table.set_column(i, name, table.column(i).cast(pa.float64()))
+        return table.to_pandas()
+
+    def compute_ratio_frame(self, df, uploaded_at: Optional[datetime] = None) -> pd.DataFrame:
+        """Compute every ratio for every period (row) in one vectorized pass.
+
+        Ratios are the covenant type formulas of rule_engine.covenant_rules;
+        a type is skipped when the upload lacks one of its fields. Returns a
+        frame with a ``period`` column (plus ``loan_id`` for multi-loan files)
+        and one column per ratio, in the row order of the upload (the last
+        row of a loan is its latest period). A ratio is NaN where its inputs
+        are missing or a denominator is zero.
+
+        Without a period column, rows are labelled with the upload time
+        (``uploaded_at``, default now, UTC) and their row number, so the
+        observation history of each upload is kept rather than overwritten
+        by the next one.
+        """
+        period_col = next((c for c in PERIOD_COLUMNS if c in df.columns), None)
+        if period_col:
+            periods = df[period_col].astype(str)
+        else:
+            stamp = (uploaded_at or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%S.%f")
+            width = len(str(len(df)))
+            periods = pd.Series([f"{stamp}/{row:0{width}d}" for row in range(1, len(df) + 1)], index=df.index, dtype=object)
+        frame = pd.DataFrame({"period": periods.values})
+        if "loan_id" in df.columns:
+            frame.insert(0, "loan_id", pd.to_numeric(df["loan_id"], errors="coerce").values)
+
+        # Each field is converted once and shared by every compiled formula
+        columns = {
+            field: pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=float)
+            for field in covenant_rules.fields if field in df.columns
+        }
+        for name, values in covenant_rules.evaluate(columns).items():
+            frame[name] = values.round(2)
+        return frame
+
+    def latest_ratios(self, frame: pd.DataFrame):
+        results = {}
+        if len(frame):
+            latest = frame.iloc[-1].drop(["loan_id", "period"], errors="ignore")
+            results = {name: float(value) for name, value in latest.dropna().items()}
+
         # Fallback for demo
         if not results:
             results = {
@@ -40,5 +177,9 @@ class DataProcessor:
                 "Interest Coverage": 2.5,
                 "Current Ratio": 1.2
             }
-            
+
         return results
+
+    def calculate_ratios(self, df):
+        # Columns are the fields of the covenant formulas (see rule_engine.COVENANT_TYPES)
+        return self.latest_ratios(self.compute_ratio_frame(df))
@@ -1,9 +1,30 @@
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 import logging
+import time
+
+import metrics
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait and checkouts needing an overflow connection"""
+    metrics_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow = self._overflow
+        try:
+            return super()._do_get()
+        finally:
+            metrics.pool_checkout_wait.labels(self.metrics_label).observe(time.perf_counter() - start)
+            if self._overflow > overflow and self._overflow > 0:
+                metrics.pool_overflow_checkouts.labels(self.metrics_label).inc()
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    metrics_label = "async"
 
 # Production database configuration
 SQLALCHEMY_DATABASE_URL = os.getenv(
@@ -13,7 +34,9 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
 # Production engine with connection pooling
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    poolclass=QueuePool,
+    # SQLite connections are handed between request threads and job worker threads
+    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {},
+    poolclass=InstrumentedQueuePool,
     pool_size=10,
     max_overflow=20,
     pool_pre_ping=True,
@@ -29,6 +52,60 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
 
+def async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    if url.startswith(("postgresql://", "postgresql+psycopg2://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(SQLALCHEMY_DATABASE_URL))
+
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_engine():
+    """Async engine used by main_prod's handlers; same pool sizing as the sync engine.
+
+    Created on first use, so the sync app (main.py, the Vercel handler)
+    never needs an async driver installed.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_pre_ping=True,
+            echo=os.getenv("SQL_DEBUG", "false").lower() == "true",
+            **({} if "sqlite" in ASYNC_DATABASE_URL else {
+                "poolclass": InstrumentedAsyncQueuePool, "pool_size": 10, "max_overflow": 20, "pool_recycle": 3600
+            })
+        )
+        event.listen(_async_engine.sync_engine, "connect", set_sqlite_pragma)
+    return _async_engine
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+def pool_stats():
+    """Connections checked out and overflow in use, per pool, read at scrape time"""
+    stats = {}
+    pools = [engine.pool] + ([_async_engine.sync_engine.pool] if _async_engine is not None else [])
+    for pool in pools:
+        if isinstance(pool, InstrumentedQueuePool):
+            stats[pool.metrics_label] = (pool.checkedout(), max(pool.overflow(), 0), pool.size())
+    return stats
+
+metrics.CallbackGauge("creditsentinel_db_pool_checked_out", "Connections currently checked out", ("pool",),
+                     lambda: {(label,): values[0] for label, values in pool_stats().items()})
+metrics.CallbackGauge("creditsentinel_db_pool_overflow", "Overflow connections currently open", ("pool",),
+                     lambda: {(label,): values[1] for label, values in pool_stats().items()})
+metrics.CallbackGauge("creditsentinel_db_pool_size", "Configured pool size", ("pool",),
+                     lambda: {(label,): values[2] for label, values in pool_stats().items()})
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -43,6 +120,15 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        try:
+            yield db
+        except Exception as e:
+            await db.rollback()
+            logging.error(f"Database error: {e}")
+            raise
+
 def init_db():
     """Initialize database with proper error handling"""
     try:
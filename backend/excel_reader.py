@@ -0,0 +1,122 @@
+import io
+import os
+import re
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Sequence, Union
+
+import openpyxl
+import pandas as pd
+
+ExcelSource = Union[bytes, str, os.PathLike]
+
+# "auto" prefers calamine when python-calamine is installed, then openpyxl read-only
+# streaming for .xlsx/.xlsm; "pandas" is pd.read_excel
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+# Case-insensitive regex on sheet names; unset picks the first sheet with a wanted column
+EXCEL_SHEET_PATTERN = os.getenv("EXCEL_SHEET_PATTERN") or None
+# Data rows kept from the bottom of the sheet, where the latest periods are; 0 keeps every row
+EXCEL_MAX_ROWS = int(os.getenv("EXCEL_MAX_ROWS", 0)) or None
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+ENGINES = ("auto", "calamine", "openpyxl", "pandas")
+
+def resolve_engine(engine: Optional[str], filename: str) -> str:
+    engine = engine or EXCEL_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Excel engine: {engine}")
+    if engine == "calamine" and CalamineWorkbook is None:
+        raise ValueError("The calamine engine requires the python-calamine package")
+    if engine == "auto":
+        if CalamineWorkbook is not None:
+            return "calamine"
+        # openpyxl only reads the OOXML formats
+        return "openpyxl" if filename.lower().endswith((".xlsx", ".xlsm")) else "pandas"
+    return engine
+
+def _frame(rows: Iterable[Sequence], wanted: Callable[[str], bool], max_rows: Optional[int]) -> Optional[pd.DataFrame]:
+    """DataFrame of the wanted columns from header + data rows; None when the header has none"""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return None
+    indexes = [i for i, name in enumerate(header) if name is not None and wanted(str(name))]
+    if not indexes:
+        return None
+
+    # A bounded tail: statements run oldest to newest, and the last row is the latest period
+    kept = deque(maxlen=max_rows)
+    for row in rows:
+        cells = [row[i] if i < len(row) else None for i in indexes]
+        if all(cell is None or cell == "" for cell in cells):
+            continue  # formatted but empty rows at the bottom of ERP exports
+        kept.append([None if cell == "" else cell for cell in cells])
+    values: List[tuple] = list(zip(*kept)) or [() for _ in indexes]
+    return pd.DataFrame({str(header[i]): list(column) for i, column in zip(indexes, values)})
+
+def _select(sheet_names: List[str], pattern: Optional[str]) -> List[str]:
+    if pattern is None:
+        return sheet_names
+    regex = re.compile(pattern, re.IGNORECASE)
+    return [name for name in sheet_names if regex.search(name)]
+
+def _read_openpyxl(source, wanted, pattern, max_rows) -> pd.DataFrame:
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for name in _select(workbook.sheetnames, pattern):
+            df = _frame(workbook[name].iter_rows(values_only=True), wanted, max_rows)
+            if df is not None:
+                return df
+    finally:
+        workbook.close()
+    return pd.DataFrame()
+
+def _read_calamine(source, wanted, pattern, max_rows) -> pd.DataFrame:
+    workbook = CalamineWorkbook.from_object(source)
+    for name in _select(workbook.sheet_names, pattern):
+        df = _frame(workbook.get_sheet_by_name(name).to_python(), wanted, max_rows)
+        if df is not None:
+            return df
+    return pd.DataFrame()
+
+def _read_pandas(source, wanted, pattern, max_rows) -> pd.DataFrame:
+    sheets = _select(pd.ExcelFile(source).sheet_names, pattern)
+    for name in sheets:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        df = pd.read_excel(source, sheet_name=name, usecols=lambda column: wanted(str(column)))
+        if len(df.columns):
+            return df if max_rows is None else df.dropna(how="all").tail(max_rows).reset_index(drop=True)
+    return pd.DataFrame()
+
+READERS = {"calamine": _read_calamine, "openpyxl": _read_openpyxl, "pandas": _read_pandas}
+
+def read_excel_columns(
+    source: ExcelSource,
+    filename: str,
+    wanted: Callable[[str], bool],
+    sheet_pattern: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> pd.DataFrame:
+    """Read the columns whose header satisfies ``wanted`` from one worksheet.
+
+    The first row of a sheet is its header. The sheet is the first one whose
+    name matches ``sheet_pattern`` (default EXCEL_SHEET_PATTERN) and whose
+    header has a wanted column. Only the last ``max_rows`` data rows are kept
+    (default EXCEL_MAX_ROWS), so the latest period stays the last row. Returns
+    an empty frame when no sheet qualifies. Every engine but pandas streams
+    rows without building the workbook object model, holding at most
+    ``max_rows`` of them.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    reader = READERS[resolve_engine(engine, filename)]
+    return reader(
+        source, wanted,
+        EXCEL_SHEET_PATTERN if sheet_pattern is None else sheet_pattern,
+        EXCEL_MAX_ROWS if max_rows is None else max_rows,
+    )
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", 256))
+EXTRACTION_CACHE_MAX_ROWS = int(os.getenv("EXTRACTION_CACHE_MAX_ROWS", 10000))
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def file_digest(path: str) -> str:
+    """content_digest of a file, hashed in chunks"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def make_key(digest: str, namespace: str) -> str:
+    """Cache key for a document digest under a strategy/model namespace"""
+    return hashlib.sha256(f"{digest}:{namespace}".encode()).hexdigest()
+
+class ExtractionCache:
+    """Two-tier cache of extracted covenants keyed by document content.
+
+    The first tier is an in-process LRU; the second is the ``extraction_cache``
+    table, trimmed to ``max_rows`` least recently used entries. Empty results
+    are never cached so a transient LLM failure is retried on the next upload.
+    """
+
+    def __init__(self, max_entries: int = EXTRACTION_CACHE_SIZE, max_rows: int = EXTRACTION_CACHE_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, db: Session, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            covenants = self._entries.get(key)
+            if covenants is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return covenants
+
+        entry = db.execute(
+            select(models.ExtractionCacheEntry.covenants).where(models.ExtractionCacheEntry.cache_key == key)
+        ).scalar_one_or_none()
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        db.execute(
+            update(models.ExtractionCacheEntry)
+            .where(models.ExtractionCacheEntry.cache_key == key)
+            .values(hit_count=models.ExtractionCacheEntry.hit_count + 1, last_used_at=datetime.utcnow())
+        )
+        db.commit()
+        covenants = json.loads(entry)
+        with self._lock:
+            self.persistent_hits += 1
+        self._remember(key, covenants)
+        return covenants
+
+    def put(self, db: Session, key: str, namespace: str, covenants: List[Dict[str, Any]]) -> None:
+        if not covenants:
+            return
+        self._remember(key, covenants)
+        try:
+            db.add(models.ExtractionCacheEntry(cache_key=key, strategy=namespace, covenants=json.dumps(covenants)))
+            db.commit()
+        except IntegrityError:
+            # A concurrent upload of the same document stored it first
+            db.rollback()
+            return
+        self._trim(db)
+
+    def _remember(self, key: str, covenants: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = covenants
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _trim(self, db: Session) -> None:
+        stale = select(models.ExtractionCacheEntry.id).order_by(
+            models.ExtractionCacheEntry.last_used_at.desc()
+        ).offset(self.max_rows)
+        result = db.execute(delete(models.ExtractionCacheEntry).where(models.ExtractionCacheEntry.id.in_(stale)))
+        db.commit()
+        if result.rowcount:
+            with self._lock:
+                self.evictions += result.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
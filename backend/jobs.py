@@ -0,0 +1,117 @@
+import json
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from pipelines import process_agreement, process_financials
+from text_extractor import parse_in_process
+from uploads import remove_spooled
+import models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# "process" for CPU-heavy parsing in separate processes, "thread" to run jobs in-process
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "process")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+INTERRUPTED_ERROR = "Interrupted by restart"
+
+JOB_PIPELINES = {
+    "agreement": (process_agreement, "AGREEMENT_UPLOADED", "Agreement uploaded: {}"),
+    "financials": (process_financials, "FINANCIALS_ANALYZED", "Financials analyzed: {}"),
+}
+
+_executor: Optional[Executor] = None
+
+def get_executor() -> Executor:
+    """Job pool; in process mode its workers are spawned, not forked from the threaded API
+    process, and parse PDFs in-process so at most JOB_WORKERS processes run"""
+    global _executor
+    if _executor is None:
+        if JOB_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        else:
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=parse_in_process
+            )
+    return _executor
+
+def fail_interrupted_jobs(db: Session) -> int:
+    """Mark jobs left queued or running by a previous process as failed; returns how many"""
+    result = db.execute(
+        update(models.Job).where(models.Job.status.in_((JOB_QUEUED, JOB_RUNNING)))
+        .values(status=JOB_FAILED, error=INTERRUPTED_ERROR, updated_at=datetime.utcnow())
+    )
+    db.commit()
+    return result.rowcount
+
+def start_executor() -> None:
+    """Startup: fail the jobs a previous process never finished, then create the pool.
+
+    Their work lived only in that process's pool, so without this they would
+    report queued or running forever. Must run before this process submits a job.
+    """
+    db = SessionLocal()
+    try:
+        interrupted = fail_interrupted_jobs(db)
+    finally:
+        db.close()
+    if interrupted:
+        logger.warning("Marked %d jobs interrupted by a restart as failed", interrupted)
+    get_executor()
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+def create_job(db: Session, kind: str, user_id: int, loan_id: int, filename: str) -> models.Job:
+    job = models.Job(id=uuid.uuid4().hex, kind=kind, status=JOB_QUEUED, user_id=user_id, loan_id=loan_id, filename=filename)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def submit_job(job_id: str, kind: str, spooled_path: Optional[str] = None, **kwargs: Any) -> None:
+    """Queue a job created with create_job; kwargs are passed to the pipeline.
+
+    ``spooled_path`` is a temp file the job owns and removes when it finishes.
+    """
+    get_executor().submit(run_job, job_id, kind, kwargs, spooled_path)
+
+def _update_job(db: Session, job_id: str, **values: Any) -> None:
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(updated_at=datetime.utcnow(), **values))
+    db.commit()
+
+def run_job(job_id: str, kind: str, kwargs: Dict[str, Any], spooled_path: Optional[str] = None) -> None:
+    """Worker entry point: run the pipeline for a job and record its outcome"""
+    pipeline, event_type, details = JOB_PIPELINES[kind]
+    db = SessionLocal()
+    try:
+        job = db.get(models.Job, job_id)
+        _update_job(db, job_id, status=JOB_RUNNING, progress=10)
+        result = pipeline(db, job.loan_id, progress=lambda percent: _update_job(db, job_id, progress=percent), **kwargs)
+
+        db.add(models.AuditLog(event_type=event_type, details=details.format(job.filename), user_id=job.user_id, loan_id=job.loan_id))
+        _update_job(db, job_id, status=JOB_SUCCEEDED, progress=100, result=json.dumps(result))
+    except Exception as e:
+        logger.error("Job %s failed: %s", job_id, e)
+        db.rollback()
+        _update_job(db, job_id, status=JOB_FAILED, error=str(e))
+    finally:
+        db.close()
+        if spooled_path is not None:
+            remove_spooled(spooled_path)
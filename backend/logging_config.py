@@ -1,47 +1,200 @@
+import atexit
 import logging
-import structlog
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import structlog
+
+import metrics
+
+# Records are handed to a listener thread; formatting and disk I/O happen there
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "logs/creditsentinel.log")  # empty disables the file
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # or "console" for the stream handler
+# Comma-separated EVENT_TYPE=rate pairs; 0.1 keeps one record in ten of that event type
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "LOGIN_FAILED=0.1")
+
+# Record attributes (set through ``extra=``) copied into the structured output
+EXTRA_FIELDS = ("event_type", "user_id", "loan_id", "sample_rate")
+# Message arguments of these types are left for the listener to format
+IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+dropped_records = metrics.Counter("creditsentinel_log_records_dropped", "Log records dropped because the log queue was full")
+sampled_out_records = metrics.Counter("creditsentinel_log_records_sampled_out", "Log records skipped by event-type sampling", ("event_type",))
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        event_type, _, rate = pair.partition("=")
+        rates[event_type.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+class EventSampler(logging.Filter):
+    """Keep one record in every 1/rate per ``event_type``; other records always pass.
+
+    Runs on the logging thread before the record is queued, so sampled-out
+    records cost a dict lookup and a counter increment. Kept records carry
+    ``sample_rate`` so readers can scale counts back up.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.every = {event_type: round(1 / rate) if rate > 0 else 0 for event_type, rate in rates.items()}
+        self.rates = rates
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event_type = getattr(record, "event_type", None)
+        every = self.every.get(event_type)
+        if every is None:
+            return True
+        with self._lock:
+            seen = self._seen.get(event_type, 0)
+            self._seen[event_type] = seen + 1
+        if every and seen % every == 0:
+            record.sample_rate = self.rates[event_type]
+            return True
+        sampled_out_records.labels(event_type).inc()
+        return False
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that queues the record unformatted and never blocks.
+
+    The stock handler formats the message on the calling thread. Here
+    getMessage() and the formatter run on the listener thread, unless an
+    argument is mutable (an ORM object, a dict) and could change or lazy-load
+    before then. A full queue drops the record and counts it instead of
+    waiting.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+def add_timestamp(logger, method_name, event_dict):
+    """ISO timestamp of the logging call, not of the (later) formatting"""
+    record = event_dict.get("_record")
+    created = record.created if record is not None else time.time()
+    event_dict["timestamp"] = datetime.fromtimestamp(created, timezone.utc).isoformat(timespec="milliseconds")
+    return event_dict
+
+def build_formatter(renderer) -> structlog.stdlib.ProcessorFormatter:
+    return structlog.stdlib.ProcessorFormatter(
+        # Applied to stdlib records; structlog events arrive already processed
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.ExtraAdder(EXTRA_FIELDS),
+        ],
+        processors=[
+            add_timestamp,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            renderer,
+        ],
+    )
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[LazyQueueHandler] = None
+_console_handler: Optional[logging.Handler] = None
 
 def configure_logging():
-    """Configure structured logging for production"""
-    
-    # Create logs directory
-    os.makedirs("logs", exist_ok=True)
-    
-    # Configure structlog
+    """Route all logging through a bounded queue to a listener thread.
+
+    Calling threads only filter and enqueue the record. The listener thread
+    formats it as structured JSON and writes it to stderr and to LOG_FILE,
+    which rotates at LOG_MAX_BYTES keeping LOG_BACKUP_COUNT files. Event
+    types in LOG_SAMPLE_RATES are sampled before they are queued. Safe to
+    call again; the previous pipeline is stopped first.
+    """
+    global _listener, _queue_handler, _console_handler
+    stop_logging()
+
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
             structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
             structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
-    
-    # Configure standard logging
-    logging.basicConfig(
-        level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(f"logs/creditsentinel_{datetime.now().strftime('%Y%m%d')}.log"),
-            logging.StreamHandler()
-        ]
-    )
-    
+
+    _console_handler = logging.StreamHandler()
+    _console_handler.setFormatter(build_formatter(
+        structlog.dev.ConsoleRenderer(colors=False) if LOG_FORMAT == "console" else structlog.processors.JSONRenderer()
+    ))
+    handlers = [_console_handler]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True
+        )
+        file_handler.setFormatter(build_formatter(structlog.processors.JSONRenderer()))
+        handlers.append(file_handler)
+
+    _queue_handler = LazyQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(EventSampler(parse_sample_rates(LOG_SAMPLE_RATES)))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
+    root.addHandler(_queue_handler)
+
     # Suppress noisy loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
+def stop_logging():
+    """Write out everything still queued and detach the pipeline"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def _after_fork_in_child():
+    # Job and PDF worker processes have no listener thread; they log straight to stderr
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        root.addHandler(_console_handler)
+        _queue_handler = None
+        _listener = None
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(stop_logging)
+
 def get_logger(name: str):
     """Get a structured logger instance"""
     return structlog.get_logger(name)
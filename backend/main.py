@@ -3,22 +3,26 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import io
-import uvicorn
 import os
 
-from covenant_engine import CovenantEngine
-from data_processor import DataProcessor
 from database import engine, get_db
 import models
 import schemas
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
-import pdfplumber
+from auth import Principal, get_password_hash, verify_password, create_access_token, get_current_user
 
-# Create tables (Dev only - use Alembic for Prod)
-models.Base.metadata.create_all(bind=engine)
+# pandas, pdfplumber, numpy and the LLM client are imported by the endpoints that use them,
+# so a cold start serving /health or /token does not load them
 
-app = FastAPI(title="CreditSentinel API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables (Dev only - use Alembic for Prod); at startup rather than on import
+    models.Base.metadata.create_all(bind=engine)
+    yield
+
+app = FastAPI(title="CreditSentinel API", lifespan=lifespan)
 
 # Enable CORS for development
 app.add_middleware(
@@ -29,8 +33,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-engine_ai = CovenantEngine()
-processor = DataProcessor()
+@lru_cache(maxsize=None)
+def get_engine_ai():
+    from covenant_engine import CovenantEngine
+    return CovenantEngine()
+
+@lru_cache(maxsize=None)
+def get_processor():
+    from data_processor import DataProcessor
+    return DataProcessor()
 
 
 # Helper to log events (persisted to DB)
@@ -75,49 +86,26 @@ def health_check(db: Session = Depends(get_db)):
 
 # --- Protected Endpoints ---
 @app.get("/logs")
-async def get_logs(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def get_logs(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     logs = db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).limit(50).all()
     return logs
 
 @app.post("/simulate")
-async def simulate(data: dict, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    # ... (Keep simulation logic but use current_user for logs)
-    ebitda_factor = 1.0 + data.get("ebitda_change", 0.0)
-    debt_factor = 1.0 + data.get("debt_change", 0.0)
-    
-    simulation_results = []
-    base_ratios = {"Debt-to-EBITDA": 3.2, "Interest Coverage": 2.5, "Current Ratio": 1.2}
-    
-    # Normally fetch active covenants from DB
-    covenants = db.query(models.Covenant).all() or engine_ai.extract_covenants("")
-    
-    for cov in covenants:
-        # Handle dict or ORM object
-        name = cov.name if isinstance(cov, models.Covenant) else cov["name"]
-        val = base_ratios.get(name, 1.0)
-        
-        if name == "Debt-to-EBITDA":
-            sim_val = round(val * (debt_factor / ebitda_factor), 2)
-        elif name == "Interest Coverage":
-            sim_val = round(val * ebitda_factor, 2)
-        else:
-            sim_val = val
-            
-        # Needs adapter for evaluating ORM objects vs dicts
-        cov_dict = cov.__dict__ if isinstance(cov, models.Covenant) else cov
-        eval_res = engine_ai.evaluate(cov_dict, sim_val)
-        
-        simulation_results.append({
-            "name": name,
-            **eval_res,
-            "explanation": engine_ai.generate_explanation(cov_dict, eval_res)
-        })
-    
-    log_event(db, "Simulation", f"What-if run (EBITDA: {ebitda_factor}x, Debt: {debt_factor}x)", current_user.id)
-    return simulation_results
+def simulate(params: schemas.StressTestRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    from pipelines import stress_covenants_query, run_stress_test
+    # Monte Carlo or grid stress test from each loan's latest covenant values
+    rows = db.execute(stress_covenants_query(current_user.id, params.loan_ids)).all()
+    try:
+        result = run_stress_test(rows, params.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    log_event(db, "Simulation", f"Stress test run ({params.mode}, {result['scenarios']} scenarios, {result['loans_evaluated']} loans)", current_user.id)
+    return result
 
 @app.post("/upload-agreement")
-async def upload_agreement(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def upload_agreement(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    import pdfplumber
     content = await file.read()
     
     # Robust text extraction
@@ -132,7 +120,7 @@ async def upload_agreement(file: UploadFile = File(...), db: Session = Depends(g
     else:
         text = content.decode("utf-8", errors="ignore") 
     
-    covenants = engine_ai.extract_covenants(text)
+    covenants = get_engine_ai().extract_covenants(text)
     
     # Persist covenants
     for cov in covenants:
@@ -150,7 +138,9 @@ async def upload_agreement(file: UploadFile = File(...), db: Session = Depends(g
     return {"filename": file.filename, "status": "processed", "covenants": covenants}
 
 @app.post("/upload-financials")
-async def upload_financials(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def upload_financials(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    processor = get_processor()
+    engine_ai = get_engine_ai()
     content = await file.read()
     df = processor.normalize_financials(content, file.filename)
     ratios = processor.calculate_ratios(df)
@@ -189,4 +179,5 @@ if os.path.exists("../frontend/build/web"):
     app.mount("/", StaticFiles(directory="../frontend/build/web", html=True), name="static")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,32 +1,45 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, status, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Optional, Union
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import io
 import uvicorn
 import os
 import logging
 import magic
 from contextlib import asynccontextmanager
 
-from covenant_engine import CovenantEngine
-from data_processor import DataProcessor
-from database import engine, get_db, init_db
+from extraction_cache import make_key
+from pipelines import (
+    engine_ai, processor, extraction_cache, agreement_text, validate_covenants, persist_covenants, apply_financials,
+    apply_bulk_financials, stress_covenants_query, run_stress_test
+)
+from text_extractor import shutdown_executor, start_executor
+import jobs
+from audit import audit_writer
+from portfolio import COVENANT_STATUSES, portfolio_summary_query, summarize_portfolio
+from uploads import BodySizeLimitMiddleware, SpooledUpload, spool_upload
+from pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, NEXT_CURSOR_HEADER, keyset, next_cursor, stream_ndjson
+from database import engine, get_db, get_async_db, init_db
+from logging_config import configure_logging, stop_logging
+import metrics
+from profiler import PROFILE_ENABLED, ProfilerMiddleware
 import models
 import schemas
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
-import pdfplumber
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from auth import (
+    Principal, principal_cache, aget_password_hash, averify_password, create_access_token, aget_current_user,
+    shutdown_hash_executor
 )
+
 logger = logging.getLogger(__name__)
 
 # Rate limiting
@@ -34,12 +47,20 @@ limiter = Limiter(key_func=get_remote_address)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup: structured logging through a queue, so formatting and file I/O stay off the request path
+    configure_logging()
     logger.info("Starting CreditSentinel API...")
     init_db()
+    start_executor()
+    jobs.start_executor()
     yield
     # Shutdown
     logger.info("Shutting down CreditSentinel API...")
+    jobs.shutdown_executor()
+    shutdown_executor()
+    shutdown_hash_executor()
+    audit_writer.stop()
+    stop_logging()
 
 app = FastAPI(
     title="CreditSentinel API",
@@ -60,53 +81,71 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
 )
-
-# Initialize services
-engine_ai = CovenantEngine(use_llm=os.getenv("GEMINI_API_KEY") is not None)
-processor = DataProcessor()
+# Oversized bodies are refused before Starlette buffers them
+app.add_middleware(BodySizeLimitMiddleware)
+# Outermost, so the recorded latency includes CORS and exception handling
+app.add_middleware(metrics.MetricsMiddleware)
+if PROFILE_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
 
 # File validation
 ALLOWED_MIME_TYPES = {
     'application/pdf': ['.pdf'],
     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
     'application/vnd.ms-excel': ['.xls'],
-    'text/csv': ['.csv']
+    'text/csv': ['.csv'],
+    # libmagic reports most CSV exports as plain text
+    'text/plain': ['.csv', '.txt'],
+    # Generic containers, accepted only with a matching extension
+    'application/zip': ['.xlsx'],
+    'application/octet-stream': ['.parquet', '.arrow', '.feather', '.ipc']
 }
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-
-def validate_file(file: UploadFile) -> None:
-    """Validate uploaded file type and size"""
-    if file.size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large")
-    
-    # Read first chunk to detect MIME type
-    file.file.seek(0)
-    chunk = file.file.read(1024)
-    file.file.seek(0)
-    
-    mime_type = magic.from_buffer(chunk, mime=True)
+GENERIC_MIME_TYPES = {'application/zip', 'application/octet-stream'}
+
+def validate_file(upload: SpooledUpload) -> None:
+    """Validate the type of a spooled upload; its size was enforced on the request body and while spooling"""
+    mime_type = magic.from_buffer(upload.head, mime=True)
     if mime_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {mime_type}")
+    extension = os.path.splitext(upload.filename)[1].lower()
+    if mime_type in GENERIC_MIME_TYPES and extension not in ALLOWED_MIME_TYPES[mime_type]:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {mime_type}")
 
-def log_event(db: Session, event_type: str, details: str, user_id: int = None, loan_id: int = None):
-    """Enhanced logging with loan context"""
+async def receive_upload(file: UploadFile) -> SpooledUpload:
+    """Spool and validate an upload; the caller closes the result"""
+    upload = await spool_upload(file)
     try:
-        log = models.AuditLog(
-            event_type=event_type, 
-            details=details, 
-            user_id=user_id,
-            loan_id=loan_id
-        )
-        db.add(log)
-        db.commit()
-        logger.info(f"Event logged: {event_type} - {details}")
-    except Exception as e:
-        logger.error(f"Failed to log event: {e}")
+        validate_file(upload)
+    except HTTPException:
+        upload.close()
+        raise
+    return upload
+
+def log_event(event_type: str, details: str, user_id: int = None, loan_id: int = None):
+    """Queue an audit event with loan context; audit_writer persists it in the next batch"""
+    # %-style arguments: the message is only built on the log listener thread
+    context = {"event_type": event_type, "user_id": user_id, "loan_id": loan_id}
+    if audit_writer.enqueue(event_type, details, user_id, loan_id):
+        logger.info("Event logged: %s - %s", event_type, details, extra=context)
+    else:
+        logger.warning("Audit queue full, dropped event: %s - %s", event_type, details, extra=context)
+
+async def queue_job(db: AsyncSession, kind: str, upload: SpooledUpload, user_id: int, loan_id: int, **kwargs) -> JSONResponse:
+    """Record a job and hand it to the worker pool; the client polls /jobs/{id}.
+
+    The job takes over the spooled file and reads it by path.
+    """
+    job = await db.run_sync(jobs.create_job, kind, user_id, loan_id, upload.filename)
+    path = upload.detach()
+    jobs.submit_job(job.id, kind, spooled_path=path, source=path, **kwargs)
+    log_event("JOB_QUEUED", f"Queued {kind} job {job.id} for {upload.filename}", user_id, loan_id)
+    accepted = schemas.JobAccepted(job_id=job.id, status=job.status, status_url=f"/jobs/{job.id}")
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted.model_dump())
 
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error", "error_code": "INTERNAL_ERROR"}
@@ -115,142 +154,193 @@ async def global_exception_handler(request: Request, exc: Exception):
 # --- Authentication Endpoints ---
 @app.post("/token")
 @limiter.limit("5/minute")
-async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     try:
-        user = db.query(models.User).filter(models.User.email == form_data.username).first()
-        if not user or not verify_password(form_data.password, user.hashed_password):
-            log_event(db, "LOGIN_FAILED", f"Failed login attempt for {form_data.username}")
+        user = (await db.execute(
+            select(models.User).where(models.User.email == form_data.username)
+        )).scalars().first()
+        valid, new_hash = (False, None) if user is None else await averify_password(form_data.password, user.hashed_password)
+        if not valid:
+            log_event("LOGIN_FAILED", f"Failed login attempt for {form_data.username}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        if new_hash:
+            # Stored with an outdated scheme or cost; upgrade it now that we have the password
+            user.hashed_password = new_hash
+            await db.commit()
+
         access_token = create_access_token(data={"sub": user.email})
-        log_event(db, "LOGIN_SUCCESS", f"User {user.email} logged in", user.id)
+        log_event("LOGIN_SUCCESS", f"User {user.email} logged in", user.id)
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         raise HTTPException(status_code=500, detail="Login failed")
 
 @app.post("/register", response_model=schemas.User)
 @limiter.limit("3/minute")
-async def register(request: Request, user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_user = db.query(models.User).filter(models.User.email == user.email).first()
+        db_user = (await db.execute(
+            select(models.User).where(models.User.email == user.email)
+        )).scalars().first()
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        hashed_pwd = get_password_hash(user.password)
+        hashed_pwd = await aget_password_hash(user.password)
         new_user = models.User(email=user.email, hashed_password=hashed_pwd)
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
-        log_event(db, "USER_REGISTERED", f"New user registered: {user.email}", new_user.id)
+        log_event("USER_REGISTERED", f"New user registered: {user.email}", new_user.id)
         return new_user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Registration error: {e}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     try:
-        db.execute("SELECT 1")
-        return {"status": "healthy", "database": "connected", "version": "1.0.0"}
+        await db.execute(text("SELECT 1"))
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "version": "1.0.0",
+            "principal_cache": principal_cache.stats(),
+            "audit": audit_writer.stats()
+        }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         return {"status": "unhealthy", "database": str(e)}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across processes when PROMETHEUS_MULTIPROC_DIR is set"""
+    return Response(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
 # --- Loan Management ---
 @app.post("/loans", response_model=schemas.Loan)
 async def create_loan(
     loan: schemas.LoanCreate, 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(aget_current_user)
 ):
     try:
-        db_loan = models.Loan(**loan.dict(), owner_id=current_user.id)
+        db_loan = models.Loan(**loan.model_dump(), owner_id=current_user.id)
         db.add(db_loan)
-        db.commit()
-        db.refresh(db_loan)
+        await db.commit()
+        await db.refresh(db_loan)
         
-        log_event(db, "LOAN_CREATED", f"Loan created for {loan.borrower_name}", current_user.id, db_loan.id)
+        log_event("LOAN_CREATED", f"Loan created for {loan.borrower_name}", current_user.id, db_loan.id)
         return db_loan
     except Exception as e:
-        logger.error(f"Loan creation error: {e}")
+        logger.error("Loan creation error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create loan")
 
+LOAN_COLUMNS = (
+    models.Loan.id, models.Loan.borrower_name, models.Loan.loan_amount,
+    models.Loan.status, models.Loan.created_at, models.Loan.owner_id
+)
+AUDIT_LOG_COLUMNS = (
+    models.AuditLog.id, models.AuditLog.timestamp, models.AuditLog.event_type,
+    models.AuditLog.details, models.AuditLog.loan_id
+)
+
+async def keyset_listing(
+    db: AsyncSession, query, sort_column, id_column, cursor: Optional[str], limit: Optional[int], format: str
+):
+    """Newest-first page of ``query`` with the next cursor in a header, or the whole listing as NDJSON"""
+    try:
+        query = keyset(query, sort_column, id_column, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(stream_ndjson(query), media_type="application/x-ndjson")
+
+    limit = limit or PAGE_SIZE_DEFAULT
+    rows = (await db.execute(query.limit(limit))).mappings().all()
+    cursor = next_cursor(rows, sort_column.key, limit)
+    headers = {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+    return JSONResponse(content=jsonable_encoder([dict(row) for row in rows]), headers=headers)
+
 @app.get("/loans", response_model=list[schemas.Loan])
 async def get_loans(
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(aget_current_user)
 ):
-    return db.query(models.Loan).filter(models.Loan.owner_id == current_user.id).all()
+    """The user's loans, newest first; pass the X-Next-Cursor header back as ``cursor`` for the next page"""
+    query = select(*LOAN_COLUMNS).where(models.Loan.owner_id == current_user.id)
+    return await keyset_listing(db, query, models.Loan.created_at, models.Loan.id, cursor, limit, format)
 
 # --- Protected Endpoints ---
-@app.get("/logs")
+@app.get("/logs", response_model=list[schemas.AuditLog])
 @limiter.limit("10/minute")
 async def get_logs(
     request: Request,
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(aget_current_user)
 ):
-    logs = db.query(models.AuditLog).filter(
-        models.AuditLog.user_id == current_user.id
-    ).order_by(models.AuditLog.timestamp.desc()).limit(50).all()
-    return logs
+    """The user's audit trail, newest first; ``format=ndjson`` streams the full history"""
+    query = select(*AUDIT_LOG_COLUMNS).where(models.AuditLog.user_id == current_user.id)
+    return await keyset_listing(db, query, models.AuditLog.timestamp, models.AuditLog.id, cursor, limit, format)
 
-@app.post("/upload-agreement", response_model=schemas.FileUploadResponse)
+@app.post(
+    "/upload-agreement",
+    response_model=Union[schemas.FileUploadResponse, schemas.JobAccepted],
+    responses={202: {"model": schemas.JobAccepted}}
+)
 @limiter.limit("5/minute")
 async def upload_agreement(
     request: Request,
     loan_id: int,
+    background: bool = False,
     file: UploadFile = File(...), 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(aget_current_user)
 ):
     try:
         # Validate loan ownership
-        loan = db.query(models.Loan).filter(
+        loan = (await db.execute(select(models.Loan).where(
             models.Loan.id == loan_id, 
             models.Loan.owner_id == current_user.id
-        ).first()
+        ))).scalars().first()
         if not loan:
             raise HTTPException(status_code=404, detail="Loan not found")
         
-        validate_file(file)
-        content = await file.read()
-        
-        # Extract text
-        text = ""
-        if file.content_type == "application/pdf":
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
-        else:
-            text = content.decode("utf-8", errors="ignore")
-        
-        covenants = engine_ai.extract_covenants(text)
-        
-        # Persist covenants
-        for cov in covenants:
-            db_cov = models.Covenant(
-                name=cov["name"], 
-                threshold=cov["threshold"], 
-                operator=cov["operator"],
-                category=cov["category"],
-                status="Pending",
-                loan_id=loan_id
-            )
-            db.add(db_cov)
-        db.commit()
+        with await receive_upload(file) as upload:
+            if background:
+                return await queue_job(db, "agreement", upload, current_user.id, loan_id,
+                                 content_type=upload.content_type, digest=upload.digest)
+
+            namespace = engine_ai.strategy.cache_namespace
+            cache_key = make_key(upload.digest, namespace)
+            covenants = await db.run_sync(extraction_cache.get, cache_key)
+            if covenants is None:
+                # Extract text off the event loop; pool workers open the spooled file by path
+                text = await run_in_threadpool(agreement_text, upload.path, upload.content_type)
+                covenants = validate_covenants(await engine_ai.aextract_covenants(text))
+                await db.run_sync(extraction_cache.put, cache_key, namespace, covenants)
+
+        await db.run_sync(persist_covenants, loan_id, covenants)
         
-        log_event(db, "AGREEMENT_UPLOADED", f"Agreement uploaded: {file.filename}", current_user.id, loan_id)
+        log_event("AGREEMENT_UPLOADED", f"Agreement uploaded: {file.filename}", current_user.id, loan_id)
         return schemas.FileUploadResponse(
             filename=file.filename, 
             status="processed", 
@@ -259,60 +349,249 @@ async def upload_agreement(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Agreement upload error: {e}")
+        logger.error("Agreement upload error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process agreement")
 
-@app.post("/upload-financials", response_model=schemas.FileUploadResponse)
+@app.post(
+    "/upload-financials",
+    response_model=Union[schemas.FileUploadResponse, schemas.JobAccepted],
+    responses={202: {"model": schemas.JobAccepted}}
+)
 @limiter.limit("10/minute")
 async def upload_financials(
     request: Request,
     loan_id: int,
+    background: bool = False,
     file: UploadFile = File(...), 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(aget_current_user)
 ):
     try:
         # Validate loan ownership
-        loan = db.query(models.Loan).filter(
+        loan = (await db.execute(select(models.Loan).where(
             models.Loan.id == loan_id, 
             models.Loan.owner_id == current_user.id
-        ).first()
+        ))).scalars().first()
         if not loan:
             raise HTTPException(status_code=404, detail="Loan not found")
         
-        validate_file(file)
-        content = await file.read()
-        df = processor.normalize_financials(content, file.filename)
-        ratios = processor.calculate_ratios(df)
-        
-        # Update covenants
-        active_covenants = db.query(models.Covenant).filter(
-            models.Covenant.loan_id == loan_id
-        ).all()
-        
-        updated_count = 0
-        for cov in active_covenants:
-            val = ratios.get(cov.name)
-            if val is not None:
-                evaluation = engine_ai.evaluate(cov.__dict__, val)
-                cov.current_value = val
-                cov.status = evaluation["status"]
-                updated_count += 1
+        with await receive_upload(file) as upload:
+            if background:
+                return await queue_job(db, "financials", upload, current_user.id, loan_id,
+                                 filename=upload.filename)
+
+            df = await run_in_threadpool(processor.normalize_financials, upload.path, upload.filename)
+        result = await db.run_sync(apply_financials, loan_id, df)
+        updated_count = result["covenants_updated"]
         
-        db.commit()
-        log_event(db, "FINANCIALS_ANALYZED", f"Updated {updated_count} covenants", current_user.id, loan_id)
+        log_event("FINANCIALS_ANALYZED", f"Updated {updated_count} covenants", current_user.id, loan_id)
         
         return schemas.FileUploadResponse(
             filename=file.filename,
             status="processed",
-            message=f"Updated {updated_count} covenants"
+            message=f"Updated {updated_count} covenants across {len(df)} periods"
         )
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Financials upload error: {e}")
+        logger.error("Financials upload error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process financials")
 
+# Rejected loan_ids named in the audit event; the response lists all of them
+AUDIT_REJECTED_IDS = 50
+
+@app.post("/upload-financials/bulk", response_model=schemas.BulkFinancialsResponse)
+@limiter.limit("5/minute")
+async def upload_financials_bulk(
+    request: Request,
+    file: UploadFile = File(...),
+    sync_db: Session = Depends(get_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Evaluate a month-end feed covering many loans; rows are keyed by a loan_id column"""
+    try:
+        with await receive_upload(file) as upload:
+            df = await run_in_threadpool(processor.normalize_financials, upload.path, upload.filename)
+        if "loan_id" not in df.columns:
+            raise HTTPException(status_code=400, detail="File must contain a loan_id column")
+
+        # The pandas work is heavy enough to keep in a worker thread with a sync session
+        result = await run_in_threadpool(apply_bulk_financials, sync_db, current_user.id, df)
+        log_event("FINANCIALS_BULK_ANALYZED",
+                  f"Bulk financials {file.filename}: {result['loans_processed']} loans, {result['covenants_updated']} covenants, "
+                  f"{result['rows_rejected']} rows rejected (loan_ids: {', '.join(result['rejected_loan_ids'][:AUDIT_REJECTED_IDS]) or 'none'})",
+                  current_user.id)
+        return schemas.BulkFinancialsResponse(filename=file.filename, **result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Bulk financials upload error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to process financials")
+
+@app.get("/loans/{loan_id}/observations", response_model=list[schemas.CovenantObservation])
+async def get_observations(
+    loan_id: int,
+    covenant: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Covenant value and status history for a loan, oldest period first"""
+    loan = (await db.execute(select(models.Loan.id).where(
+        models.Loan.id == loan_id,
+        models.Loan.owner_id == current_user.id
+    ))).first()
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+
+    query = select(
+        models.CovenantObservation.covenant_id,
+        models.Covenant.name,
+        models.CovenantObservation.period,
+        models.CovenantObservation.value,
+        models.CovenantObservation.status
+    ).join(models.Covenant, models.Covenant.id == models.CovenantObservation.covenant_id).where(
+        models.CovenantObservation.loan_id == loan_id
+    )
+    if covenant:
+        query = query.where(models.Covenant.name == covenant)
+    result = await db.execute(query.order_by(models.CovenantObservation.covenant_id, models.CovenantObservation.id))
+    return result.all()
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    job = (await db.execute(select(models.Job).where(
+        models.Job.id == job_id,
+        models.Job.user_id == current_user.id
+    ))).scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/portfolio/summary", response_model=schemas.PortfolioSummary)
+async def portfolio_summary(
+    detail: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Compliance counts, worst status and headroom per loan; ``detail=true`` adds every covenant"""
+    rows = (await db.execute(portfolio_summary_query(current_user.id))).all()
+    if not detail:
+        # Plain values only, so skip the response_model validation and jsonable_encoder walk
+        return JSONResponse(content=summarize_portfolio(rows))
+
+    # One extra IN query for all covenants instead of one per loan
+    loans = (await db.execute(
+        select(models.Loan).options(selectinload(models.Loan.covenants)).where(models.Loan.owner_id == current_user.id)
+    )).scalars().all()
+    summary = schemas.PortfolioSummary.model_validate(summarize_portfolio(rows, {loan.id: loan.covenants for loan in loans}))
+    return Response(content=summary.model_dump_json(), media_type="application/json")
+
+def status_counts(snapshot) -> dict:
+    return {status: getattr(snapshot, status.lower()) if snapshot else 0 for status in COVENANT_STATUSES}
+
+@app.get("/portfolio/snapshot", response_model=schemas.OwnerComplianceSnapshot)
+async def portfolio_snapshot(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Compliance totals maintained on every covenant change; one primary key lookup"""
+    snapshot = await db.get(models.OwnerComplianceSnapshot, current_user.id)
+    return {
+        "loans": snapshot.loans if snapshot else 0,
+        "loans_in_breach": snapshot.loans_in_breach if snapshot else 0,
+        "covenants": snapshot.covenants if snapshot else 0,
+        "status_counts": status_counts(snapshot),
+        "min_headroom": snapshot.min_headroom if snapshot else None,
+        "last_evaluated_at": snapshot.last_evaluated_at if snapshot else None,
+    }
+
+@app.get("/loans/{loan_id}/snapshot", response_model=schemas.LoanComplianceSnapshot)
+async def loan_snapshot(
+    loan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    snapshot = await db.get(models.LoanComplianceSnapshot, loan_id)
+    if snapshot is None or snapshot.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return {
+        "loan_id": snapshot.loan_id,
+        "covenants": snapshot.covenants,
+        "status_counts": status_counts(snapshot),
+        "worst_status": snapshot.worst_status,
+        "min_headroom": snapshot.min_headroom,
+        "last_evaluated_at": snapshot.last_evaluated_at,
+    }
+
+@app.post("/portfolio/reevaluate")
+@limiter.limit("10/minute")
+async def reevaluate_portfolio(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Re-run covenant evaluation for every covenant of the user's loans that has a value"""
+    try:
+        rows = (await db.execute(select(
+            models.Covenant.id,
+            models.Covenant.name,
+            models.Covenant.threshold,
+            models.Covenant.operator,
+            models.Covenant.current_value,
+            models.Covenant.status
+        ).join(models.Loan).where(
+            models.Loan.owner_id == current_user.id,
+            models.Covenant.current_value.isnot(None)
+        ))).all()
+
+        statuses = engine_ai.evaluate_many(
+            [r.threshold for r in rows],
+            [r.operator for r in rows],
+            [r.current_value for r in rows],
+            [r.name for r in rows]
+        )
+        changes = [
+            {"id": r.id, "status": str(new_status)}
+            for r, new_status in zip(rows, statuses)
+            if r.status != new_status
+        ]
+        if changes:
+            await db.execute(update(models.Covenant), changes)
+            await db.commit()
+
+        counts = {s: int((statuses == s).sum()) for s in engine_ai.STATUSES}
+        log_event("PORTFOLIO_REEVALUATED", f"Re-evaluated {len(rows)} covenants, {len(changes)} changed", current_user.id)
+        return {"evaluated": len(rows), "changed": len(changes), "status_counts": counts}
+    except Exception as e:
+        logger.error("Portfolio re-evaluation error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to re-evaluate portfolio")
+
+@app.post("/simulate")
+@limiter.limit("10/minute")
+async def simulate(
+    request: Request,
+    params: schemas.StressTestRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(aget_current_user)
+):
+    """Stress every covenant of the user's loans under correlated or grid shock scenarios"""
+    rows = (await db.execute(stress_covenants_query(current_user.id, params.loan_ids))).all()
+    try:
+        result = await run_in_threadpool(run_stress_test, rows, params.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    log_event(
+        "STRESS_TEST",
+        f"{params.mode} stress test: {result['scenarios']} scenarios over {result['loans_evaluated']} loans",
+        current_user.id
+    )
+    return result
+
 # Serve static files last
 if os.path.exists("../frontend/build/web"):
     app.mount("/", StaticFiles(directory="../frontend/build/web", html=True), name="static")
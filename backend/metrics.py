@@ -0,0 +1,116 @@
+"""Prometheus metrics for the API, built on prometheus_client.
+
+Counters and histograms are the library's; pool gauges are read at scrape
+time by a collector. When PROMETHEUS_MULTIPROC_DIR is set (it must be, and
+be emptied, before any process starts), every process writes its samples
+to that directory and /metrics aggregates them, so work done in job and
+PDF worker processes is reported too. Without it only the process serving
+/metrics is reported.
+"""
+import os
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class CallbackGauge:
+    """Gauge read at scrape time from ``collect``, which returns {label values: value}.
+
+    Describes the serving process only, also in multiprocess mode.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        _callback_gauges.append(self)
+        if not multiprocess_mode():
+            REGISTRY.register(self)
+
+    def collect(self):
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for values, value in self._collect().items():
+            family.add_metric(values, value)
+        yield family
+
+_callback_gauges: List[CallbackGauge] = []
+
+def multiprocess_mode() -> bool:
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+def render_metrics() -> bytes:
+    """Every metric in the Prometheus text exposition format"""
+    if not multiprocess_mode():
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    for gauge in _callback_gauges:
+        registry.register(gauge)
+    return generate_latest(registry)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+STATUS_CLASSES = {code: f"{code}xx" for code in range(1, 6)}
+
+# --- Application metrics ---
+request_latency = Histogram(
+    "creditsentinel_http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+pdf_pages = Counter("creditsentinel_pdf_pages_parsed", "PDF pages parsed for agreement uploads")
+pdf_pages_per_second = Histogram(
+    "creditsentinel_pdf_pages_per_second", "PDF parse throughput per agreement", buckets=RATE_BUCKETS
+)
+extraction_latency = Histogram(
+    "creditsentinel_extraction_duration_seconds", "Covenant extraction latency per strategy", ("strategy",),
+    buckets=LATENCY_BUCKETS,
+)
+llm_retries = Counter("creditsentinel_llm_retries", "LLM request retries", ("strategy",))
+llm_tokens = Counter("creditsentinel_llm_tokens", "LLM tokens reported by the provider", ("strategy", "kind"))
+parse_latency = Histogram(
+    "creditsentinel_financials_parse_duration_seconds", "DataProcessor.normalize_financials time by file type", ("file_type",),
+    buckets=LATENCY_BUCKETS,
+)
+pool_checkout_wait = Histogram(
+    "creditsentinel_db_pool_checkout_seconds", "Time to check a connection out of the pool", ("pool",), buckets=WAIT_BUCKETS
+)
+pool_overflow_checkouts = Counter(
+    "creditsentinel_db_pool_overflow_checkouts", "Checkouts served by an overflow connection", ("pool",)
+)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template.
+
+    The route comes from the matched FastAPI route (``/loans/{loan_id}``, not
+    the raw path) so the label set stays bounded; requests that match no
+    route are grouped under "unmatched". Status codes are bucketed by class.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            request_latency.labels(
+                scope["method"], route.path if route is not None else "unmatched", STATUS_CLASSES.get(status[0] // 100, "other")
+            ).observe(time.perf_counter() - start)
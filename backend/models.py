@@ -29,7 +29,13 @@ class Loan(Base):
     owner = relationship("User", back_populates="loans")
     covenants = relationship("Covenant", back_populates="loan", cascade="all, delete-orphan")
     
-    __table_args__ = (Index('idx_loan_owner_status', 'owner_id', 'status'),)
+    __table_args__ = (
+        Index('idx_loan_owner_status', 'owner_id', 'status'),
+        Index('idx_loan_owner_created', 'owner_id', 'created_at', 'id'),
+    )
+
+# Covenant.status values; Pending (not yet evaluated) ranks below every evaluated status
+COVENANT_STATUSES = ("Pending", "Compliant", "Warning", "Breach")
 
 class Covenant(Base):
     __tablename__ = "covenants"
@@ -60,3 +66,77 @@ class AuditLog(Base):
 
     user = relationship("User", back_populates="audit_logs")
     loan = relationship("Loan")
+
+    __table_args__ = (Index('idx_audit_user_timestamp', 'user_id', 'timestamp', 'id'),)
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False)
+    strategy = Column(String(255), nullable=False)
+    covenants = Column(Text, nullable=False)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), default="queued", nullable=False)
+    progress = Column(Integer, default=0, nullable=False)
+    filename = Column(String(255), nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index('idx_job_user_created', 'user_id', 'created_at'),)
+
+class CovenantObservation(Base):
+    __tablename__ = "covenant_observations"
+
+    id = Column(Integer, primary_key=True)
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=False)
+    covenant_id = Column(Integer, ForeignKey("covenants.id", ondelete="CASCADE"), nullable=False)
+    period = Column(String(50), nullable=False)
+    value = Column(Float, nullable=False)
+    status = Column(String(20), nullable=False)
+
+    __table_args__ = (Index('idx_observation_loan_covenant_period', 'loan_id', 'covenant_id', 'period'),)
+
+class LoanComplianceSnapshot(Base):
+    __tablename__ = "loan_compliance_snapshots"
+
+    loan_id = Column(Integer, ForeignKey("loans.id", ondelete="CASCADE"), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    covenants = Column(Integer, default=0, nullable=False)
+    pending = Column(Integer, default=0, nullable=False)
+    compliant = Column(Integer, default=0, nullable=False)
+    warning = Column(Integer, default=0, nullable=False)
+    breach = Column(Integer, default=0, nullable=False)
+    worst_status = Column(String(50), nullable=True)
+    min_headroom = Column(Float, nullable=True)
+    last_evaluated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class OwnerComplianceSnapshot(Base):
+    __tablename__ = "owner_compliance_snapshots"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    loans = Column(Integer, default=0, nullable=False)
+    loans_in_breach = Column(Integer, default=0, nullable=False)
+    covenants = Column(Integer, default=0, nullable=False)
+    pending = Column(Integer, default=0, nullable=False)
+    compliant = Column(Integer, default=0, nullable=False)
+    warning = Column(Integer, default=0, nullable=False)
+    breach = Column(Integer, default=0, nullable=False)
+    min_headroom = Column(Float, nullable=True)
+    last_evaluated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# Registers the session listeners that keep the compliance snapshots current, so
+# every Session that can write a covenant has them; imported after the models it uses
+import snapshots  # noqa: E402,F401
@@ -0,0 +1,61 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, tuple_
+
+from database import get_async_sessionmaker
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    payload = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset(query: Select, sort_column, id_column, cursor: Optional[str] = None) -> Select:
+    """Order newest first on (sort_column, id_column) and resume after ``cursor``.
+
+    The row-value comparison lets a composite index on the filter column(s)
+    followed by (sort_column, id) serve every page with one range scan.
+    """
+    if cursor is not None:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(sort_column, id_column) < (sort_value, row_id))
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+def next_cursor(rows: Sequence[Any], sort_key: str, limit: int) -> Optional[str]:
+    """Cursor for the page after ``rows``, or None when this was the last page"""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[sort_key], last["id"])
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+async def stream_ndjson(query: Select) -> AsyncIterator[bytes]:
+    """Yield one JSON line per row, fetching ``STREAM_BATCH_SIZE`` rows at a time.
+
+    Uses its own session so the stream outlives the request's dependencies;
+    ``query`` should select plain columns so no ORM objects are built.
+    """
+    async with get_async_sessionmaker()() as db:
+        result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for partition in result.mappings().partitions():
+            yield "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in partition).encode()
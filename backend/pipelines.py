@@ -0,0 +1,241 @@
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from covenant_engine import CovenantEngine
+from data_processor import DataProcessor, FinancialSource
+from extraction_cache import ExtractionCache, content_digest, file_digest, make_key
+from stress_engine import SHOCK_FACTORS, stress_test
+from text_extractor import iter_pdf_pages
+import metrics
+import models
+import schemas
+
+# Shared services, used by the API process and by job worker processes
+engine_ai = CovenantEngine(use_llm=os.getenv("GEMINI_API_KEY") is not None)
+processor = DataProcessor()
+extraction_cache = ExtractionCache()
+
+logger = logging.getLogger(__name__)
+
+Progress = Optional[Callable[[int], None]]
+
+def _report(progress: Progress, percent: int) -> None:
+    if progress is not None:
+        progress(percent)
+
+def agreement_text(source: FinancialSource, content_type: str) -> str:
+    """Text of an agreement given as bytes or as the path of a spooled upload"""
+    if content_type == "application/pdf":
+        start = time.perf_counter()
+        pages = list(iter_pdf_pages(source))
+        elapsed = time.perf_counter() - start
+        metrics.pdf_pages.inc(len(pages))
+        if pages and elapsed > 0:
+            metrics.pdf_pages_per_second.observe(len(pages) / elapsed)
+        return "\n".join(pages)
+    if not isinstance(source, (bytes, bytearray)):
+        with open(source, "rb") as f:
+            source = f.read()
+    return source.decode("utf-8", errors="ignore")
+
+def validate_covenants(covenants: List[Any]) -> List[Dict[str, Any]]:
+    """Covenants that pass schemas.CovenantBase, normalized; the rest are logged and dropped.
+
+    Runs before a result is cached so an incomplete extraction can neither fail
+    persist_covenants nor be served again from the cache.
+    """
+    valid = []
+    for cov in covenants:
+        try:
+            valid.append({**cov, **schemas.CovenantBase.model_validate(cov).model_dump()})
+        except (TypeError, ValidationError) as e:
+            logger.warning("Dropping extracted covenant %r: %s", cov, e)
+    return valid
+
+def persist_covenants(db: Session, loan_id: int, covenants: List[Dict[str, Any]]) -> None:
+    for cov in covenants:
+        db.add(models.Covenant(
+            name=cov["name"],
+            threshold=cov["threshold"],
+            operator=cov["operator"],
+            category=cov["category"],
+            status="Pending",
+            loan_id=loan_id
+        ))
+    db.commit()
+
+def covenant_frame(covenants: List[models.Covenant]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(cov.id, cov.loan_id, cov.name, cov.threshold, cov.operator) for cov in covenants],
+        columns=["id", "loan_id", "name", "threshold", "operator"]
+    ).astype({"id": int, "loan_id": int, "threshold": float})
+
+def record_observations(db: Session, covenants: pd.DataFrame, frame: pd.DataFrame) -> int:
+    """Bulk insert one observation per covenant and period, replacing re-uploaded periods.
+
+    ``frame`` is a ratio frame with a ``loan_id`` column; ``covenants`` comes
+    from covenant_frame. Both are joined on (loan_id, covenant name).
+    """
+    observations = frame.melt(id_vars=["loan_id", "period"], var_name="name", value_name="value").dropna(subset=["value"])
+    observations = observations.merge(covenants, on=["loan_id", "name"])
+    if observations.empty:
+        return 0
+    observations["status"] = engine_ai.evaluate_many(
+        observations["threshold"], observations["operator"], observations["value"], observations["name"]
+    ).tolist()
+
+    periods = frame[["loan_id", "period"]].drop_duplicates()
+    db.execute(delete(models.CovenantObservation).where(
+        tuple_(models.CovenantObservation.loan_id, models.CovenantObservation.period).in_(
+            list(zip(periods["loan_id"].astype(int).tolist(), periods["period"].tolist()))
+        )
+    ))
+    rows = observations.rename(columns={"id": "covenant_id"})[["loan_id", "covenant_id", "period", "value", "status"]]
+    db.execute(insert(models.CovenantObservation), rows.to_dict("records"))
+    return len(rows)
+
+def apply_financials(db: Session, loan_id: int, df: pd.DataFrame) -> Dict[str, Any]:
+    """Evaluate the loan's covenants on the latest period and record every period's history"""
+    frame = processor.compute_ratio_frame(df).assign(loan_id=loan_id)
+    ratios = processor.latest_ratios(frame)
+    active_covenants = db.query(models.Covenant).filter(
+        models.Covenant.loan_id == loan_id
+    ).all()
+
+    matched = [cov for cov in active_covenants if ratios.get(cov.name) is not None]
+    statuses = engine_ai.evaluate_many(
+        [cov.threshold for cov in matched],
+        [cov.operator for cov in matched],
+        [ratios[cov.name] for cov in matched],
+        [cov.name for cov in matched]
+    )
+    for cov, cov_status in zip(matched, statuses):
+        cov.current_value = ratios[cov.name]
+        cov.status = str(cov_status)
+
+    observations = record_observations(db, covenant_frame(active_covenants), frame)
+    db.commit()
+    return {"covenants_updated": len(matched), "observations_recorded": observations, "ratios": ratios}
+
+def _loan_id_labels(values: pd.Series) -> List[str]:
+    """loan_id cells as written in the upload: whole numbers without ".0", blanks as "" """
+    numbers = pd.to_numeric(values, errors="coerce")
+    return [
+        "" if pd.isna(value) and pd.isna(number) else str(int(number)) if pd.notna(number) and number % 1 == 0 else str(value)
+        for value, number in zip(values, numbers)
+    ]
+
+def apply_bulk_financials(db: Session, owner_id: int, df: pd.DataFrame) -> Dict[str, Any]:
+    """Evaluate a multi-loan file (one ``loan_id`` column) in one transaction.
+
+    Ratios are computed for every row at once, the latest period of each loan
+    is taken with a groupby, and all covenant updates are written with one
+    executemany UPDATE keyed by primary key. Rows whose loan_id is missing,
+    not a whole number or not one of the owner's loans are counted in
+    ``rows_rejected`` and their ids listed in ``rejected_loan_ids``.
+    """
+    frame = processor.compute_ratio_frame(df)
+    numeric = frame["loan_id"].notna() & (frame["loan_id"] % 1 == 0)
+    requested = set(frame.loc[numeric, "loan_id"].astype(int).tolist())
+
+    owned = {loan_id for (loan_id,) in db.query(models.Loan.id).filter(
+        models.Loan.owner_id == owner_id, models.Loan.id.in_(requested)
+    )}
+    accepted = (numeric & frame["loan_id"].isin(owned)).to_numpy()
+    rejected = _loan_id_labels(df["loan_id"][~accepted])
+    frame = frame[accepted]
+    frame = frame.assign(loan_id=frame["loan_id"].astype(int))
+    covenants = covenant_frame(
+        db.query(models.Covenant).filter(models.Covenant.loan_id.in_(owned)).all()
+    )
+
+    latest = frame.groupby("loan_id", sort=False).tail(1).drop(columns="period")
+    current = latest.melt(id_vars="loan_id", var_name="name", value_name="value").dropna(subset=["value"])
+    current = current.merge(covenants, on=["loan_id", "name"])
+    current["status"] = engine_ai.evaluate_many(
+        current["threshold"], current["operator"], current["value"], current["name"]
+    ).tolist()
+    if not current.empty:
+        db.execute(
+            update(models.Covenant),
+            current.rename(columns={"value": "current_value"})[["id", "current_value", "status"]].to_dict("records")
+        )
+
+    observations = record_observations(db, covenants, frame)
+    db.commit()
+
+    periods = frame.groupby("loan_id").size()
+    status_counts = {loan_id: group["status"].value_counts().to_dict() for loan_id, group in current.groupby("loan_id")}
+    loans = [
+        {
+            "loan_id": int(loan_id),
+            "periods": int(periods[loan_id]),
+            "covenants_updated": sum(status_counts.get(loan_id, {}).values()),
+            "ratios": {name: value for name, value in ratios.items() if pd.notna(value)},
+            "status_counts": status_counts.get(loan_id, {}),
+        }
+        for loan_id, ratios in sorted(latest.set_index("loan_id").to_dict("index").items())
+    ]
+
+    return {
+        "loans_processed": len(owned),
+        "covenants_updated": len(current),
+        "observations_recorded": observations,
+        "loans": loans,
+        "unknown_loan_ids": sorted(requested - owned),
+        "rows_rejected": len(rejected),
+        "rejected_loan_ids": sorted(set(rejected)),
+    }
+
+STRESS_COLUMNS = ["id", "loan_id", "name", "threshold", "operator", "current_value"]
+
+def stress_covenants_query(owner_id: int, loan_ids: Optional[List[int]] = None):
+    """Select the stress test inputs for every covenant of the owner's loans"""
+    query = select(*(getattr(models.Covenant, column) for column in STRESS_COLUMNS)).join(models.Loan).where(
+        models.Loan.owner_id == owner_id
+    )
+    if loan_ids is not None:
+        query = query.where(models.Covenant.loan_id.in_(loan_ids))
+    return query
+
+def run_stress_test(rows: List[Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run stress_test over rows of stress_covenants_query with StressTestRequest options"""
+    options = dict(options)
+    options.pop("loan_ids", None)
+    volatilities = tuple(options.pop(f"{factor}_volatility") for factor in SHOCK_FACTORS)
+    frame = pd.DataFrame(rows, columns=STRESS_COLUMNS)
+    return stress_test(frame, volatilities=volatilities, engine=engine_ai, **options)
+
+def process_agreement(
+    db: Session, loan_id: int, source: FinancialSource, content_type: str,
+    digest: Optional[str] = None, progress: Progress = None
+) -> Dict[str, Any]:
+    """Synchronous agreement pipeline: cache lookup, text and covenant extraction, persistence"""
+    if digest is None:
+        digest = content_digest(source) if isinstance(source, (bytes, bytearray)) else file_digest(source)
+    namespace = engine_ai.strategy.cache_namespace
+    cache_key = make_key(digest, namespace)
+    covenants = extraction_cache.get(db, cache_key)
+    if covenants is None:
+        text = agreement_text(source, content_type)
+        _report(progress, 40)
+        covenants = validate_covenants(engine_ai.extract_covenants(text))
+        extraction_cache.put(db, cache_key, namespace, covenants)
+    _report(progress, 80)
+
+    persist_covenants(db, loan_id, covenants)
+    return {"covenants_extracted": len(covenants), "covenants": covenants}
+
+def process_financials(db: Session, loan_id: int, source: FinancialSource, filename: str, progress: Progress = None) -> Dict[str, Any]:
+    """Synchronous financials pipeline: parse, compute ratios, evaluate covenants"""
+    df = processor.normalize_financials(source, filename)
+    _report(progress, 50)
+    return apply_financials(db, loan_id, df)
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func, select
+
+import models
+
+COVENANT_STATUSES = models.COVENANT_STATUSES
+STATUS_SEVERITY = {status: rank for rank, status in enumerate(COVENANT_STATUSES)}
+
+def headroom_expression():
+    """Relative distance to the threshold on the compliant side, negative once breached.
+
+    NULL for covenants without a value, equality covenants and zero
+    thresholds, which have no meaningful relative headroom.
+    """
+    threshold = models.Covenant.threshold
+    value = models.Covenant.current_value
+    operator = models.Covenant.operator
+    return case(
+        (threshold == 0, None),
+        (operator.in_(("<=", "<")), (threshold - value) / func.abs(threshold)),
+        (operator.in_((">=", ">")), (value - threshold) / func.abs(threshold)),
+        else_=None,
+    )
+
+def compliance_columns():
+    """Per-loan aggregates over covenants: count, count per status, worst severity, minimum headroom"""
+    status = models.Covenant.status
+    severity = case(
+        *((status == name, rank) for name, rank in STATUS_SEVERITY.items() if rank),
+        else_=0,
+    )
+    return (
+        func.count(models.Covenant.id).label("covenants"),
+        *(func.count(case((status == name, models.Covenant.id))).label(name) for name in COVENANT_STATUSES),
+        func.max(severity).label("worst_severity"),
+        func.min(headroom_expression()).label("min_headroom"),
+    )
+
+def loan_compliance_query(*columns, criteria=()):
+    """``columns`` followed by compliance_columns, one row per loan matching ``criteria``.
+
+    A single GROUP BY over loans outer-joined to covenants; the join and the
+    status counts are served by idx_covenant_loan_status.
+    """
+    return select(models.Loan.id.label("loan_id"), *columns, *compliance_columns()).outerjoin(
+        models.Covenant, models.Covenant.loan_id == models.Loan.id
+    ).where(*criteria).group_by(models.Loan.id)
+
+def portfolio_summary_query(owner_id: int):
+    """One row per loan of the owner with covenant counts by status, worst status and minimum headroom"""
+    return loan_compliance_query(models.Loan.borrower_name, criteria=(models.Loan.owner_id == owner_id,))
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(float(value), 4)
+
+def summarize_portfolio(rows: Sequence[Any], details: Optional[Dict[int, List[models.Covenant]]] = None) -> Dict[str, Any]:
+    """Shape portfolio_summary_query rows (and optional covenants per loan) into the summary response"""
+    loans = []
+    status_totals = [0] * len(COVENANT_STATUSES)
+    worst_totals = [0] * len(COVENANT_STATUSES)
+    min_headroom = None
+    for loan_id, borrower_name, covenants, *counts, worst_severity, headroom in rows:
+        for i, count in enumerate(counts):
+            status_totals[i] += count
+        worst_status = None
+        if covenants:
+            worst_status = COVENANT_STATUSES[worst_severity]
+            worst_totals[worst_severity] += 1
+        if headroom is not None and (min_headroom is None or headroom < min_headroom):
+            min_headroom = headroom
+        loans.append({
+            "loan_id": loan_id,
+            "borrower_name": borrower_name,
+            "covenants": covenants,
+            "status_counts": dict(zip(COVENANT_STATUSES, counts)),
+            "worst_status": worst_status,
+            "min_headroom": _round(headroom),
+            "covenant_details": details.get(loan_id, []) if details is not None else None,
+        })
+    loans.sort(key=lambda loan: loan["loan_id"])
+
+    return {
+        "loans": len(loans),
+        "covenants": sum(status_totals),
+        "status_counts": dict(zip(COVENANT_STATUSES, status_totals)),
+        "loans_by_worst_status": dict(zip(COVENANT_STATUSES, worst_totals)),
+        "min_headroom": _round(min_headroom),
+        "loan_summaries": loans,
+    }
@@ -0,0 +1,206 @@
+"""Statistical profiler for slow requests.
+
+With PROFILE_ENABLED, ProfilerMiddleware profiles a random PROFILE_SAMPLE_RATE
+share of requests. While at least one sampled request is in flight, a
+sampler thread reads every thread's stack each PROFILE_INTERVAL_MS through
+sys._current_frames(); nothing is traced, so the profiled code runs at full
+speed. When a sampled request takes PROFILE_SLOW_MS or longer, its samples
+are written to PROFILE_DIR as folded stacks, which flamegraph.pl, speedscope
+and inferno read directly. The file name carries the route, user id and
+loan id. Only the newest PROFILE_MAX_FILES files and PROFILE_MAX_MB
+megabytes are kept.
+
+Samples cover the event loop and the worker threads, because sync handlers
+and DB work run in the thread pool. A sampled request that overlaps others
+therefore also shows their work. Idle pool workers are left out. Work done
+in the PDF process pool shows up as the request thread waiting on it.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.05))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 2000))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+PROFILE_MAX_MB = float(os.getenv("PROFILE_MAX_MB", 100))
+
+PROFILE_SUFFIX = ".folded"
+# Frames a thread sits in while it waits for work: pool queues and the audit writer's timer
+IDLE_CALLERS = {("queue.py", "get"), ("thread.py", "_worker"), ("audit.py", "_run")}
+
+# Tags of the request being handled; a dict so handlers in copied contexts can still add to it
+_request_tags: ContextVar[Optional[Dict[str, object]]] = ContextVar("profile_request_tags", default=None)
+
+def tag(**values) -> None:
+    """Attach tags (user_id, loan_id) to the current request's profile, if it is being profiled"""
+    tags = _request_tags.get()
+    if tags is not None:
+        tags.update(values)
+
+class Sampler:
+    """One background thread sampling every thread's stack into the active profiles"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: List[Counter] = []
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Counter:
+        """Begin collecting into a new profile; returns it (folded stack -> samples)"""
+        profile = Counter()
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._active.notify()
+        return profile
+
+    def stop(self, profile: Counter) -> None:
+        with self._lock:
+            self._profiles.remove(profile)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _stack(self, frame) -> Optional[str]:
+        """Folded stack, root first, or None for a thread idling in its work queue"""
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        for code in codes:
+            filename = os.path.basename(code.co_filename)
+            if filename == "threading.py":
+                continue
+            if (filename, code.co_name) in IDLE_CALLERS:
+                return None
+            break
+        return ";".join(self._label(code) for code in reversed(codes))
+
+    def sample(self) -> None:
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = self._stack(frame)
+            if stack is not None:
+                stacks.append(f"{names.get(ident, ident)};{stack}")
+        with self._lock:
+            for profile in self._profiles:
+                profile.update(stacks)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._profiles:
+                    self._active.wait()
+            self.sample()
+            time.sleep(self.interval)
+
+sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+
+def _slug(value: object) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(value)).strip("_") or "root"
+
+def profile_path(directory: str, method: str, route: str, tags: Dict[str, object], elapsed_ms: float) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    return os.path.join(directory, (
+        f"{stamp}-{method}-{_slug(route)}-user_{tags.get('user_id', 'none')}-loan_{tags.get('loan_id', 'none')}"
+        f"-{elapsed_ms:.0f}ms-{random.getrandbits(24):06x}{PROFILE_SUFFIX}"
+    ))
+
+def enforce_retention(directory: str, max_files: int = None, max_bytes: int = None) -> int:
+    """Delete the oldest profiles beyond ``max_files`` files or ``max_bytes`` in total; returns how many"""
+    max_files = PROFILE_MAX_FILES if max_files is None else max_files
+    max_bytes = int(PROFILE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(PROFILE_SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+    entries.sort(reverse=True)
+
+    removed, kept, total = 0, 0, 0
+    for _, name, size in entries:
+        if kept < max_files and total + size <= max_bytes:
+            kept += 1
+            total += size
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def write_profile(profile: Counter, path: str, root: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        for stack, count in profile.items():
+            f.write(f"{root};{stack} {count}\n")
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware that profiles sampled requests and keeps the slow ones"""
+
+    def __init__(self, app, sample_rate: float = None, slow_ms: float = None, directory: str = None):
+        self.app = app
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = PROFILE_SLOW_MS if slow_ms is None else slow_ms
+        self.directory = directory or PROFILE_DIR
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        tags: Dict[str, object] = {}
+        token = _request_tags.set(tags)
+        profile = sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            sampler.stop(profile)
+            _request_tags.reset(token)
+            if elapsed_ms >= self.slow_ms and profile:
+                await run_in_threadpool(self._save, scope, tags, profile, elapsed_ms)
+
+    def _save(self, scope, tags: Dict[str, object], profile: Counter, elapsed_ms: float) -> None:
+        route = scope.get("route")
+        route = route.path if route is not None else scope["path"]
+        if "loan_id" not in tags:
+            loan_id = scope.get("path_params", {}).get("loan_id") or parse_qs(scope.get("query_string", b"").decode()).get("loan_id", [None])[0]
+            if loan_id is not None:
+                tags["loan_id"] = loan_id
+        path = profile_path(self.directory, scope["method"], route, tags, elapsed_ms)
+        try:
+            write_profile(profile, path, f"{scope['method']} {route}")
+            enforce_retention(self.directory)
+            logger.warning("Slow request %s %s took %.0f ms; profile written to %s", scope["method"], route, elapsed_ms, path)
+        except OSError as e:
+            logger.error("Could not write request profile %s: %s", path, e)
@@ -0,0 +1,174 @@
+"""Covenant types defined by ratio formulas over financial statement fields.
+
+A covenant type pairs a formula such as ``(ebitda - capex) / (interest +
+principal)`` with the operator its covenants normally use and an optional
+warning band. Formulas are parsed once with ``ast``, checked against a small
+grammar (numbers, field names, + - * /, abs/min/max) and compiled to a code
+object that runs on whole numpy columns, so one evaluation covers every
+period and loan of an upload. Division by zero gives NaN, like a missing
+input.
+
+The built-in types can be overridden or extended with a JSON file named by
+COVENANT_TYPES_FILE, a list of ``{"name", "formula", "operator",
+"warning_band"}`` objects.
+"""
+import ast
+import json
+import os
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+COVENANT_TYPES_FILE = os.getenv("COVENANT_TYPES_FILE")
+OPERATORS = ("<=", "<", ">=", ">", "=")
+
+class CovenantType(NamedTuple):
+    name: str
+    formula: str
+    operator: str
+    warning_band: Optional[float] = None  # None uses the engine's default band
+
+COVENANT_TYPES = [
+    CovenantType("Debt-to-EBITDA", "total_debt / ebitda", "<="),
+    CovenantType("Interest Coverage", "ebitda / interest", ">="),
+    CovenantType("Current Ratio", "current_assets / current_liabilities", ">="),
+    CovenantType("Fixed Charge Coverage", "(ebitda - capex) / (interest + principal)", ">="),
+]
+
+def safe_divide(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.true_divide(numerator, denominator)
+    zero = np.asarray(denominator) == 0
+    if zero.any():
+        result = np.where(zero, np.nan, result)
+    return result
+
+# Functions a formula may call, and what they compile to
+FUNCTIONS = {"abs": np.abs, "min": np.minimum, "max": np.maximum}
+BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+UNARY_OPERATORS = (ast.UAdd, ast.USub)
+_GLOBALS = {"__builtins__": {}, "_divide": safe_divide, **{f"_{name}": fn for name, fn in FUNCTIONS.items()}}
+
+class _Compiler(ast.NodeTransformer):
+    """Rejects anything outside the formula grammar and rewrites calls and division"""
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        self.fields: List[str] = []
+
+    def fail(self, node, what: str):
+        raise ValueError(f"{what} is not allowed in covenant formula {self.formula!r}")
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.Load)):
+            self.fail(node, type(node).__name__)
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            self.fail(node, repr(node.value))
+        return node
+
+    def visit_Name(self, node):
+        if node.id.startswith("_") or node.id in FUNCTIONS:
+            self.fail(node, f"name {node.id!r}")
+        if node.id not in self.fields:
+            self.fields.append(node.id)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, UNARY_OPERATORS):
+            self.fail(node, type(node.op).__name__)
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, BINARY_OPERATORS):
+            self.fail(node, type(node.op).__name__)
+        left, right = self.visit(node.left), self.visit(node.right)
+        if isinstance(node.op, ast.Div):
+            return ast.copy_location(ast.Call(ast.Name("_divide", ast.Load()), [left, right], []), node)
+        node.left, node.right = left, right
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            self.fail(node, "this call")
+        if len(node.args) != (1 if node.func.id == "abs" else 2):
+            self.fail(node, f"{node.func.id}() with {len(node.args)} arguments")
+        args = [self.visit(arg) for arg in node.args]
+        return ast.copy_location(ast.Call(ast.Name(f"_{node.func.id}", ast.Load()), args, []), node)
+
+class CompiledFormula:
+    """A formula compiled to a vectorized expression over named columns"""
+
+    def __init__(self, formula: str, name: str = "formula"):
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid covenant formula {formula!r}: {e.msg}") from None
+        compiler = _Compiler(formula)
+        tree = ast.fix_missing_locations(compiler.visit(tree))
+        self.formula = formula
+        self.fields: Tuple[str, ...] = tuple(compiler.fields)
+        self._code = compile(tree, f"<covenant formula {name}>", "eval")
+
+    def evaluate(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Float array over the rows of ``columns``, which must hold every field"""
+        return np.asarray(eval(self._code, _GLOBALS, {field: columns[field] for field in self.fields}), dtype=float)
+
+class RuleSet:
+    """Compiled covenant types, evaluated together over one set of statement columns"""
+
+    def __init__(self, types: Iterable[CovenantType] = COVENANT_TYPES):
+        self.types: Dict[str, CovenantType] = {}
+        self.formulas: Dict[str, CompiledFormula] = {}
+        for covenant_type in types:
+            if covenant_type.operator not in OPERATORS:
+                raise ValueError(f"Unknown operator {covenant_type.operator!r} for covenant type {covenant_type.name}")
+            self.types[covenant_type.name] = covenant_type
+            self.formulas[covenant_type.name] = CompiledFormula(covenant_type.formula, covenant_type.name)
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """Every statement field some formula reads, in definition order"""
+        return tuple(dict.fromkeys(field for formula in self.formulas.values() for field in formula.fields))
+
+    def evaluate(self, columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Ratio name -> values for every type whose fields are all present in ``columns``"""
+        return {
+            name: formula.evaluate(columns)
+            for name, formula in self.formulas.items()
+            if all(field in columns for field in formula.fields)
+        }
+
+    def warning_bands(self, names: Sequence[str], default: float) -> np.ndarray:
+        """Band per covenant name: one vectorized comparison per type with its own band"""
+        names = np.asarray(names, dtype=object)
+        bands = np.full(names.shape, default, dtype=float)
+        for name, covenant_type in self.types.items():
+            if covenant_type.warning_band is not None:
+                bands[names == name] = covenant_type.warning_band
+        return bands
+
+    def operators(self, names: Sequence[str], operators: Sequence[Optional[str]]) -> np.ndarray:
+        """The given operators, with each type's operator filled in where one is missing"""
+        result = np.array(operators, dtype=object)
+        missing = np.flatnonzero((result == None) | (result == ""))  # noqa: E711 - elementwise
+        if len(missing):
+            names = np.asarray(names, dtype=object)
+            result[missing] = [self.types[name].operator if name in self.types else None for name in names[missing]]
+        return result
+
+def load_covenant_types(path: Optional[str] = None) -> List[CovenantType]:
+    """The built-in types, overridden and extended by name from a JSON file"""
+    types = {t.name: t for t in COVENANT_TYPES}
+    if path:
+        with open(path) as f:
+            for entry in json.load(f):
+                types[entry["name"]] = CovenantType(
+                    entry["name"], entry["formula"], entry.get("operator", ">="), entry.get("warning_band")
+                )
+    return list(types.values())
+
+covenant_rules = RuleSet(load_covenant_types(COVENANT_TYPES_FILE))
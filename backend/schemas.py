@@ -1,5 +1,6 @@
+import json
 from pydantic import BaseModel, EmailStr, validator, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 # --- User Schemas ---
@@ -49,8 +50,8 @@ class Loan(LoanBase):
 class CovenantBase(BaseModel):
     name: str = Field(min_length=1, max_length=255)
     threshold: float
-    operator: str = Field(regex="^(<=|>=|<|>|=)$")
-    category: str = Field(regex="^(Financial|Reporting)$")
+    operator: str = Field(pattern="^(<=|>=|<|>|=)$")
+    category: str = Field(pattern="^(Financial|Reporting)$")
 
 class CovenantCreate(CovenantBase):
     loan_id: int
@@ -65,6 +66,16 @@ class Covenant(CovenantBase):
     class Config:
         from_attributes = True
 
+class CovenantObservation(BaseModel):
+    covenant_id: int
+    name: str
+    period: str
+    value: float
+    status: str
+
+    class Config:
+        from_attributes = True
+
 # --- Audit Log Schemas ---
 class AuditLogBase(BaseModel):
     event_type: str
@@ -76,16 +87,116 @@ class AuditLogCreate(AuditLogBase):
 class AuditLog(AuditLogBase):
     id: int
     timestamp: datetime
+    loan_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# --- Job Schemas ---
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: int
+    filename: Optional[str] = None
+    loan_id: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    @validator('result', pre=True)
+    def parse_result(cls, v):
+        return json.loads(v) if isinstance(v, str) else v
 
     class Config:
         from_attributes = True
 
+class StressTestRequest(BaseModel):
+    mode: str = Field("monte_carlo", pattern="^(monte_carlo|grid)$")
+    scenarios: int = Field(10000, ge=1, le=100000)
+    ebitda_change: float = Field(0.0, gt=-1)
+    debt_change: float = Field(0.0, gt=-1)
+    rate_change: float = Field(0.0, gt=-1)
+    ebitda_volatility: float = Field(0.15, ge=0)
+    debt_volatility: float = Field(0.05, ge=0)
+    rate_volatility: float = Field(0.2, ge=0)
+    correlation: Optional[List[List[float]]] = None
+    ebitda_grid: List[float] = []
+    debt_grid: List[float] = []
+    rate_grid: List[float] = []
+    seed: Optional[int] = None
+    loan_ids: Optional[List[int]] = None
+    limit: Optional[int] = Field(None, ge=0)
+
+    @validator('ebitda_grid', 'debt_grid', 'rate_grid')
+    def validate_grid(cls, v):
+        if any(change <= -1 for change in v):
+            raise ValueError('Grid changes must be greater than -100%')
+        return v
+
 # --- Response Schemas ---
 class FileUploadResponse(BaseModel):
     filename: str
     status: str
     message: Optional[str] = None
     
+class LoanFinancialsSummary(BaseModel):
+    loan_id: int
+    periods: int
+    covenants_updated: int
+    ratios: Dict[str, float]
+    status_counts: Dict[str, int]
+
+class BulkFinancialsResponse(BaseModel):
+    filename: str
+    loans_processed: int
+    covenants_updated: int
+    observations_recorded: int
+    loans: List[LoanFinancialsSummary]
+    unknown_loan_ids: List[int]
+    # Rows skipped for a missing, non-numeric or unknown loan_id, and those ids as written
+    rows_rejected: int = 0
+    rejected_loan_ids: List[str] = []
+
+class LoanComplianceSummary(BaseModel):
+    loan_id: int
+    borrower_name: str
+    covenants: int
+    status_counts: Dict[str, int]
+    worst_status: Optional[str] = None
+    min_headroom: Optional[float] = None
+    covenant_details: Optional[List[Covenant]] = None
+
+class PortfolioSummary(BaseModel):
+    loans: int
+    covenants: int
+    status_counts: Dict[str, int]
+    loans_by_worst_status: Dict[str, int]
+    min_headroom: Optional[float] = None
+    loan_summaries: List[LoanComplianceSummary]
+
+class LoanComplianceSnapshot(BaseModel):
+    loan_id: int
+    covenants: int
+    status_counts: Dict[str, int]
+    worst_status: Optional[str] = None
+    min_headroom: Optional[float] = None
+    last_evaluated_at: Optional[datetime] = None
+
+class OwnerComplianceSnapshot(BaseModel):
+    loans: int
+    loans_in_breach: int
+    covenants: int
+    status_counts: Dict[str, int]
+    min_headroom: Optional[float] = None
+    last_evaluated_at: Optional[datetime] = None
+
 class ErrorResponse(BaseModel):
     detail: str
     error_code: Optional[str] = None
@@ -0,0 +1,275 @@
+"""Per-loan and per-owner compliance snapshots, maintained in the writing transaction.
+
+Session events, registered on every Session when ``models`` is imported,
+collect the loans whose covenants change: unit-of-work
+inserts, updates and deletes through ``after_flush``, and bulk INSERT/UPDATE/DELETE
+statements against covenants through ``do_orm_execute``. Just before the
+transaction commits, the snapshots of those loans and of their owners are
+recomputed from the covenants and upserted, so dashboards read one row by
+primary key.
+
+Rebuild or verify every snapshot from scratch:
+    python -m snapshots rebuild
+    python -m snapshots verify
+"""
+import argparse
+import logging
+import math
+import sys
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Sequence, Set
+
+from sqlalchemy import DateTime, case, delete, distinct, event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# models imports this module once its classes are defined, so nothing is taken from
+# portfolio (which imports models) until the functions run
+import models
+import portfolio
+
+logger = logging.getLogger(__name__)
+
+DIRTY_LOANS_KEY = "compliance_snapshot_loans"
+# Covenant attributes that feed a snapshot
+TRACKED_FIELDS = ("status", "current_value", "threshold", "operator", "loan_id")
+# Bound parameters per IN clause, well under every backend's limit
+CHUNK_SIZE = 500
+STATUS_COLUMNS = tuple(status.lower() for status in models.COVENANT_STATUSES)
+# owner_compliance_snapshots columns, in owner_compliance_query order
+OWNER_COLUMNS = ("owner_id", "loans", "loans_in_breach", "covenants", *STATUS_COLUMNS, "min_headroom", "last_evaluated_at")
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def mark_dirty(session: Session, loan_ids: Iterable[int]) -> None:
+    """Schedule snapshot refreshes for ``loan_ids`` when the session commits"""
+    session.info.setdefault(DIRTY_LOANS_KEY, set()).update(loan_id for loan_id in loan_ids if loan_id is not None)
+
+def _chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+def compute_loan_snapshots(session: Session, loan_ids: Iterable[int], evaluated_at: datetime) -> List[Dict]:
+    rows = []
+    for chunk in _chunks(loan_ids):
+        query = portfolio.loan_compliance_query(models.Loan.owner_id, criteria=(models.Loan.id.in_(chunk),))
+        for loan_id, owner_id, covenants, *counts, worst_severity, min_headroom in session.execute(query):
+            rows.append({
+                "loan_id": loan_id,
+                "owner_id": owner_id,
+                "covenants": covenants,
+                **dict(zip(STATUS_COLUMNS, counts)),
+                "worst_status": models.COVENANT_STATUSES[worst_severity] if covenants else None,
+                "min_headroom": min_headroom,
+                "last_evaluated_at": evaluated_at,
+            })
+    return rows
+
+def owner_compliance_query(evaluated_at: datetime, criteria=()):
+    """One row per owner matching ``criteria``, aggregated straight from loans and covenants.
+
+    Reads the source tables rather than the loan snapshots, so a concurrent
+    writer's loan rows can't leak a stale total into the owner row.
+    """
+    status = models.Covenant.status
+    return select(
+        models.Loan.owner_id,
+        func.count(distinct(models.Loan.id)),
+        func.count(distinct(case((status == "Breach", models.Loan.id)))),
+        func.count(models.Covenant.id),
+        *(func.count(case((status == name, models.Covenant.id))) for name in models.COVENANT_STATUSES),
+        func.min(portfolio.headroom_expression()),
+        literal(evaluated_at, DateTime),
+    ).select_from(models.Loan).outerjoin(
+        models.Covenant, models.Covenant.loan_id == models.Loan.id
+    ).where(*criteria).group_by(models.Loan.owner_id)
+
+def compute_owner_snapshots(session: Session, owner_ids: Iterable[int], evaluated_at: datetime) -> List[Dict]:
+    rows = []
+    for chunk in _chunks(owner_ids):
+        query = owner_compliance_query(evaluated_at, criteria=(models.Loan.owner_id.in_(chunk),))
+        rows.extend(dict(zip(OWNER_COLUMNS, row)) for row in session.execute(query))
+    return rows
+
+def _upsert(session: Session, model, key: str, columns: Sequence[str] = (), query=None):
+    """INSERT ... ON CONFLICT (key) DO UPDATE for the session's dialect, of ``query`` when given"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        raise NotImplementedError(f"Compliance snapshots need INSERT ... ON CONFLICT, which {dialect} lacks")
+    statement = UPSERT_DIALECTS[dialect](model)
+    if query is not None:
+        statement = statement.from_select(columns, query)
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column.name: statement.excluded[column.name] for column in model.__table__.columns if column.name != key},
+    )
+
+def refresh_snapshots(session: Session, loan_ids: Set[int]) -> None:
+    """Recompute the snapshots of ``loan_ids`` and of every owner they belong (or belonged) to.
+
+    The owners' user rows are locked first (a no-op on SQLite, which
+    serializes writers anyway), so two transactions refreshing loans of the
+    same owner take turns instead of racing on the owner row. Rows are
+    written with upserts, never DELETE then INSERT.
+    """
+    loan_snapshot = models.LoanComplianceSnapshot
+    owner_snapshot = models.OwnerComplianceSnapshot
+    evaluated_at = datetime.utcnow()
+    owner_ids = set()
+    for chunk in _chunks(loan_ids):
+        owner_ids.update(session.execute(
+            select(loan_snapshot.owner_id).where(loan_snapshot.loan_id.in_(chunk))
+        ).scalars())
+        owner_ids.update(session.execute(select(models.Loan.owner_id).where(models.Loan.id.in_(chunk))).scalars())
+    for chunk in _chunks(owner_ids):
+        session.execute(select(models.User.id).where(models.User.id.in_(chunk)).order_by(models.User.id).with_for_update())
+
+    loans = compute_loan_snapshots(session, loan_ids, evaluated_at)
+    if loans:
+        session.execute(_upsert(session, loan_snapshot, "loan_id"), loans)
+    # Deleted loans have no row to upsert; drop their snapshot
+    removed = loan_ids - {row["loan_id"] for row in loans}
+    for chunk in _chunks(removed):
+        session.execute(delete(loan_snapshot).where(loan_snapshot.loan_id.in_(chunk)))
+
+    for chunk in _chunks(owner_ids):
+        query = owner_compliance_query(evaluated_at, criteria=(models.Loan.owner_id.in_(chunk),))
+        session.execute(_upsert(session, owner_snapshot, "owner_id", OWNER_COLUMNS, query))
+        # Owners left without loans have no aggregate row
+        session.execute(delete(owner_snapshot).where(
+            owner_snapshot.owner_id.in_(chunk),
+            ~select(models.Loan.id).where(models.Loan.owner_id == owner_snapshot.owner_id).exists(),
+        ))
+
+def _collect_flushed_loans(session, flush_context):
+    loan_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.Covenant):
+            state = inspect(obj)
+            if obj in session.dirty and not any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+                continue
+            loan_ids.add(obj.loan_id)
+            loan_ids.update(state.attrs.loan_id.history.deleted or ())
+        elif isinstance(obj, models.Loan) and (obj not in session.dirty or inspect(obj).attrs.owner_id.history.has_changes()):
+            loan_ids.add(obj.id)
+    if loan_ids:
+        mark_dirty(session, loan_ids)
+
+def _collect_bulk_loans(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if not any(mapper.class_ is models.Covenant for mapper in orm_execute_state.all_mappers):
+        return
+    parameters = orm_execute_state.parameters
+    if orm_execute_state.is_insert:
+        rows = parameters if isinstance(parameters, list) else [parameters or {}]
+        mark_dirty(orm_execute_state.session, (row.get("loan_id") for row in rows))
+        return
+    # Resolve the affected loans before the statement runs
+    statement = orm_execute_state.statement
+    query = select(models.Covenant.loan_id).distinct()
+    if isinstance(parameters, list):
+        # Bulk UPDATE by primary key: one parameter set per covenant
+        covenant_ids = [params["id"] for params in parameters]
+        loan_ids = set()
+        for chunk in _chunks(covenant_ids):
+            loan_ids.update(orm_execute_state.session.execute(query.where(models.Covenant.id.in_(chunk))).scalars())
+    else:
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        loan_ids = set(orm_execute_state.session.execute(query, parameters).scalars())
+    mark_dirty(orm_execute_state.session, loan_ids)
+
+def _has_tracked_changes(session: Session) -> bool:
+    return any(isinstance(obj, (models.Covenant, models.Loan)) for obj in chain(session.new, session.dirty, session.deleted))
+
+def _refresh_dirty_snapshots(session):
+    # Commit flushes after this hook runs, so pending covenant and loan
+    # changes are flushed here to be collected; other commits skip the flush
+    if _has_tracked_changes(session):
+        session.flush()
+    loan_ids = session.info.pop(DIRTY_LOANS_KEY, None)
+    if loan_ids:
+        refresh_snapshots(session, loan_ids)
+
+def _discard_dirty_snapshots(session):
+    session.info.pop(DIRTY_LOANS_KEY, None)
+
+LISTENERS = (
+    ("after_flush", _collect_flushed_loans),
+    ("do_orm_execute", _collect_bulk_loans),
+    ("before_commit", _refresh_dirty_snapshots),
+    ("after_rollback", _discard_dirty_snapshots),
+)
+
+def register_listeners(session_class=Session) -> None:
+    """Install the snapshot listeners on ``session_class`` (once per function)"""
+    for name, fn in LISTENERS:
+        if not event.contains(session_class, name, fn):
+            event.listen(session_class, name, fn)
+
+def rebuild(session: Session) -> int:
+    """Recompute every snapshot from the covenants; returns the number of loans"""
+    session.execute(delete(models.OwnerComplianceSnapshot))
+    session.execute(delete(models.LoanComplianceSnapshot))
+    loan_ids = set(session.execute(select(models.Loan.id)).scalars())
+    refresh_snapshots(session, loan_ids)
+    session.commit()
+    return len(loan_ids)
+
+def _same(stored, expected) -> bool:
+    if isinstance(expected, float) or isinstance(stored, float):
+        return stored is not None and expected is not None and math.isclose(stored, expected, rel_tol=1e-9, abs_tol=1e-9)
+    return stored == expected
+
+def verify(session: Session) -> List[str]:
+    """Compare the stored snapshots with a fresh computation; returns one line per mismatch"""
+    loan_ids = set(session.execute(select(models.Loan.id)).scalars())
+    expected_loans = {row["loan_id"]: row for row in compute_loan_snapshots(session, loan_ids, datetime.utcnow())}
+    stored_loans = {row.loan_id: row for row in session.execute(select(models.LoanComplianceSnapshot)).scalars()}
+    expected_owners = {
+        row["owner_id"]: row
+        for row in compute_owner_snapshots(session, {row["owner_id"] for row in expected_loans.values()}, datetime.utcnow())
+    }
+    stored_owners = {row.owner_id: row for row in session.execute(select(models.OwnerComplianceSnapshot)).scalars()}
+
+    mismatches = []
+    for kind, expected, stored in (("loan", expected_loans, stored_loans), ("owner", expected_owners, stored_owners)):
+        for key in sorted(set(expected) | set(stored)):
+            if key not in stored or key not in expected:
+                mismatches.append(f"{kind} {key}: {'missing' if key not in stored else 'stale'} snapshot")
+                continue
+            for column, value in expected[key].items():
+                if column == "last_evaluated_at":
+                    continue
+                if not _same(getattr(stored[key], column), value):
+                    mismatches.append(f"{kind} {key}: {column} is {getattr(stored[key], column)}, expected {value}")
+    return mismatches
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain compliance snapshots")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt snapshots for {rebuild(db)} loans")
+            return 0
+        mismatches = verify(db)
+        for line in mismatches:
+            print(line)
+        print(f"{len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # models imported this file as ``snapshots`` and registered that module's listeners
+    import snapshots
+    sys.exit(snapshots.main())
+else:
+    register_listeners()
@@ -0,0 +1,282 @@
+import itertools
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from covenant_engine import CovenantEngine
+
+# Number of (loan x scenario) cells scored per block; bounds peak memory
+STRESS_BLOCK_CELLS = int(os.getenv("STRESS_BLOCK_CELLS", 1 << 22))
+STRESS_MAX_SCENARIOS = int(os.getenv("STRESS_MAX_SCENARIOS", 100000))
+
+SHOCK_FACTORS = ("ebitda", "debt", "rate")
+
+# Elasticity of each ratio to (EBITDA, debt, interest rate) multipliers.
+# Interest expense scales with both the debt balance and the rate.
+RATIO_SENSITIVITIES = {
+    "Debt-to-EBITDA": (-1.0, 1.0, 0.0),
+    "Interest Coverage": (1.0, -1.0, -1.0),
+    "Fixed Charge Coverage": (1.0, -1.0, -1.0),
+}
+UNAFFECTED = (0.0, 0.0, 0.0)
+
+# EBITDA falls as debt is drawn down and rates rise
+DEFAULT_CORRELATION = (
+    (1.0, -0.3, -0.2),
+    (-0.3, 1.0, 0.1),
+    (-0.2, 0.1, 1.0),
+)
+PERCENTILES = (5, 50, 95)
+
+def _log_factors(changes, label: str) -> np.ndarray:
+    changes = np.asarray(changes, dtype=float)
+    if (changes <= -1).any():
+        raise ValueError(f"{label} changes must be greater than -100%")
+    return np.log1p(changes)
+
+def monte_carlo_shocks(
+    n: int,
+    means: Sequence[float] = (0.0, 0.0, 0.0),
+    volatilities: Sequence[float] = (0.15, 0.05, 0.2),
+    correlation: Sequence[Sequence[float]] = DEFAULT_CORRELATION,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """Draw ``n`` correlated shocks as log multipliers, shape (n, 3).
+
+    ``means`` are the expected relative changes of EBITDA, debt and the
+    interest rate; the log multipliers are jointly normal around them.
+    """
+    corr = np.asarray(correlation, dtype=float)
+    vol = np.asarray(volatilities, dtype=float)
+    if corr.shape != (3, 3) or not np.allclose(corr, corr.T) or not np.allclose(np.diag(corr), 1):
+        raise ValueError("correlation must be a symmetric 3x3 matrix with a unit diagonal")
+    if vol.shape != (3,) or (vol < 0).any():
+        raise ValueError("volatilities must be three non-negative numbers")
+    try:
+        chol = np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        raise ValueError("correlation matrix is not positive definite")
+
+    rng = np.random.default_rng(seed)
+    normals = rng.standard_normal((n, 3))
+    return _log_factors(means, "mean") + (normals @ chol.T) * vol
+
+def grid_shocks(ebitda_changes: Sequence[float], debt_changes: Sequence[float], rate_changes: Sequence[float]) -> np.ndarray:
+    """Every combination of the given relative changes as log multipliers, shape (n, 3)"""
+    axes = [
+        _log_factors(changes or [0.0], label)
+        for changes, label in zip((ebitda_changes, debt_changes, rate_changes), SHOCK_FACTORS)
+    ]
+    return np.array(list(itertools.product(*axes)), dtype=float).reshape(-1, 3)
+
+class StressEngine:
+    """Scores a portfolio of covenants against a matrix of shock scenarios.
+
+    Each covenant is stressed from its latest observed value: the stressed
+    ratio is the base value times the scenario multiplier of its ratio type,
+    so multipliers are computed once per ratio type rather than per covenant.
+    Statuses follow CovenantEngine.status_codes; scenario matrices are built
+    in blocks of loans so memory stays bounded.
+    """
+
+    def __init__(self, engine: Optional[CovenantEngine] = None, block_cells: int = STRESS_BLOCK_CELLS):
+        self.engine = engine or CovenantEngine()
+        self.block_cells = block_cells
+
+    def ratio_multipliers(self, names: Sequence[str], shocks: np.ndarray):
+        """Multiplier matrix (ratio types x scenarios) and each name's row index"""
+        kinds = sorted(set(names))
+        elasticities = np.array([RATIO_SENSITIVITIES.get(kind, UNAFFECTED) for kind in kinds])
+        multipliers = np.exp(elasticities @ shocks.T)
+        index = {kind: i for i, kind in enumerate(kinds)}
+        return multipliers, np.array([index[name] for name in names], dtype=np.intp)
+
+    def run(self, covenants: pd.DataFrame, shocks: np.ndarray) -> Dict[str, Any]:
+        """Breach and warning probabilities per covenant and loan.
+
+        ``covenants`` has columns id, loan_id, name, threshold, operator and
+        current_value. Rows without a current value cannot be stressed and are
+        reported as skipped.
+
+        A ratio limit (<=, <, >=, >) on a non-zero base breaches exactly when
+        its multiplier crosses ``threshold / base`` in one direction, so these
+        covenants are scored by counting against the sorted multipliers, and
+        a loan breaches a scenario when any multiplier passes the tightest
+        critical level it has for that ratio and direction. Other covenants
+        (equality, zero base) are scored on the full scenario matrix.
+        """
+        skipped = int(covenants["current_value"].isna().sum())
+        covenants = covenants.dropna(subset=["current_value"]).sort_values(["loan_id", "id"], kind="stable")
+        n_scenarios = len(shocks)
+        loans_in_breach = np.zeros(n_scenarios, dtype=np.int64)
+        if covenants.empty:
+            return self._summarize(covenants, np.array([], dtype=np.intp), np.array([]), loans_in_breach, skipped)
+
+        multipliers, kind = self.ratio_multipliers(covenants["name"].tolist(), shocks)
+        base = covenants["current_value"].to_numpy(dtype=float)
+        thresholds = covenants["threshold"].to_numpy(dtype=float)
+        operators = covenants["operator"].to_numpy(dtype=object)
+        loan_ids = covenants["loan_id"].to_numpy()
+        new_loan = np.r_[True, loan_ids[1:] != loan_ids[:-1]]
+        loan_starts = np.flatnonzero(new_loan)
+        loan_of_row = np.cumsum(new_loan) - 1
+        n_loans = len(loan_starts)
+
+        upper = (operators == "<=") | (operators == "<")
+        lower = (operators == ">=") | (operators == ">")
+        monotone = (upper | lower) & (base != 0)
+        op_sign = np.where(upper, 1.0, -1.0)
+        scale = np.where(monotone, np.abs(base), 1.0)
+
+        # Risk coordinate x = direction * multiplier; the covenant breaches when x > breach_at
+        direction = np.sign(base) * op_sign
+        breach_at = op_sign * thresholds / scale
+        strict = (operators == "<") | (operators == ">")
+        breach_at = np.where(strict, np.nextafter(breach_at, -np.inf), breach_at)
+        bands = self.engine.warning_bands(covenants["name"].tolist())
+        warning_at = (op_sign * thresholds - thresholds * bands) / scale
+
+        groups, group = np.unique(kind * 2 + (direction > 0), return_inverse=True)
+        risk = np.where((groups % 2 == 1)[:, None], 1.0, -1.0) * multipliers[groups // 2]
+        sorted_risk = np.sort(risk, axis=1)
+
+        breach_probability = np.zeros(len(covenants))
+        warning_probability = np.zeros(len(covenants))
+        for g in range(len(groups)):
+            rows = np.flatnonzero(monotone & (group == g))
+            breached = n_scenarios - np.searchsorted(sorted_risk[g], breach_at[rows], side="right")
+            warned = n_scenarios - np.searchsorted(sorted_risk[g], warning_at[rows], side="right")
+            breach_probability[rows] = breached / n_scenarios
+            warning_probability[rows] = np.maximum(warned - breached, 0) / n_scenarios
+
+        tightest = np.full((n_loans, len(groups)), np.inf)
+        np.minimum.at(tightest, (loan_of_row[monotone], group[monotone]), breach_at[monotone])
+        matrix_rows = np.flatnonzero(~monotone)
+        loan_breach_probability = np.empty(n_loans)
+
+        loans_per_block = max(1, self.block_cells // n_scenarios)
+        for first in range(0, n_loans, loans_per_block):
+            last = min(first + loans_per_block, n_loans)
+            breached = np.zeros((last - first, n_scenarios), dtype=bool)
+            for g in range(len(groups)):
+                breached |= risk[g] > tightest[first:last, g, None]
+
+            in_block = matrix_rows[(loan_of_row[matrix_rows] >= first) & (loan_of_row[matrix_rows] < last)]
+            if len(in_block):
+                values = base[in_block, None] * multipliers[kind[in_block]]
+                codes = self.engine.status_codes(
+                    thresholds[in_block, None], operators[in_block, None], values, bands[in_block, None]
+                )
+                breach_probability[in_block] = (codes == 2).mean(axis=1)
+                warning_probability[in_block] = (codes == 1).mean(axis=1)
+                np.logical_or.at(breached, loan_of_row[in_block] - first, codes == 2)
+
+            loan_breach_probability[first:last] = breached.mean(axis=1)
+            loans_in_breach += breached.sum(axis=0)
+
+        # Stressed values scale monotonically with the multiplier, so their
+        # percentiles follow from the multiplier percentiles of each ratio type
+        multiplier_percentiles = np.percentile(multipliers, PERCENTILES, axis=1).T
+        low_to_high = multiplier_percentiles[kind] * base[:, None]
+        value_percentiles = np.where(base[:, None] < 0, low_to_high[:, ::-1], low_to_high)
+
+        percentile_columns = {f"p{p}": value_percentiles[:, i].round(4) for i, p in enumerate(PERCENTILES)}
+        results = covenants.assign(
+            breach_probability=breach_probability.round(4),
+            warning_probability=warning_probability.round(4),
+            **percentile_columns,
+        )
+        return self._summarize(results, loan_starts, loan_breach_probability, loans_in_breach, skipped)
+
+    def _summarize(
+        self,
+        results: pd.DataFrame,
+        loan_starts: np.ndarray,
+        loan_breach_probability: np.ndarray,
+        loans_in_breach: np.ndarray,
+        skipped: int,
+    ) -> Dict[str, Any]:
+        records = results.to_dict("records")
+        bounds = list(loan_starts) + [len(records)]
+        loans: List[Dict[str, Any]] = []
+        for i, probability in enumerate(loan_breach_probability):
+            group = records[bounds[i]:bounds[i + 1]]
+            loans.append({
+                "loan_id": int(group[0]["loan_id"]),
+                "breach_probability": round(float(probability), 4),
+                "covenants": [
+                    {
+                        "covenant_id": int(row["id"]),
+                        "name": row["name"],
+                        "operator": row["operator"],
+                        "threshold": float(row["threshold"]),
+                        "current_value": float(row["current_value"]),
+                        "breach_probability": row["breach_probability"],
+                        "warning_probability": row["warning_probability"],
+                        "stressed_value_percentiles": {f"p{p}": row[f"p{p}"] for p in PERCENTILES},
+                    }
+                    for row in group
+                ],
+            })
+        loans.sort(key=lambda loan: loan["breach_probability"], reverse=True)
+
+        has_scenarios = len(loans_in_breach) > 0
+        return {
+            "scenarios": len(loans_in_breach),
+            "loans_evaluated": len(loans),
+            "covenants_evaluated": len(records),
+            "covenants_skipped": skipped,
+            "expected_loans_in_breach": round(float(loans_in_breach.mean()), 4) if has_scenarios else 0.0,
+            "loans_in_breach_percentiles": {
+                f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(loans_in_breach, PERCENTILES))
+            } if has_scenarios else {},
+            "loans_in_breach_by_scenario": loans_in_breach,
+            "loans": loans,
+        }
+
+def stress_test(
+    covenants: pd.DataFrame,
+    mode: str = "monte_carlo",
+    scenarios: int = 10000,
+    ebitda_change: float = 0.0,
+    debt_change: float = 0.0,
+    rate_change: float = 0.0,
+    volatilities: Sequence[float] = (0.15, 0.05, 0.2),
+    correlation: Optional[Sequence[Sequence[float]]] = None,
+    ebitda_grid: Sequence[float] = (),
+    debt_grid: Sequence[float] = (),
+    rate_grid: Sequence[float] = (),
+    seed: Optional[int] = None,
+    limit: Optional[int] = None,
+    engine: Optional[CovenantEngine] = None,
+) -> Dict[str, Any]:
+    """Build the scenario set for ``mode`` and run it over ``covenants``.
+
+    Grid runs also report how many loans breach at every grid point; the
+    loan list is ordered by breach probability and cut to ``limit``.
+    """
+    if mode == "grid":
+        shocks = grid_shocks(
+            ebitda_grid or [ebitda_change], debt_grid or [debt_change], rate_grid or [rate_change]
+        )
+    else:
+        shocks = monte_carlo_shocks(
+            scenarios, (ebitda_change, debt_change, rate_change), volatilities, correlation or DEFAULT_CORRELATION, seed
+        )
+    if len(shocks) > STRESS_MAX_SCENARIOS:
+        raise ValueError(f"At most {STRESS_MAX_SCENARIOS} scenarios per run")
+
+    result = StressEngine(engine).run(covenants, shocks)
+    loans_in_breach = result.pop("loans_in_breach_by_scenario")
+    if mode == "grid":
+        changes = np.expm1(shocks).round(6)
+        result["grid"] = [
+            {"ebitda_change": float(e), "debt_change": float(d), "rate_change": float(r), "loans_in_breach": int(n)}
+            for (e, d, r), n in zip(changes, loans_in_breach)
+        ]
+    if limit is not None:
+        result["loans"] = result["loans"][:limit]
+    result["mode"] = mode
+    return result
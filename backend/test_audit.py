@@ -0,0 +1,18 @@
+import models
+from audit import AuditWriter
+from conftest import TestingSessionLocal
+
+def test_audit_writer_batches_events(client, db):
+    writer = AuditWriter(batch_size=3, flush_interval=60, max_queue=5, session_factory=TestingSessionLocal)
+    for i in range(6):
+        writer.enqueue("BATCH_TEST", f"event {i}")
+    assert writer.stats()["dropped"] == 1
+
+    writer.stop()
+    stats = writer.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["written"] == 5
+    assert stats["flushes"] == 2
+
+    details = [log.details for log in db.query(models.AuditLog).filter(models.AuditLog.event_type == "BATCH_TEST").order_by(models.AuditLog.id)]
+    assert details == [f"event {i}" for i in range(5)]
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from covenant_engine import (
+    ChunkedLLMStrategy, CovenantEngine, CovenantRule, LLMStrategy, RegexStrategy, merge_covenants, split_into_chunks,
+)
+from prometheus_client import REGISTRY
+
+def test_evaluate_many_covers_all_operators():
+    engine = CovenantEngine()
+    statuses = engine.evaluate_many(
+        [3.0, 3.0, 3.0, 2.0, 2.0, 2.0, 1.0, 1.0, 1.5, 1.5, 4.0],
+        ["<=", "<=", "<=", ">=", ">=", ">=", "<", ">", "=", "=", "<="],
+        [2.0, 2.8, 3.1, 2.5, 2.1, 1.9, 1.0, 1.0, 1.5, 1.6, np.nan],
+    )
+    assert list(statuses) == [
+        "Compliant", "Warning", "Breach",
+        "Compliant", "Warning", "Breach",
+        "Breach", "Breach",
+        "Compliant", "Breach",
+        "Compliant",
+    ]
+
+def test_evaluate_matches_evaluate_many():
+    engine = CovenantEngine(warning_band=0.2)
+    result = engine.evaluate({"threshold": 2.0, "operator": ">="}, 2.3)
+    assert result == {"status": "Warning", "current_value": 2.3, "threshold": 2.0}
+    assert type(result["status"]) is str
+
+def test_split_into_chunks_overlaps():
+    text = "".join(str(i % 10) for i in range(25))
+    assert split_into_chunks(text, chunk_size=10, overlap=3) == [text[0:10], text[7:17], text[14:24], text[21:25]]
+
+@pytest.fixture
+def stub_llm_server():
+    """OpenAI-compatible chat completions stub that reports covenants named in each chunk.
+
+    ``COVENANT name value`` is reported in full, ``PARTIAL name value`` with
+    only a name and a threshold string.
+    """
+    state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["messages"][0]["content"]
+            with lock:
+                state["requests"] += 1
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            time.sleep(0.05)
+            found = [
+                {"name": name, "threshold": float(value), "operator": "<=", "category": "Financial", "clause": match}
+                for match, name, value in re.findall(r"(COVENANT (\w+) (\d+))", prompt)
+            ] + [{"name": name, "threshold": value} for name, value in re.findall(r"PARTIAL (\w+) (\S+)", prompt)]
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "```json\n" + json.dumps(found) + "\n```"}}],
+            }).encode()
+            with lock:
+                state["in_flight"] -= 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1", state
+    server.shutdown()
+
+def test_chunked_llm_strategy_covers_whole_document(stub_llm_server):
+    base_url, state = stub_llm_server
+    filler = "lorem ipsum " * 2000
+    text = "COVENANT Leverage 4 " + filler + "COVENANT Capex 9 " + filler + "COVENANT Leverage 5"
+    strategy = ChunkedLLMStrategy("test-key", chunk_size=4000, overlap=200, concurrency=2, base_url=base_url)
+
+    covenants = asyncio.run(strategy.aextract(text))
+
+    assert [(c["name"], c["threshold"]) for c in covenants] == [("Leverage", 4.0), ("Capex", 9.0)]
+    assert state["requests"] == len(split_into_chunks(text, 4000, 200))
+    assert state["max_in_flight"] <= 2
+
+def test_chunked_llm_strategy_skips_partial_objects(stub_llm_server):
+    base_url, state = stub_llm_server
+    filler = "lorem ipsum " * 500
+    text = "PARTIAL Leverage 4 PARTIAL Capex tbd " + filler + "COVENANT Leverage 5 COVENANT Capex 9"
+    strategy = ChunkedLLMStrategy("test-key", chunk_size=4000, overlap=200, concurrency=2, base_url=base_url)
+
+    covenants = asyncio.run(strategy.aextract(text))
+
+    assert state["requests"] == 2
+    assert [(c["name"], c["threshold"], c["operator"], c["category"]) for c in covenants] == [
+        ("Leverage", 5.0, "<=", "Financial"), ("Capex", 9.0, "<=", "Financial"),
+    ]
+
+def test_llm_strategy_retries_then_gives_up(monkeypatch):
+    from types import SimpleNamespace
+    monkeypatch.setattr("tenacity.nap.time.sleep", lambda seconds: None)
+    calls = []
+
+    def create(failures, **kwargs):
+        calls.append(kwargs)
+        if len(calls) <= failures:
+            raise ConnectionError("connection reset")
+        message = SimpleNamespace(content='[{"name": "Leverage", "threshold": 4.0}]')
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+
+    strategy = LLMStrategy.__new__(LLMStrategy)
+    strategy.model_name = "test-model"
+    retries = lambda: REGISTRY.get_sample_value("creditsentinel_llm_retries_total", {"strategy": "LLMStrategy"}) or 0
+    before = retries()
+
+    strategy.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: create(2, **kw))))
+    assert strategy.extract("text") == [{"name": "Leverage", "threshold": 4.0}]
+    assert len(calls) == 3 and retries() == before + 2
+
+    calls.clear()
+    strategy.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: create(5, **kw))))
+    assert strategy.extract("text") == []
+    assert len(calls) == 3 and retries() == before + 4
+
+def test_regex_scan_returns_every_occurrence():
+    text = ("The Leverage Ratio shall not exceed 3.50x. Minimum Net Worth of $25,000,000.\n"
+            "Capital Expenditures shall not exceed $5 million. Net Debt to EBITDA of no more than 4.0")
+    found = RegexStrategy().scan(text)
+    assert [(c["name"], c["threshold"]) for c in found] == [
+        ("Debt-to-EBITDA", 3.5),
+        ("Minimum Net Worth", 25000000.0),
+        ("Capital Expenditures", 5000000.0),
+        ("Debt-to-EBITDA", 4.0),
+    ]
+    first = found[0]
+    assert text[first["start"]:first["end"]] == "Leverage Ratio shall not exceed 3.50"
+    assert found[2]["clause"] == "Capital Expenditures shall not exceed $5 million"
+
+def test_regex_extract_keeps_first_of_each_rule():
+    strategy = RegexStrategy(rules=[CovenantRule("Leverage", r"leverage", "<=")])
+    covenants = strategy.extract("Leverage of 3.0. Later the leverage of 4.0.")
+    assert [(c["name"], c["threshold"]) for c in covenants] == [("Leverage", 3.0)]
+
+def test_merge_covenants_skips_malformed_chunks():
+    merged = merge_covenants([
+        [{"name": "Leverage", "threshold": 4.0}, "Interest Coverage", None, {"threshold": 1.0, "operator": "<="}],
+        {"name": "Capex", "threshold": 9.0, "operator": "<="},
+        "not a list",
+        [{"name": "leverage", "threshold": "5.0", "operator": "<="}, {"name": "Current Ratio", "threshold": 1.2}],
+        [{"name": "Debt-to-EBITDA", "threshold": "n/a", "operator": "<="}, {"name": "Capex", "threshold": 9.0, "operator": "~"},
+         {"name": "Capex", "threshold": 9.0, "operator": "<=", "category": "Other"}],
+    ])
+    assert [(c["name"], c["threshold"], c["operator"], c["category"]) for c in merged] == [
+        ("leverage", 5.0, "<=", "Financial"), ("Current Ratio", 1.2, ">=", "Financial"),
+    ]
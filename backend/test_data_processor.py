@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from data_processor import DataProcessor
+
+def test_compute_ratio_frame_covers_every_period():
+    df = pd.DataFrame({
+        "period": ["2024Q1", "2024Q2", "2024Q3"],
+        "ebitda": [100.0, 0.0, 80.0],
+        "total_debt": [300.0, 300.0, 320.0],
+        "interest": [50.0, 50.0, 0.0],
+    })
+    frame = DataProcessor().compute_ratio_frame(df)
+    assert list(frame.columns) == ["period", "Debt-to-EBITDA", "Interest Coverage"]
+    assert list(frame["period"]) == ["2024Q1", "2024Q2", "2024Q3"]
+    assert frame["Debt-to-EBITDA"].tolist()[0::2] == [3.0, 4.0]
+    assert np.isnan(frame["Debt-to-EBITDA"][1])
+    assert np.isnan(frame["Interest Coverage"][2])
+
+def test_calculate_ratios_uses_latest_period():
+    df = pd.DataFrame({"ebitda": [100.0, 80.0], "total_debt": [300.0, 320.0], "interest": [50.0, 0.0]})
+    assert DataProcessor().calculate_ratios(df) == {"Debt-to-EBITDA": 4.0}
+
+def test_compute_ratio_frame_labels_period_less_rows_with_upload_time():
+    from datetime import datetime
+    df = pd.DataFrame({"ebitda": [100.0] * 10, "total_debt": [300.0] * 10})
+    frame = DataProcessor().compute_ratio_frame(df, uploaded_at=datetime(2024, 3, 31, 12, 0, 5, 250))
+    assert frame["period"].tolist()[:2] == ["2024-03-31T12:00:05.000250/01", "2024-03-31T12:00:05.000250/02"]
+    assert frame["period"].tolist()[-1] == "2024-03-31T12:00:05.000250/10"
+
+def test_normalize_financials_projects_required_columns():
+    processor = DataProcessor()
+    csv = (b"Period, EBITDA ,Total_Debt,Interest,Region,Notes\n"
+           b"2024Q1,100,320,40,EMEA,ok\n"
+           b"2024Q2,n/a,300,,EMEA,late\n")
+    df = processor.normalize_financials(csv, "financials.csv")
+    assert list(df.columns) == ["period", "ebitda", "total_debt", "interest"]
+    assert df["ebitda"].dtype == np.float64 and np.isnan(df["ebitda"][1])
+    frame = processor.compute_ratio_frame(df)
+    assert frame.iloc[0][["Debt-to-EBITDA", "Interest Coverage"]].tolist() == [3.2, 2.5]
+    assert frame.iloc[1][["Debt-to-EBITDA", "Interest Coverage"]].isna().all()
+
+def test_normalize_financials_reads_parquet_and_arrow_ipc(tmp_path):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    df = pd.DataFrame({"Loan_ID": [1, 2], "EBITDA": [100, 80], "Total_Debt": [300, 320], "Notes": ["a", "b"]})
+    parquet = tmp_path / "feed.parquet"
+    df.to_parquet(parquet)
+    arrow = tmp_path / "feed.arrow"
+    feather.write_feather(pa.Table.from_pandas(df), arrow)
+
+    processor = DataProcessor()
+    for path in (parquet, arrow):
+        loaded = processor.normalize_financials(path.read_bytes(), path.name)
+        assert list(loaded.columns) == ["loan_id", "ebitda", "total_debt"]
+        assert loaded.dtypes.eq(np.float64).all()
+        assert processor.compute_ratio_frame(loaded)["Debt-to-EBITDA"].tolist() == [3.0, 4.0]
+
+def test_normalize_financials_streams_excel_sheets(monkeypatch):
+    import io
+    import excel_reader
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        pd.DataFrame({"Cover": ["Borrower pack"]}).to_excel(writer, sheet_name="Cover", index=False)
+        pd.DataFrame({"Period": ["2024Q1", "2024Q2"], "EBITDA": [100, "n/a"], "Total_Debt": [320, 300], "Memo": ["a", "b"]}).to_excel(
+            writer, sheet_name="Quarterly Financials", index=False)
+        pd.DataFrame({"EBITDA": [50], "Total_Debt": [100]}).to_excel(writer, sheet_name="Annual Financials", index=False)
+    content = buffer.getvalue()
+
+    processor = DataProcessor()
+    for engine in ("auto", "openpyxl", "pandas"):
+        monkeypatch.setattr(excel_reader, "EXCEL_ENGINE", engine)
+        # The cover sheet has no financial columns, so the first matching sheet is used
+        df = processor.normalize_financials(content, "pack.xlsx")
+        assert list(df.columns) == ["period", "ebitda", "total_debt"]
+        assert df["ebitda"].dtype == np.float64 and np.isnan(df["ebitda"][1])
+        assert len(processor.normalize_financials(content, "pack.xlsx", max_rows=1)) == 1
+        annual = processor.normalize_financials(content, "pack.xlsx", sheet_pattern="^annual")
+        assert processor.calculate_ratios(annual) == {"Debt-to-EBITDA": 2.0}
+
+def test_excel_max_rows_keeps_the_latest_periods(monkeypatch):
+    import io
+    import excel_reader
+
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "Period": ["2023Q1", "2023Q2", "2023Q3", "2023Q4", None],
+        "EBITDA": [100, 100, 100, 50, None],
+        "Total_Debt": [200, 200, 200, 300, None],
+    }).to_excel(buffer, sheet_name="Financials", index=False)
+    content = buffer.getvalue()
+
+    processor = DataProcessor()
+    monkeypatch.setattr(excel_reader, "EXCEL_MAX_ROWS", 2)
+    for engine in ("auto", "openpyxl", "pandas"):
+        monkeypatch.setattr(excel_reader, "EXCEL_ENGINE", engine)
+        df = processor.normalize_financials(content, "pack.xlsx")
+        assert df["period"].tolist() == ["2023Q3", "2023Q4"]
+        assert processor.calculate_ratios(df) == {"Debt-to-EBITDA": 6.0}
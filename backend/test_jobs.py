@@ -0,0 +1,22 @@
+import jobs
+import models
+
+def test_start_executor_fails_jobs_interrupted_by_restart(client, loan_with_covenants, db):
+    loan_id, headers = loan_with_covenants()
+    user_id = db.query(models.User.id).filter(models.User.email == "test@example.com").scalar()
+    db.add_all([
+        models.Job(id=f"job{status}", kind="financials", status=status, user_id=user_id, loan_id=loan_id)
+        for status in (jobs.JOB_QUEUED, jobs.JOB_RUNNING, jobs.JOB_SUCCEEDED)
+    ])
+    db.commit()
+
+    jobs.start_executor()
+
+    statuses = {job["id"]: (job["status"], job["error"])
+                for job in (client.get(f"/jobs/job{status}", headers=headers).json()
+                            for status in (jobs.JOB_QUEUED, jobs.JOB_RUNNING, jobs.JOB_SUCCEEDED))}
+    assert statuses == {
+        "jobqueued": (jobs.JOB_FAILED, jobs.INTERRUPTED_ERROR),
+        "jobrunning": (jobs.JOB_FAILED, jobs.INTERRUPTED_ERROR),
+        "jobsucceeded": (jobs.JOB_SUCCEEDED, None),
+    }
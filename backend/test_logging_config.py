@@ -0,0 +1,37 @@
+import logging
+import queue
+
+from prometheus_client import REGISTRY
+
+from logging_config import EventSampler, LazyQueueHandler, parse_sample_rates
+
+def make_record(msg="Event %s", args=("x",), **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_event_sampler_keeps_one_in_n():
+    sampler = EventSampler(parse_sample_rates("LOGIN_FAILED=0.25, NOISY=0"))
+    kept = [sampler.filter(make_record(event_type="LOGIN_FAILED")) for _ in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+    assert not sampler.filter(make_record(event_type="NOISY"))
+    assert sampler.filter(make_record(event_type="LOAN_CREATED"))
+    assert sampler.filter(make_record())
+
+def test_queue_handler_defers_formatting_and_never_blocks():
+    handler = LazyQueueHandler(queue.Queue(1))
+    handler.handle(make_record("Event %s by %s", ("LOAN_CREATED", 7)))
+    record = handler.queue.get_nowait()
+    assert record.msg == "Event %s by %s" and record.args == ("LOAN_CREATED", 7)
+
+    # Mutable arguments are captured as they were at the call
+    details = {"loans": 1}
+    handler.handle(make_record("Details %s", (details,)))
+    details["loans"] = 2
+    assert handler.queue.get_nowait().msg == "Details {'loans': 1}"
+
+    dropped = lambda: REGISTRY.get_sample_value("creditsentinel_log_records_dropped_total")
+    before = dropped()
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert dropped() == before + 1
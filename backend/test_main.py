@@ -1,31 +1,6 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from database import Base, get_db
-from main_prod import app
-import models
-
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
+import time
 
-@pytest.fixture
-def client():
-    Base.metadata.create_all(bind=engine)
-    with TestClient(app) as c:
-        yield c
-    Base.metadata.drop_all(bind=engine)
+import models
 
 def test_health_check(client):
     response = client.get("/health")
@@ -68,3 +43,360 @@ def test_invalid_password(client):
         "password": "weak"
     })
     assert response.status_code == 422
+
+def test_portfolio_reevaluate(client, loan_with_covenants):
+    _, headers = loan_with_covenants(
+        ("Debt-to-EBITDA", 3.0, "<=", 3.5, "Compliant"),
+        ("Current Ratio", 1.0, ">", 1.5),
+        ("Interest Coverage", 2.0, ">="),
+    )
+    response = client.post("/portfolio/reevaluate", headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["evaluated"] == 2
+    assert body["changed"] == 2
+    assert body["status_counts"] == {"Compliant": 1, "Warning": 0, "Breach": 1}
+
+def test_upload_agreement_uses_extraction_cache(client, loan_with_covenants, make_pdf, monkeypatch):
+    import main_prod
+    loan_id, headers = loan_with_covenants()
+    pdf = make_pdf(["Leverage Ratio shall not exceed 3.5x", "Interest Coverage of at least 2.0"])
+
+    calls = []
+    extract = main_prod.engine_ai.strategy.extract
+    monkeypatch.setattr(main_prod.engine_ai.strategy, "extract", lambda text: calls.append(text) or extract(text))
+    main_prod.extraction_cache.clear()
+
+    for _ in range(2):
+        response = client.post(f"/upload-agreement?loan_id={loan_id}", headers=headers,
+                               files={"file": ("agreement.pdf", pdf, "application/pdf")})
+        assert response.status_code == 200
+        assert response.json()["message"] == "Extracted 2 covenants"
+    assert len(calls) == 1
+    assert main_prod.extraction_cache.stats()["memory_hits"] == 1
+
+    # A cold process still hits the persistent tier
+    main_prod.extraction_cache.clear()
+    client.post(f"/upload-agreement?loan_id={loan_id}", headers=headers,
+                files={"file": ("agreement.pdf", pdf, "application/pdf")})
+    assert len(calls) == 1
+    assert main_prod.extraction_cache.stats()["persistent_hits"] == 1
+
+def test_upload_agreement_drops_incomplete_covenants_before_caching(client, loan_with_covenants, db, monkeypatch):
+    import main_prod
+    loan_id, headers = loan_with_covenants()
+    calls = []
+    extracted = [
+        {"name": "Leverage", "threshold": "4.0", "operator": "<=", "category": "Financial"},
+        {"name": "Interest Coverage", "threshold": 2.0},
+        {"name": "Capex", "threshold": "n/a", "operator": "<=", "category": "Financial"},
+    ]
+    monkeypatch.setattr(main_prod.engine_ai.strategy, "extract", lambda text: calls.append(text) or extracted)
+    main_prod.extraction_cache.clear()
+
+    for _ in range(2):
+        response = client.post(f"/upload-agreement?loan_id={loan_id}", headers=headers,
+                               files={"file": ("agreement.txt", b"partial agreement", "text/plain")})
+        assert response.status_code == 200
+        assert response.json()["message"] == "Extracted 1 covenants"
+    assert len(calls) == 1
+    covenants = db.query(models.Covenant).filter(models.Covenant.loan_id == loan_id).all()
+    assert [(c.name, c.threshold) for c in covenants] == [("Leverage", 4.0), ("Leverage", 4.0)]
+
+def test_uploads_are_spooled_with_size_limit(client, loan_with_covenants, monkeypatch, tmp_path):
+    import uploads
+    loan_id, headers = loan_with_covenants()
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 64)
+    monkeypatch.setattr(uploads, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(uploads, "MAX_REQUEST_SIZE", 4096)
+
+    csv = b"period,ebitda,total_debt,interest\n" + b"2024Q1,100,320,40\n" * 10
+    response = client.post(f"/upload-financials?loan_id={loan_id}", headers=headers,
+                           files={"file": ("financials.csv", csv, "text/csv")})
+    assert response.status_code == 200
+
+    # Over the file limit but within the request limit: refused while spooling
+    response = client.post(f"/upload-financials?loan_id={loan_id}", headers=headers,
+                           files={"file": ("financials.csv", csv * 10, "text/csv")})
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+    # Over the request limit: refused from Content-Length, or as a chunked body streams in
+    response = client.post(f"/upload-financials?loan_id={loan_id}", headers=headers,
+                           files={"file": ("financials.csv", csv * 30, "text/csv")})
+    assert response.status_code == 413
+    chunked = client.post(f"/upload-financials?loan_id={loan_id}", content=iter([b"x" * 1024] * 8),
+                          headers={**headers, "Content-Type": "multipart/form-data; boundary=b"})
+    assert chunked.status_code == 413
+
+def test_metrics_endpoint(client, loan_with_covenants, make_pdf):
+    import main_prod
+    loan_id, headers = loan_with_covenants()
+    main_prod.extraction_cache.clear()
+    client.post(f"/upload-agreement?loan_id={loan_id}", headers=headers,
+                files={"file": ("agreement.pdf", make_pdf(["Leverage Ratio shall not exceed 3.5x"] * 2), "application/pdf")})
+    csv = b"period,ebitda,total_debt,interest\n2024Q1,100,320,40\n"
+    client.post(f"/upload-financials?loan_id={loan_id}", headers=headers, files={"file": ("financials.csv", csv, "text/csv")})
+    client.get("/loans/999999/snapshot", headers=headers)
+    client.get("/no-such-route")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'creditsentinel_http_request_duration_seconds_count{method="POST",route="/loans",status="2xx"}' in body
+    assert 'route="/loans/{loan_id}/snapshot",status="4xx"' in body
+    assert 'route="unmatched",status="4xx"' in body
+    assert 'creditsentinel_extraction_duration_seconds_count{strategy="RegexStrategy"}' in body
+    assert 'creditsentinel_financials_parse_duration_seconds_count{file_type="csv"}' in body
+    assert "creditsentinel_pdf_pages_parsed_total" in body
+    assert 'creditsentinel_db_pool_checkout_seconds_bucket{le="+Inf",pool="sync"}' in body
+    assert 'creditsentinel_db_pool_checked_out{pool="sync"}' in body
+
+def wait_for_job(client, headers, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_background_financials_job(client, auth_headers, loan_with_covenants):
+    loan_id, headers = loan_with_covenants(("Debt-to-EBITDA", 3.0, "<="))
+
+    csv = b"period,ebitda,total_debt,interest,current_assets,current_liabilities\n2024Q1,100,320,40,50,40\n"
+    response = client.post(f"/upload-financials?loan_id={loan_id}&background=true", headers=headers,
+                           files={"file": ("financials.csv", csv, "text/csv")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status_url"] == f"/jobs/{job_id}"
+
+    job = wait_for_job(client, headers, job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 100
+    assert job["result"]["covenants_updated"] == 1
+    assert job["result"]["ratios"]["Debt-to-EBITDA"] == 3.2
+
+    other = auth_headers("other@example.com")
+    assert client.get(f"/jobs/{job_id}", headers=other).status_code == 404
+
+def test_financials_record_observation_history(client, loan_with_covenants):
+    loan_id, headers = loan_with_covenants(("Debt-to-EBITDA", 3.0, "<="), ("Interest Coverage", 2.0, ">="))
+
+    csv = (b"period,ebitda,total_debt,interest\n"
+           b"2024Q1,100,250,20\n2024Q2,100,280,40\n2024Q3,100,320,60\n")
+    for _ in range(2):  # re-uploading replaces the same periods
+        response = client.post(f"/upload-financials?loan_id={loan_id}", headers=headers,
+                               files={"file": ("financials.csv", csv, "text/csv")})
+        assert response.status_code == 200
+
+    history = client.get(f"/loans/{loan_id}/observations?covenant=Debt-to-EBITDA", headers=headers).json()
+    assert [(h["period"], h["value"], h["status"]) for h in history] == [
+        ("2024Q1", 2.5, "Compliant"), ("2024Q2", 2.8, "Warning"), ("2024Q3", 3.2, "Breach"),
+    ]
+    assert len(client.get(f"/loans/{loan_id}/observations", headers=headers).json()) == 6
+
+def test_period_less_uploads_append_observation_history(client, loan_with_covenants):
+    loan_id, headers = loan_with_covenants(("Debt-to-EBITDA", 3.0, "<="))
+
+    for csv in (b"ebitda,total_debt\n100,250\n100,280\n", b"ebitda,total_debt\n100,320\n"):
+        response = client.post(f"/upload-financials?loan_id={loan_id}", headers=headers,
+                               files={"file": ("financials.csv", csv, "text/csv")})
+        assert response.status_code == 200
+
+    history = client.get(f"/loans/{loan_id}/observations", headers=headers).json()
+    assert [h["value"] for h in history] == [2.5, 2.8, 3.2]
+    assert len({h["period"] for h in history}) == 3
+
+def test_bulk_financials_upload(client, loan_with_covenants, db):
+    import io
+    import pandas as pd
+    leverage = ("Debt-to-EBITDA", 3.0, "<=")
+    first, headers = loan_with_covenants(leverage, borrower_name="Borrower 0")
+    second, _ = loan_with_covenants(leverage, borrower_name="Borrower 1")
+    loan_ids = [first, second]
+    other_loan, _ = loan_with_covenants(leverage, email="other@example.com", borrower_name="Not Mine")
+
+    feed = pd.DataFrame({
+        "Loan_ID": [loan_ids[0], loan_ids[1], loan_ids[0], loan_ids[1], other_loan],
+        "Period": ["2024Q1", "2024Q1", "2024Q2", "2024Q2", "2024Q2"],
+        "EBITDA": [100.0, 100.0, 100.0, 100.0, 100.0],
+        "Total_Debt": [250.0, 290.0, 280.0, 350.0, 500.0],
+    })
+    buffer = io.BytesIO()
+    feed.to_parquet(buffer)
+    response = client.post("/upload-financials/bulk", headers=headers,
+                           files={"file": ("feed.parquet", buffer.getvalue(), "application/octet-stream")})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["loans_processed"] == 2
+    assert body["covenants_updated"] == 2
+    assert body["observations_recorded"] == 4
+    assert body["unknown_loan_ids"] == [other_loan]
+    assert [(loan["loan_id"], loan["periods"], loan["ratios"], loan["status_counts"]) for loan in body["loans"]] == [
+        (loan_ids[0], 2, {"Debt-to-EBITDA": 2.8}, {"Warning": 1}),
+        (loan_ids[1], 2, {"Debt-to-EBITDA": 3.5}, {"Breach": 1}),
+    ]
+
+    untouched = db.query(models.Covenant).filter(models.Covenant.loan_id == other_loan).one()
+    assert untouched.status == "Pending"
+
+def test_simulate_stress_test(client, loan_with_covenants):
+    loan_id, headers = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 3.9, "Warning"),
+        ("Current Ratio", 1.0, ">=", 1.5, "Compliant"),
+        email="stress@example.com", borrower_name="Stress Corp",
+    )
+
+    response = client.post("/simulate", json={"scenarios": 2000, "ebitda_change": -0.1, "seed": 1}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["scenarios"] == 2000
+    [loan] = body["loans"]
+    assert loan["loan_id"] == loan_id
+    probabilities = {c["name"]: c["breach_probability"] for c in loan["covenants"]}
+    assert probabilities["Debt-to-EBITDA"] > 0.5
+    assert probabilities["Current Ratio"] == 0.0
+
+    bad = client.post("/simulate", json={"mode": "grid", "ebitda_grid": [-1.5]}, headers=headers)
+    assert bad.status_code == 422
+
+def test_principal_cache_skips_user_lookup_and_invalidates(client, auth_headers, db):
+    from auth import principal_cache
+    from sqlalchemy import update
+    headers = auth_headers("cached@example.com")
+
+    assert client.get("/loans", headers=headers).status_code == 200
+    hits = principal_cache.stats()["hits"]
+    assert client.get("/loans", headers=headers).status_code == 200
+    assert principal_cache.stats()["hits"] == hits + 1
+
+    user = db.query(models.User).filter(models.User.email == "cached@example.com").first()
+    user.is_active = False
+    db.commit()
+    assert principal_cache.get("cached@example.com") is None
+    assert client.get("/loans", headers=headers).status_code == 401
+
+    db.execute(update(models.User).where(models.User.id == user.id).values(is_active=True))
+    db.commit()
+    assert client.get("/loans", headers=headers).status_code == 200
+
+def test_login_rehashes_outdated_password_hash(client, db):
+    from passlib.context import CryptContext
+    legacy_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash("LegacyPass123")
+    db.add(models.User(email="legacy@example.com", hashed_password=legacy_hash))
+    db.commit()
+
+    response = client.post("/token", data={"username": "legacy@example.com", "password": "LegacyPass123"})
+    assert response.status_code == 200
+    db.expire_all()
+    stored = db.query(models.User).filter(models.User.email == "legacy@example.com").first().hashed_password
+    assert stored != legacy_hash
+    assert stored.startswith("$2b$04$")
+
+def test_keyset_pagination_and_ndjson_export(client, auth_headers):
+    import json
+    headers = auth_headers("pages@example.com")
+    created = [
+        client.post("/loans", json={"borrower_name": f"Borrower {i}", "loan_amount": 1000 + i}, headers=headers).json()["id"]
+        for i in range(5)
+    ]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/loans", params=params, headers=headers)
+        assert response.status_code == 200
+        seen += [loan["id"] for loan in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == created[::-1]
+
+    export = client.get("/loans", params={"format": "ndjson"}, headers=headers)
+    assert export.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in export.text.splitlines()]
+    assert [row["id"] for row in rows] == created[::-1]
+    assert rows[0]["borrower_name"] == "Borrower 4"
+
+    assert client.get("/loans", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+
+def test_portfolio_summary(client, loan_with_covenants):
+    email = "summary@example.com"
+    first, headers = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 3.0, "Compliant"),
+        ("Interest Coverage", 2.0, ">=", 2.1, "Warning"),
+        email=email, borrower_name="Alpha", loan_amount=1000,
+    )
+    second, _ = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 5.0, "Breach"),
+        ("Current Ratio", 1.0, ">="),
+        email=email, borrower_name="Beta", loan_amount=2000,
+    )
+    empty, _ = loan_with_covenants(email=email, borrower_name="Gamma", loan_amount=3000)
+
+    body = client.get("/portfolio/summary", headers=headers).json()
+    assert body["loans"] == 3
+    assert body["status_counts"] == {"Pending": 1, "Compliant": 1, "Warning": 1, "Breach": 1}
+    assert body["loans_by_worst_status"]["Warning"] == 1
+    assert body["min_headroom"] == -0.25
+    loans = {loan["loan_id"]: loan for loan in body["loan_summaries"]}
+    assert loans[first]["worst_status"] == "Warning"
+    assert loans[first]["min_headroom"] == 0.05
+    assert loans[second]["worst_status"] == "Breach"
+    assert loans[empty]["worst_status"] is None
+    assert loans[first]["covenant_details"] is None
+
+    detailed = client.get("/portfolio/summary", params={"detail": True}, headers=headers).json()
+    details = {loan["loan_id"]: loan["covenant_details"] for loan in detailed["loan_summaries"]}
+    assert len(details[first]) == 2 and details[empty] == []
+
+def test_compliance_snapshots_follow_covenant_changes(client, loan_with_covenants, db):
+    from sqlalchemy import update
+
+    email = "snapshot@example.com"
+    loan_id, headers = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 5.0, "Compliant"),
+        ("Interest Coverage", 2.0, ">=", 3.0, "Compliant"),
+        email=email, borrower_name="Delta", loan_amount=1000,
+    )
+    other, _ = loan_with_covenants(email=email, borrower_name="Echo", loan_amount=1000)
+
+    snapshot = client.get(f"/loans/{loan_id}/snapshot", headers=headers).json()
+    assert snapshot["covenants"] == 2 and snapshot["status_counts"]["Compliant"] == 2
+    assert snapshot["min_headroom"] == -0.25
+
+    # Bulk UPDATE through the async session
+    assert client.post("/portfolio/reevaluate", headers=headers).json()["changed"] == 1
+    owner = client.get("/portfolio/snapshot", headers=headers).json()
+    assert owner["loans"] == 2 and owner["loans_in_breach"] == 1
+    assert owner["status_counts"] == {"Pending": 0, "Compliant": 1, "Warning": 0, "Breach": 1}
+
+    # Criteria UPDATE and unit-of-work delete through a sync session
+    db.execute(update(models.Covenant).where(models.Covenant.loan_id == loan_id).values(status="Warning"))
+    db.delete(db.get(models.Loan, other))
+    db.commit()
+    owner = client.get("/portfolio/snapshot", headers=headers).json()
+    assert owner["loans"] == 1 and owner["status_counts"]["Warning"] == 2
+    assert client.get(f"/loans/{other}/snapshot", headers=headers).status_code == 404
+
+def test_bulk_financials_reports_rejected_rows(client, loan_with_covenants, db):
+    loan_id, headers = loan_with_covenants(("Debt-to-EBITDA", 3.0, "<="), email="rejects@example.com")
+    other_loan, _ = loan_with_covenants(email="other@example.com", borrower_name="Not Mine")
+
+    csv = (f"loan_id,period,ebitda,total_debt\n{loan_id},2024Q1,100,250\nabc,2024Q1,100,250\n,2024Q1,100,250\n"
+           f"{other_loan},2024Q1,100,250\n999999,2024Q1,100,250\n{loan_id}.5,2024Q1,100,250\nabc,2024Q2,100,250\n").encode()
+    response = client.post("/upload-financials/bulk", headers=headers, files={"file": ("feed.csv", csv, "text/csv")})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["loans_processed"] == 1 and body["observations_recorded"] == 1
+    assert body["rows_rejected"] == 6
+    assert body["rejected_loan_ids"] == sorted(["", "abc", str(other_loan), "999999", f"{loan_id}.5"])
+    assert body["unknown_loan_ids"] == sorted([other_loan, 999999])
+
+    from audit import audit_writer
+    audit_writer.flush()
+    event = db.query(models.AuditLog).filter(models.AuditLog.event_type == "FINANCIALS_BULK_ANALYZED").one()
+    assert "6 rows rejected" in event.details and "abc" in event.details
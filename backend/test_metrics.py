@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+SCRIPT = textwrap.dedent("""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    import metrics
+
+    def work(pages):
+        metrics.pdf_pages.inc(pages)
+
+    if __name__ == "__main__":
+        metrics.pdf_pages.inc(1)
+        with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(work, [10, 100]))
+        print(metrics.render_metrics().decode())
+""")
+
+def test_multiprocess_mode_aggregates_worker_processes(tmp_path):
+    script = tmp_path / "record.py"
+    script.write_text(SCRIPT)
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+           "PYTHONPATH": os.pathsep.join([os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH", "")])}
+    result = subprocess.run([sys.executable, str(script)], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "creditsentinel_pdf_pages_parsed_total 111.0" in result.stdout
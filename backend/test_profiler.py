@@ -0,0 +1,50 @@
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from profiler import ProfilerMiddleware, enforce_retention, tag
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def make_app(tmp_path, slow_ms):
+    app = FastAPI()
+
+    @app.get("/loans/{loan_id}/work")
+    def work(loan_id: int):
+        tag(user_id=7)
+        busy_wait(0.1)
+        return {"loan_id": loan_id}
+
+    app.add_middleware(ProfilerMiddleware, sample_rate=1.0, slow_ms=slow_ms, directory=str(tmp_path))
+    return app
+
+def test_slow_requests_write_tagged_folded_stacks(tmp_path):
+    with TestClient(make_app(tmp_path, slow_ms=50)) as client:
+        assert client.get("/loans/42/work").status_code == 200
+
+    (name,) = os.listdir(tmp_path)
+    assert "-GET-loans_loan_id_work-user_7-loan_42-" in name
+    lines = (tmp_path / name).read_text().splitlines()
+    assert lines
+    assert all(line.startswith("GET /loans/{loan_id}/work;") and line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_wait (test_profiler.py" in line for line in lines)
+
+    with TestClient(make_app(tmp_path, slow_ms=60000)) as client:
+        client.get("/loans/42/work")
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_retention_keeps_newest_profiles(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"profile-{i}.folded"
+        path.write_text("a;b 1\n" * 10)
+        os.utime(path, (1000 + i, 1000 + i))
+    (tmp_path / "notes.txt").write_text("not a profile")
+
+    assert enforce_retention(str(tmp_path), max_files=3, max_bytes=10 ** 6) == 2
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "profile-2.folded", "profile-3.folded", "profile-4.folded"]
+    assert enforce_retention(str(tmp_path), max_files=10, max_bytes=130) == 1
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "profile-3.folded", "profile-4.folded"]
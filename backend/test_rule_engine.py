@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from covenant_engine import CovenantEngine
+from data_processor import DataProcessor
+from rule_engine import CompiledFormula, CovenantType, RuleSet, load_covenant_types
+
+def test_formula_compiles_to_vectorized_expression():
+    formula = CompiledFormula("(ebitda - capex) / (interest + principal)")
+    assert formula.fields == ("ebitda", "capex", "interest", "principal")
+    values = formula.evaluate({
+        "ebitda": np.array([120.0, 50.0, np.nan]),
+        "capex": np.array([20.0, 10.0, 5.0]),
+        "interest": np.array([30.0, 0.0, 10.0]),
+        "principal": np.array([20.0, 0.0, 10.0]),
+    })
+    assert values[0] == 2.0
+    assert np.isnan(values[1:]).all()  # zero denominator, missing input
+    assert CompiledFormula("max(abs(-x), 2) * -1").evaluate({"x": np.array([1.0, 3.0])}).tolist() == [-2.0, -3.0]
+
+@pytest.mark.parametrize("formula", [
+    "__import__('os').system('true')",
+    "ebitda.real",
+    "ebitda ** 2",
+    "ebitda if interest else 0",
+    "_divide(ebitda, interest)",
+    "min(ebitda)",
+    "'text'",
+    "ebitda /",
+])
+def test_formula_rejects_anything_outside_the_grammar(formula):
+    with pytest.raises(ValueError):
+        CompiledFormula(formula)
+
+def test_rule_set_skips_types_missing_fields_and_projects_new_ones():
+    df = pd.DataFrame({
+        "period": ["2024Q1", "2024Q2"],
+        "ebitda": [100.0, 90.0],
+        "total_debt": [300.0, 360.0],
+        "interest": [20.0, 25.0],
+        "capex": [10.0, 15.0],
+        "principal": [25.0, 25.0],
+    })
+    frame = DataProcessor().compute_ratio_frame(df)
+    assert list(frame.columns) == ["period", "Debt-to-EBITDA", "Interest Coverage", "Fixed Charge Coverage"]
+    assert frame["Fixed Charge Coverage"].tolist() == [2.0, 1.5]
+
+    content = df.to_csv(index=False).encode()
+    assert {"capex", "principal"} <= set(DataProcessor().normalize_financials(content, "financials.csv").columns)
+
+def test_covenant_types_set_warning_band_and_default_operator(tmp_path):
+    path = tmp_path / "types.json"
+    path.write_text(json.dumps([
+        {"name": "Interest Coverage", "formula": "ebitda / interest", "operator": ">=", "warning_band": 0.5},
+        {"name": "Net Leverage", "formula": "(total_debt - cash) / ebitda", "operator": "<="},
+    ]))
+    rules = RuleSet(load_covenant_types(str(path)))
+    assert "cash" in rules.fields
+    engine = CovenantEngine(rules=rules)
+
+    # 2.8 is within 50% of 2.0 for Interest Coverage, outside the default 10% elsewhere
+    statuses = engine.evaluate_many([2.0, 2.0, 3.0], [">=", ">=", None], [2.8, 2.8, 3.5],
+                                    ["Interest Coverage", "Current Ratio", "Net Leverage"])
+    assert statuses.tolist() == ["Warning", "Compliant", "Breach"]
+    assert engine.evaluate({"name": "Interest Coverage", "threshold": 2.0, "operator": ">="}, 2.8)["status"] == "Warning"
+
+    with pytest.raises(ValueError):
+        RuleSet([CovenantType("Bad", "ebitda", "!=")])
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import models
+import snapshots
+
+def test_refresh_upserts_and_rebuild_restores_snapshots(client, loan_with_covenants, db):
+    loan_id, _ = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 5.0, "Breach"),
+        ("Interest Coverage", 2.0, ">=", 3.0, "Compliant"),
+        email="rebuild@example.com", borrower_name="Delta", loan_amount=1000,
+    )
+    assert snapshots.verify(db) == []
+
+    # Refreshes upsert over the existing rows
+    snapshots.refresh_snapshots(db, {loan_id})
+    snapshots.refresh_snapshots(db, {loan_id})
+    db.commit()
+    assert snapshots.verify(db) == []
+
+    db.execute(models.LoanComplianceSnapshot.__table__.delete())
+    db.commit()
+    assert snapshots.verify(db)
+    assert snapshots.rebuild(db) == 1
+    assert snapshots.verify(db) == []
+
+def test_main_app_upload_keeps_snapshots_current(client, loan_with_covenants, db):
+    import main
+    from fastapi.testclient import TestClient
+    from conftest import override_get_db
+    from database import get_db
+
+    loan_id, _ = loan_with_covenants(
+        ("Debt-to-EBITDA", 4.0, "<=", 3.0, "Compliant"),
+        ("Interest Coverage", 2.0, ">=", 3.0, "Compliant"),
+        email="vercel@example.com", borrower_name="Foxtrot", loan_amount=1000,
+    )
+    main.app.dependency_overrides[get_db] = override_get_db
+    try:
+        with TestClient(main.app) as main_client:
+            token = main_client.post("/token", data={"username": "vercel@example.com", "password": "TestPass123"}).json()
+            csv = b"period,ebitda,total_debt,interest\n2024Q1,100,500,40\n"
+            response = main_client.post("/upload-financials", headers={"Authorization": f"Bearer {token['access_token']}"},
+                                        files={"file": ("financials.csv", csv, "text/csv")})
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 200
+
+    snapshot = db.get(models.LoanComplianceSnapshot, loan_id)
+    assert (snapshot.compliant, snapshot.breach) == (1, 1)
+    assert snapshots.verify(db) == []
+
+def test_models_registers_snapshot_listeners():
+    # main.py never imports pipelines; importing the models must be enough
+    script = ("import sys, main, snapshots; from sqlalchemy import event; from sqlalchemy.orm import Session; "
+              "assert 'pipelines' not in sys.modules; "
+              "assert all(event.contains(Session, name, fn) for name, fn in snapshots.LISTENERS)")
+    env = {**os.environ, "DATABASE_URL": "sqlite://"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
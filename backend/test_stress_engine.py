@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from covenant_engine import CovenantEngine
+from stress_engine import StressEngine, grid_shocks, monte_carlo_shocks, stress_test
+
+def portfolio(n_loans=40, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "id": np.arange(3 * n_loans),
+        "loan_id": np.repeat(np.arange(n_loans), 3),
+        "name": ["Debt-to-EBITDA", "Interest Coverage", "Current Ratio"] * n_loans,
+        "threshold": np.tile([4.0, 2.0, 1.0], n_loans),
+        "operator": np.tile(["<=", ">", ">="], n_loans),
+        "current_value": np.c_[rng.uniform(2, 4.2, n_loans), rng.uniform(1.8, 4, n_loans), rng.uniform(0.9, 2, n_loans)].ravel(),
+    })
+    # Rows that cannot be scored from a critical multiplier
+    frame.loc[4, "operator"] = "="
+    frame.loc[7, "current_value"] = 0.0
+    frame.loc[9, "current_value"] = -1.5
+    frame.loc[11, "current_value"] = np.nan
+    return frame
+
+def test_stress_matches_scenario_by_scenario_evaluation():
+    covenants = portfolio()
+    shocks = monte_carlo_shocks(3000, means=(-0.05, 0.02, 0.1), seed=7)
+    stress = StressEngine(block_cells=10000)
+    result = stress.run(covenants, shocks)
+
+    scored = covenants.dropna(subset=["current_value"])
+    multipliers, kind = stress.ratio_multipliers(scored["name"].tolist(), shocks)
+    codes = CovenantEngine().status_codes(
+        scored["threshold"].to_numpy()[:, None],
+        scored["operator"].to_numpy()[:, None],
+        scored["current_value"].to_numpy()[:, None] * multipliers[kind],
+    )
+    breached = pd.DataFrame(codes == 2).groupby(scored["loan_id"].to_numpy()).any()
+
+    by_id = {c["covenant_id"]: c for loan in result["loans"] for c in loan["covenants"]}
+    for row, row_codes in zip(scored.itertuples(), codes):
+        assert by_id[row.id]["breach_probability"] == pytest.approx((row_codes == 2).mean(), abs=1e-4)
+        assert by_id[row.id]["warning_probability"] == pytest.approx((row_codes == 1).mean(), abs=1e-4)
+    by_loan = {loan["loan_id"]: loan["breach_probability"] for loan in result["loans"]}
+    for loan_id, row in breached.iterrows():
+        assert by_loan[loan_id] == pytest.approx(row.mean(), abs=1e-4)
+    assert result["expected_loans_in_breach"] == pytest.approx(breached.sum().mean(), abs=1e-4)
+    assert result["covenants_skipped"] == 1
+
+def test_grid_reports_loans_in_breach_per_point():
+    covenants = pd.DataFrame({
+        "id": [1, 2], "loan_id": [10, 11], "name": ["Debt-to-EBITDA", "Interest Coverage"],
+        "threshold": [4.0, 2.0], "operator": ["<=", ">="], "current_value": [3.0, 3.0],
+    })
+    result = stress_test(covenants, mode="grid", ebitda_grid=[-0.4, 0.0], debt_grid=[0.0], rate_grid=[0.0, 0.6])
+    assert [(p["ebitda_change"], p["rate_change"], p["loans_in_breach"]) for p in result["grid"]] == [
+        (-0.4, 0.0, 2), (-0.4, 0.6, 2), (0.0, 0.0, 0), (0.0, 0.6, 1),
+    ]
+    assert len(grid_shocks([], [0.1], [])) == 1
+
+def test_invalid_correlation_is_rejected():
+    with pytest.raises(ValueError):
+        monte_carlo_shocks(10, correlation=[[1, 2, 0], [2, 1, 0], [0, 0, 1]])
@@ -0,0 +1,30 @@
+import pytest
+from text_extractor import count_pages, extract_pdf_text, iter_pdf_pages
+
+@pytest.fixture
+def agreement_pdf(make_pdf):
+    pages = [f"Page {i} general terms" for i in range(40)]
+    pages[25] = "Financial Covenants"
+    return make_pdf(pages)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_extract_pdf_text_keeps_page_order(agreement_pdf, workers):
+    assert count_pages(agreement_pdf) == 40
+    text = extract_pdf_text(agreement_pdf, workers=workers, chunk_pages=4)
+    lines = text.split("\n")
+    assert len(lines) == 40
+    assert lines[0] == "Page 0 general terms"
+    assert lines[39] == "Page 39 general terms"
+
+def test_iter_pdf_pages_stops_early(agreement_pdf):
+    assert len(list(iter_pdf_pages(agreement_pdf, max_pages=10, workers=2, chunk_pages=4))) == 10
+    pages = list(iter_pdf_pages(agreement_pdf, stop_at_section=True, section_pages=3, workers=2, chunk_pages=4))
+    assert len(pages) == 28
+    assert pages[25] == "Financial Covenants"
+
+def test_job_workers_parse_in_process(agreement_pdf, monkeypatch):
+    import text_extractor
+    monkeypatch.setattr(text_extractor, "PDF_WORKERS", 4)
+    text_extractor.parse_in_process()
+    monkeypatch.setattr(text_extractor, "get_executor", lambda: pytest.fail("started a nested pool"))
+    assert len(list(iter_pdf_pages(agreement_pdf, chunk_pages=4))) == 40
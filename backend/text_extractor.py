@@ -0,0 +1,126 @@
+import io
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Union
+
+import pdfplumber
+from pdfminer.pdftypes import resolve1
+
+PdfSource = Union[bytes, str, os.PathLike]
+
+# A heading on its own line; table-of-contents entries carry page numbers and don't match
+COVENANT_SECTION = re.compile(r"(?im)^\s*(?:(?:section|article)\s+[\d.]+\s*)?financial\s+covenants?\s*$")
+
+# Per API process, so kept small; every uvicorn worker gets its own pool
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_CHUNK_PAGES = int(os.getenv("PDF_CHUNK_PAGES", 16))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 0)) or None
+PDF_STOP_AT_SECTION = os.getenv("PDF_STOP_AT_SECTION", "false").lower() == "true"
+PDF_SECTION_PAGES = int(os.getenv("PDF_SECTION_PAGES", 10))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def start_executor() -> ProcessPoolExecutor:
+    """Create the shared process pool used for page-range parsing; the API calls this at startup.
+
+    Workers are spawned, not forked: the API process runs threads (log
+    listener, password hashing, DB pool) whose locks a forked child could
+    inherit while held.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def parse_in_process() -> None:
+    """Parse every page range in the calling process; job workers call this so
+    they never start a nested pool of their own"""
+    global PDF_WORKERS
+    PDF_WORKERS = 1
+
+def get_executor() -> ProcessPoolExecutor:
+    """The shared pool, created on first use outside the API (scripts, benchmarks)"""
+    return _executor if _executor is not None else start_executor()
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+def _open(source: PdfSource, pages: Optional[List[int]] = None):
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source), pages=pages)
+    return pdfplumber.open(source, pages=pages)
+
+def count_pages(source: PdfSource) -> int:
+    """Read the page count from the page tree without parsing any page"""
+    with _open(source) as pdf:
+        return int(resolve1(pdf.doc.catalog["Pages"])["Count"])
+
+def extract_page_range(source: PdfSource, start: int, stop: int) -> List[str]:
+    """Extract text of pages [start, stop) (0-based). Runs inside pool workers."""
+    with _open(source, pages=list(range(start + 1, stop + 1))) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+def _iter_ranges(source: PdfSource, ranges, workers: int) -> Iterator[List[str]]:
+    if workers <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield extract_page_range(source, start, stop)
+        return
+
+    pool = get_executor()
+    pending = iter(ranges)
+    in_flight = [pool.submit(extract_page_range, source, *r) for _, r in zip(range(2 * workers), pending)]
+    try:
+        while in_flight:
+            pages = in_flight.pop(0).result()
+            next_range = next(pending, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(extract_page_range, source, *next_range))
+            yield pages
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+def iter_pdf_pages(
+    source: PdfSource,
+    max_pages: Optional[int] = PDF_MAX_PAGES,
+    stop_at_section: bool = PDF_STOP_AT_SECTION,
+    section_pages: int = PDF_SECTION_PAGES,
+    workers: Optional[int] = None,
+    chunk_pages: int = PDF_CHUNK_PAGES,
+) -> Iterator[str]:
+    """Yield page texts in document order.
+
+    Page ranges of ``chunk_pages`` are parsed in the process pool with at most
+    ``2 * workers`` ranges in flight, so stopping early (``max_pages`` reached,
+    or ``section_pages`` pages after the covenant section heading) cancels the
+    ranges that were not started yet. ``workers`` defaults to PDF_WORKERS.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    total = count_pages(source)
+    if max_pages:
+        total = min(total, max_pages)
+    ranges = [(start, min(start + chunk_pages, total)) for start in range(0, total, chunk_pages)]
+
+    remaining = None
+    chunks = _iter_ranges(source, ranges, workers)
+    try:
+        for pages in chunks:
+            for page in pages:
+                yield page
+                if remaining is None and stop_at_section and COVENANT_SECTION.search(page):
+                    remaining = section_pages
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+    finally:
+        chunks.close()
+
+def extract_pdf_text(source: PdfSource, **options) -> str:
+    """Extract the text of a PDF, joining the pages once at the end"""
+    return "\n".join(iter_pdf_pages(source, **options))
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 50 * 1024 * 1024))
+# Whole request bodies; the slack covers multipart boundaries and form fields
+MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", MAX_FILE_SIZE + 64 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# Defaults to the system temp directory
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Bytes kept from the start of the file for MIME sniffing
+HEAD_SIZE = 2048
+
+class SpooledUpload:
+    """An upload copied to a named temp file, with its size, SHA-256 and first bytes.
+
+    Pipelines receive ``path`` so pdfplumber and pyarrow read (or memory-map)
+    the file directly. The file is removed on close() unless ownership was
+    handed off with detach(), e.g. to a background job.
+    """
+
+    def __init__(self, path: str, filename: str, content_type: Optional[str], size: int, digest: str, head: bytes):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+        self.head = head
+
+    def detach(self) -> str:
+        path, self.path = self.path, None
+        return path
+
+    def close(self) -> None:
+        if self.path is not None:
+            remove_spooled(self.path)
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def remove_spooled(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware rejecting request bodies over MAX_REQUEST_SIZE with 413.
+
+    Starlette parses the whole multipart body into UploadFile objects before
+    the endpoint runs, so the limit has to apply here: a larger
+    Content-Length is refused before any of the body is read, and chunked or
+    understated bodies fail as soon as the running total crosses the limit.
+    """
+
+    def __init__(self, app, max_size: Optional[int] = None):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        max_size = MAX_REQUEST_SIZE if self.max_size is None else self.max_size
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > max_size:
+            return await JSONResponse({"detail": "File too large"}, status_code=413)(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # Raised inside the endpoint's body parsing, so FastAPI answers 413
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def _spool(file: UploadFile, max_size: int) -> SpooledUpload:
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=extension, dir=UPLOAD_SPOOL_DIR)
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    try:
+        source = file.file
+        source.seek(0)
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+                if len(head) < HEAD_SIZE:
+                    head += chunk[:HEAD_SIZE - len(head)]
+                digest.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return SpooledUpload(path, file.filename or "", file.content_type, size, digest.hexdigest(), head)
+
+async def spool_upload(file: UploadFile, max_size: Optional[int] = None) -> SpooledUpload:
+    """Copy a parsed upload to a named temp file in UPLOAD_CHUNK_SIZE chunks.
+
+    By now Starlette holds the whole body (BodySizeLimitMiddleware bounds
+    it); the copy gives pipelines and background jobs a path to open, and
+    computes the digest and head in the same pass. The per-file limit
+    (default MAX_FILE_SIZE) is checked again here with HTTPException(413).
+    """
+    return await run_in_threadpool(_spool, file, MAX_FILE_SIZE if max_size is None else max_size)
@@ -147,12 +147,12 @@ class ApiService {
     }
   }
 
-  Future<List<dynamic>> runSimulation(Map<String, double> changes) async {
+  Future<Map<String, dynamic>> runSimulation(Map<String, dynamic> params) async {
     try {
       final response = await http.post(
         Uri.parse('$_baseUrl/simulate'),
         headers: _authService.authHeaders,
-        body: json.encode(changes),
+        body: json.encode(params),
       ).timeout(const Duration(seconds: 15));
 
       if (response.statusCode == 200) {